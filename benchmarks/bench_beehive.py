@@ -0,0 +1,220 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Measures how the beehive simulation scales with the size of the hive.  The simulation is set up the same way as
+cli_beehive, and each configuration is run in a fresh process so the peak memory is for that configuration only.
+
+The results are written as JSON, one record per engine, bee variance and number of bees.
+"""
+
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ENGINES = ["bees", "population", "kernel"]
+
+
+def peak_rss_kb() -> int:
+    """
+    Returns the peak resident memory of this process.
+    :return: The peak memory in KB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes, Linux KB.
+
+
+def run_entities(bee_model, number_bees, bee_variance, steps, seed) -> dict:
+    """
+    Runs the entity simulation from cli_beehive.  Nothing else is added to the simulation, so the time is for the
+    beehive entities only.
+    :return: The measurements for the run.
+    """
+    from scarab.simulation import Simulation
+
+    from scarab_examples.beehive.cli_beehive import BeehiveApp
+
+    random.seed(seed)
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        start = time.perf_counter()
+        BeehiveApp.create_entities(simulation=simulation, number_bees=number_bees, bee_variance=bee_variance,
+                                   bee_model=bee_model)
+        startup_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        simulation.advance_and_wait(steps=steps)
+        run_seconds = time.perf_counter() - start
+
+        return {"startup_seconds": startup_seconds, "run_seconds": run_seconds}
+
+
+def count_entity_events(bee_model, number_bees, bee_variance, steps, seed) -> float:
+    """
+    Runs the entity simulation again with an entity that counts the changed events.  This is a separate run because
+    the counter handles every event, which would slow down the timed run more for engines that send more events.
+    :return: The number of changed events per step.
+    """
+    from scarab.entities import Entity, entity_changed_event_handler
+    from scarab.simulation import Simulation
+
+    from scarab_examples.beehive.beehive import BEE_ENTITY_NAME, BEE_POPULATION_ENTITY_NAME, BEEHIVE_ENTITY_NAME, \
+        OUTSIDE_TEMPERATURE_NAME
+    from scarab_examples.beehive.cli_beehive import BeehiveApp
+
+    class EventCounter(Entity):
+        """Counts the changed events sent by the beehive entities."""
+
+        def __init__(self):
+            """Creates a counter with no events."""
+            super().__init__(name="event_counter")
+            self.number_events = 0
+
+        @entity_changed_event_handler(entity_name=BEE_ENTITY_NAME)
+        def handle_bee_changed(self, bee, changed_properties) -> None:
+            """Counts a bee changing."""
+            self.number_events += 1
+
+        @entity_changed_event_handler(entity_name=BEE_POPULATION_ENTITY_NAME)
+        def handle_population_changed(self, population, changed_properties) -> None:
+            """Counts a population changing."""
+            self.number_events += 1
+
+        @entity_changed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+        def handle_beehive_changed(self, beehive, changed_properties) -> None:
+            """Counts the beehive changing."""
+            self.number_events += 1
+
+        @entity_changed_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
+        def handle_temp_changed(self, temp, changed_properties) -> None:
+            """Counts the outside temp changing."""
+            self.number_events += 1
+
+    random.seed(seed)
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        event_counter = EventCounter()
+        simulation.add_entity(event_counter)
+        BeehiveApp.create_entities(simulation=simulation, number_bees=number_bees, bee_variance=bee_variance,
+                                   bee_model=bee_model)
+        simulation.advance_and_wait(steps=steps)
+        return event_counter.number_events / steps
+
+
+def run_kernel(number_bees, bee_variance, steps, seed) -> dict:
+    """
+    Runs the headless kernel with the same bees as cli_beehive.
+    :return: The measurements for the run.
+    """
+    from scarab_examples.beehive import kernel
+    from scarab_examples.beehive.cli_beehive import BeehiveApp
+
+    random.seed(seed)
+    start = time.perf_counter()
+    buzz_temps, fan_temps = BeehiveApp.create_bee_temps(number_bees=number_bees, bee_variance=bee_variance,
+                                                        target_bee_buzzing=60.0, target_bee_fanning=65.0)
+    startup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kernel.run(buzz_temps=buzz_temps, fan_temps=fan_temps, max_steps=steps, start_temp=60.0,
+               buzzing_impact=0.5, fanning_impact=0.5, min_outside_temp=50.0, max_outside_temp=90.0)
+    run_seconds = time.perf_counter() - start
+
+    return {"startup_seconds": startup_seconds, "run_seconds": run_seconds}
+
+
+def run_benchmark(configuration) -> dict:
+    """
+    Runs one configuration.  This is run in its own process.
+    :param dict configuration: The engine, number_bees, bee_variance, steps and seed for the run.
+    :return: The configuration with the measurements.
+    """
+    if configuration["engine"] == "kernel":
+        measurements = run_kernel(number_bees=configuration["number_bees"],
+                                  bee_variance=configuration["bee_variance"],
+                                  steps=configuration["steps"], seed=configuration["seed"])
+    else:
+        measurements = run_entities(bee_model=configuration["engine"], number_bees=configuration["number_bees"],
+                                    bee_variance=configuration["bee_variance"],
+                                    steps=configuration["steps"], seed=configuration["seed"])
+
+    result = dict(configuration)
+    result.update(measurements)
+    result["steps_per_second"] = configuration["steps"] / measurements["run_seconds"]
+    result["peak_rss_kb"] = peak_rss_kb()  # before counting the events, so it is for the timed run.
+
+    if configuration["engine"] == "kernel":
+        result["events_per_step"] = 0.0
+    else:
+        result["events_per_step"] = count_entity_events(bee_model=configuration["engine"],
+                                                        number_bees=configuration["number_bees"],
+                                                        bee_variance=configuration["bee_variance"],
+                                                        steps=configuration["steps"], seed=configuration["seed"])
+    return result
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for the benchmarks.
+    """
+    parser = argparse.ArgumentParser(description="Measures steps per second, events per step, peak memory and startup "
+                                                 "time of the beehive simulation for different hive sizes.")
+
+    parser.add_argument("--number_bees", type=int, nargs="+", default=[10, 1000, 10000, 100000],
+                        help="hive sizes to measure")
+    parser.add_argument("--bee_variance", nargs="+", default=["vary", "same"], choices=["vary", "same"],
+                        help="bee variances to measure")
+    parser.add_argument("--engine", nargs="+", default=ENGINES, choices=ENGINES,
+                        help="bees: an entity per bee (the baseline).\n"
+                             "population: one entity for all bees.\n"
+                             "kernel: the headless kernel.")
+    parser.add_argument("--steps", type=int, default=100, help="number of steps to run for each configuration")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random bee temps")
+    parser.add_argument("--output_file", default=None, help="file for the JSON results (default: stdout)")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs the benchmarks."""
+    args = get_args()
+
+    results = []
+    for engine in args.engine:
+        for bee_variance in args.bee_variance:
+            for number_bees in args.number_bees:
+                configuration = {"engine": engine, "number_bees": number_bees, "bee_variance": bee_variance,
+                                 "steps": args.steps, "seed": args.seed}
+                print(f"Running {configuration}", file=sys.stderr)
+
+                # a new process for each run so the peak memory isn't from an earlier run.
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    results.append(executor.submit(run_benchmark, configuration).result())
+
+    report = {"python": platform.python_version(), "platform": platform.platform(), "results": results}
+    if args.output_file:
+        with open(args.output_file, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Compares the hand-written Bee with the Bee generated from beehive.yaml:  the time to create the bees, the memory used
+by each bee and the time to handle a hive temp change.  The bees are created without a simulation so only the classes
+are measured.  The startup of a whole hive in a simulation is also measured, with the hand-written Beehive and
+OutsideTemperature and each of the bees.
+
+The generated Bee is a plain entity, so it isn't expected to be smaller or faster than the hand-written Bee.  This
+checks that it isn't slower or bigger either.
+
+The results are written as JSON, one record per class, measurement and number of bees.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+
+def measure(bee_class, number_bees, repeats=5) -> dict:
+    """
+    Creates the bees and updates them for a hive temp change.
+    :param type bee_class: The bee class to measure.
+    :param int number_bees: The number of bees to create.
+    :param int repeats: The number of times the bees handle the temp change.
+    :return: The measurements.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    bees = [bee_class(buzz_temp=60.0, fan_temp=65.0) for _ in range(0, number_bees)]
+    startup_seconds = time.perf_counter() - start
+    bytes_per_bee = tracemalloc.get_traced_memory()[0] / max(number_bees, 1)
+    tracemalloc.stop()
+
+    beehive = SimpleNamespace(current_temp=50.0)  # stands in for the remote beehive.
+    handler = bee_class.handle_temperature_change if hasattr(bee_class, "handle_temperature_change") \
+        else bee_class.handle_beehive_changed
+    handler_seconds = None
+    for _ in range(0, repeats):  # the best of the repeats, so a slow first pass isn't counted.
+        start = time.perf_counter()
+        for bee in bees:
+            handler(bee, beehive, ["current_temp"])
+        seconds = time.perf_counter() - start
+        handler_seconds = seconds if handler_seconds is None else min(handler_seconds, seconds)
+
+    return {"startup_seconds": startup_seconds, "bytes_per_bee": bytes_per_bee,
+            "handler_ns_per_bee": handler_seconds * 1e9 / max(number_bees, 1)}
+
+
+def measure_hive(beehive_class, outside_temperature_class, bee_class, number_bees, steps=10) -> dict:
+    """
+    Creates a hive in a simulation and runs a few steps.
+    :param type beehive_class: The beehive class.  Created with the temp as its first argument.
+    :param type outside_temperature_class: The outside temperature class.
+    :param type bee_class: The bee class.
+    :param int number_bees: The number of bees in the hive.
+    :param int steps: The number of steps to run after startup.
+    :return: The measurements.
+    """
+    from scarab.simulation import Simulation
+
+    gc.collect()
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        start = time.perf_counter()
+        simulation.add_entity(beehive_class(60.0, buzzing_impact=0.5, fanning_impact=0.5))
+        simulation.add_entity(outside_temperature_class(min_temp=50.0, max_temp=90.0))
+        for _ in range(0, number_bees):
+            simulation.add_entity(bee_class(buzz_temp=60.0, fan_temp=65.0))
+        startup_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        simulation.advance_and_wait(steps=steps)
+        run_seconds = time.perf_counter() - start
+
+    return {"startup_seconds": startup_seconds, "steps_per_second": steps / run_seconds}
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Compares the hand-written bee with the bee generated from "
+                                                 "beehive.yaml.")
+
+    parser.add_argument("--number_bees", type=int, nargs="+", default=[1000, 100000], help="numbers of bees to create")
+    parser.add_argument("--output_file", default=None, help="file for the JSON results (default: stdout)")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs the benchmark."""
+    args = get_args()
+
+    from scarab_examples.beehive.beehive import Bee, Beehive, OutsideTemperature
+    from scarab_examples.beehive.entity_spec import load_beehive_classes
+
+    start = time.perf_counter()
+    generated_classes = load_beehive_classes()
+    generate_seconds = time.perf_counter() - start
+
+    results = []
+    for bee_class, source in [(Bee, "python"), (generated_classes["Bee"], "yaml")]:
+        for number_bees in args.number_bees:
+            print(f"Measuring {number_bees} {source} bees", file=sys.stderr)
+            result = {"class": source, "measurement": "bees", "number_bees": number_bees}
+            result.update(measure(bee_class, number_bees))
+            results.append(result)
+
+    for bee_class, source in [(Bee, "python"), (generated_classes["Bee"], "yaml")]:
+        for number_bees in args.number_bees:
+            print(f"Measuring a hive of {number_bees} {source} bees", file=sys.stderr)
+            result = {"class": source, "measurement": "hive", "number_bees": number_bees}
+            result.update(measure_hive(Beehive, OutsideTemperature, bee_class, number_bees))
+            results.append(result)
+
+    report = {"python": platform.python_version(), "platform": platform.platform(),
+              "generate_seconds": generate_seconds, "results": results}
+    if args.output_file:
+        with open(args.output_file, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Runs an apiary:  many hives at one site, each with its own bee population, sharing one outside temperature.
+
+The beehive entities subscribe to the fixed entity names "beehive" and "bee_population", so hives in the same simulation
+would all get each other's events.  Each hive in the apiary gets its own entity names instead, and its classes are made
+with the handlers subscribed to those names, so a population only hears its own hive and a hive only its own bees.  A
+step then costs about the same as the total number of bees, no matter how many hives they are split across.
+
+The hives are split into shards that run in worker processes.  Each shard has its own copy of the outside temperature,
+which only depends on the time, so every hive sees the same outside temps.  Each hive gets its own random stream
+spawned from a master seed, the same as the ensemble replicas, so the results don't depend on the number of workers.
+"""
+
+import argparse
+import csv
+import functools
+import inspect
+import os
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from scarab.entities import *
+from scarab.simulation import Simulation
+
+from scarab_examples.beehive.beehive import BEE_ENTITY_NAME, BEE_POPULATION_ENTITY_NAME, BEEHIVE_ENTITY_NAME, \
+    BeePopulation, Beehive, OutsideTemperature
+from scarab_examples.beehive.ensemble import create_bee_temps
+
+# The handlers that are subscribed to the entities of one hive, with the decorator and the entity name they use in a
+# single hive simulation.  The outside temperature is shared, so those handlers are left as they are.
+HIVE_HANDLERS = {
+    Beehive: {
+        "handle_new_bee": (entity_created_event_handler, BEE_ENTITY_NAME),
+        "handle_dead_bee": (entity_destroyed_event_handler, BEE_ENTITY_NAME),
+        "handle_bee_update": (entity_changed_event_handler, BEE_ENTITY_NAME),
+        "handle_new_population": (entity_created_event_handler, BEE_POPULATION_ENTITY_NAME),
+        "handle_dead_population": (entity_destroyed_event_handler, BEE_POPULATION_ENTITY_NAME),
+        "handle_population_update": (entity_changed_event_handler, BEE_POPULATION_ENTITY_NAME),
+    },
+    BeePopulation: {
+        "handle_temperature_change": (entity_changed_event_handler, BEEHIVE_ENTITY_NAME),
+    },
+}
+
+# The entity name of each class in a single hive simulation.
+_ENTITY_NAMES = {Beehive: BEEHIVE_ENTITY_NAME, BeePopulation: BEE_POPULATION_ENTITY_NAME}
+
+# The series recorded for each hive.
+APIARY_SERIES = ["hive_temp", "number_bees_buzzing", "number_bees_fanning"]
+
+
+def hive_entity_names(hive_number) -> dict:
+    """
+    Returns the entity names used by one hive in the apiary.
+    :param int hive_number: The number of the hive.
+    :return: Dictionary of the hive's name for each single hive entity name.
+    """
+    return {name: f"{name}_{hive_number}"
+            for name in [BEEHIVE_ENTITY_NAME, BEE_POPULATION_ENTITY_NAME, BEE_ENTITY_NAME]}
+
+
+@functools.lru_cache(maxsize=None)
+def hive_classes(hive_number) -> dict:
+    """
+    Returns the Beehive and BeePopulation classes for one hive in the apiary.  They behave the same as the single hive
+    classes but are named and subscribed with the hive's entity names.
+    :param int hive_number: The number of the hive.
+    :return: Dictionary of the classes by the name of the class they are made from.
+    """
+    names = hive_entity_names(hive_number)
+
+    classes = {}
+    for base, handlers in HIVE_HANDLERS.items():
+        namespace = {"__init__": _named_init(base, names[_ENTITY_NAMES[base]]),
+                     "__doc__": f"{base.__name__} for hive {hive_number} of an apiary."}
+        for method_name, (decorator, entity_name) in handlers.items():
+            handler = _copy_function(inspect.unwrap(getattr(base, method_name)))
+            namespace[method_name] = decorator(entity_name=names[entity_name])(handler)
+        classes[base.__name__] = type(f"{base.__name__}{hive_number}", (base,), namespace)
+    return classes
+
+
+def _copy_function(function):
+    """
+    Returns a copy of the function without any attributes.  The decorators may mark the function they are given, so
+    each hive's handlers are decorated copies rather than the single hive handlers.
+    """
+    copied = types.FunctionType(function.__code__, function.__globals__, function.__name__, function.__defaults__,
+                                function.__closure__)
+    copied.__kwdefaults__ = function.__kwdefaults__
+    copied.__doc__ = function.__doc__
+    copied.__qualname__ = function.__qualname__
+    return copied
+
+
+def _named_init(base, name):
+    """Returns an __init__ that creates the entity with the name."""
+    def __init__(self, *args, **kwargs):
+        base.__init__(self, *args, name=name, **kwargs)
+    return __init__
+
+
+def shard_hives(number_hives, number_shards) -> list:
+    """
+    Splits the hives into shards of about the same size.
+    :param int number_hives: The number of hives in the apiary.
+    :param int number_shards: The number of shards.
+    :return: List of the hive numbers in each shard.  Shards without hives are left out.
+    """
+    return [list(shard) for shard in numpy.array_split(numpy.arange(number_hives), number_shards) if len(shard)]
+
+
+def run_shard(shard) -> dict:
+    """
+    Runs the hives in a shard in one simulation.  This is run in the worker processes.
+    :param tuple shard: The hive numbers, the SeedSequence for each hive and the dictionary of model parameters.
+    :return: Dictionary with the "outside_temp" for each step and an array of hives by steps for each series.
+    """
+    hive_numbers, seed_sequences, parameters = shard
+    max_steps = parameters["max_steps"]
+
+    results = {"outside_temp": numpy.zeros(max_steps + 1)}
+    for name in APIARY_SERIES:
+        results[name] = numpy.zeros((len(hive_numbers), max_steps + 1),
+                                    dtype=numpy.float64 if name == "hive_temp" else numpy.int64)
+
+    with Simulation(name="apiary", time_stepped=True, minimum_step_time=0) as simulation:
+        outside_temperature = OutsideTemperature(min_temp=parameters["min_outside_temp"],
+                                                 max_temp=parameters["max_outside_temp"])
+        simulation.add_entity(outside_temperature)
+
+        beehives = []
+        for hive_number, seed_sequence in zip(hive_numbers, seed_sequences):
+            classes = hive_classes(hive_number)
+            buzz_temps, fan_temps = create_bee_temps(rng=numpy.random.default_rng(seed_sequence),
+                                                     number_bees=parameters["number_bees"],
+                                                     bee_variance=parameters["bee_variance"],
+                                                     target_bee_buzzing=parameters["target_bee_buzzing"],
+                                                     target_bee_fanning=parameters["target_bee_fanning"])
+            # the hive starts at the buzzing target, the same as cli_beehive.
+            beehive = classes["Beehive"](start_temp=parameters["target_bee_buzzing"],
+                                         buzzing_impact=parameters["buzzing_impact"],
+                                         fanning_impact=parameters["fanning_impact"])
+            simulation.add_entity(beehive)
+            simulation.add_entity(classes["BeePopulation"](buzz_temps=buzz_temps, fan_temps=fan_temps))
+            beehives.append(beehive)
+
+        for step in range(0, max_steps + 1):
+            if step:
+                simulation.advance_and_wait(steps=1)
+            results["outside_temp"][step] = outside_temperature.current_temp
+            for row, beehive in enumerate(beehives):
+                results["hive_temp"][row, step] = beehive.current_temp
+                results["number_bees_buzzing"][row, step] = beehive.number_bees_buzzing
+                results["number_bees_fanning"][row, step] = beehive.number_bees_fanning
+
+    return results
+
+
+def run_apiary(number_hives, number_bees, max_steps, seed=0, workers=None, shards=None, bee_variance="vary",
+               buzzing_impact=0.5, fanning_impact=0.5, min_outside_temp=50.0, max_outside_temp=90.0,
+               target_bee_buzzing=60.0, target_bee_fanning=65.0) -> dict:
+    """
+    Runs the apiary with the hives split into shards across worker processes.
+    :param int number_hives: The number of hives in the apiary.
+    :param int number_bees: The number of bees in each hive.
+    :param int max_steps: The number of steps (minutes) to run.
+    :param int seed: The master seed the hive seeds are spawned from.
+    :param int workers: The number of worker processes.  Defaults to the number of cores.
+    :param int shards: The number of shards.  Defaults to one per worker.
+    :param str bee_variance: "vary" for random temps around the targets, "same" for the target temps.
+    :param float buzzing_impact: The impact on temperature for any given bee buzzing.
+    :param float fanning_impact: The impact on temperature for any given bee fanning.
+    :param float min_outside_temp: The minimum outside temperature during the day.
+    :param float max_outside_temp: The maximum outside temperature during the day.
+    :param float target_bee_buzzing: The target temperature below which bees buzz.  The hives start at this temp.
+    :param float target_bee_fanning: The target temperature above which bees fan.
+    :return: Dictionary with the "time" and "outside_temp" for each step and an array of hives by steps for each of
+    APIARY_SERIES.
+    """
+    parameters = {"number_bees": number_bees, "bee_variance": bee_variance, "max_steps": max_steps,
+                  "buzzing_impact": buzzing_impact, "fanning_impact": fanning_impact,
+                  "min_outside_temp": min_outside_temp, "max_outside_temp": max_outside_temp,
+                  "target_bee_buzzing": target_bee_buzzing, "target_bee_fanning": target_bee_fanning}
+    seed_sequences = numpy.random.SeedSequence(seed).spawn(number_hives)
+
+    runs = [(hive_numbers, [seed_sequences[hive_number] for hive_number in hive_numbers], parameters)
+            for hive_numbers in shard_hives(number_hives, shards or workers or os.cpu_count())]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run_shard, runs))  # in shard order, so the hives stay in order.
+
+    apiary = {"time": numpy.arange(0, max_steps + 1), "outside_temp": results[0]["outside_temp"]}
+    for name in APIARY_SERIES:
+        apiary[name] = numpy.concatenate([result[name] for result in results])
+    return apiary
+
+
+def write_apiary(apiary, output) -> None:
+    """
+    Writes the apiary results as a CSV table with one row per hive and step.
+    :param dict apiary: The results from run_apiary.
+    :param file output: The file to write to.
+    """
+    writer = csv.writer(output)
+    writer.writerow(["time", "hive", "outside_temp"] + APIARY_SERIES)
+    for hive in range(0, len(apiary["hive_temp"])):
+        writer.writerows(zip(apiary["time"].tolist(), [hive] * len(apiary["time"]), apiary["outside_temp"].tolist(),
+                             *[apiary[name][hive].tolist() for name in APIARY_SERIES]))
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for the apiary.
+    """
+    parser = argparse.ArgumentParser(description="Runs an apiary of beehives that share the outside temperature and "
+                                                 "writes the hive temp and bee counts of each hive as CSV.")
+
+    parser.add_argument("--hives", type=int, default=10, help="number of hives in the apiary")
+    parser.add_argument("--number_bees", type=int, default=10, help="number of bees in each hive")
+    parser.add_argument("--bee_variance", default="vary", choices=["vary", "same"],
+                        help="vary: bees have different temps for buzz and fan.\n"
+                             "same: bees have same temp for buzz and fan.")
+    parser.add_argument("--max_steps", type=int, default=1440, help="Number of steps as simulation minutes.")
+    parser.add_argument("--seed", type=int, default=0, help="master seed for the hives")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--shards", type=int, default=None, help="number of shards of hives (default: one per worker)")
+    parser.add_argument("--output_file", default=None, help="file for the CSV table (default: stdout)")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs the apiary."""
+    args = get_args()
+
+    apiary = run_apiary(number_hives=args.hives, number_bees=args.number_bees, max_steps=args.max_steps,
+                        seed=args.seed, workers=args.workers, shards=args.shards, bee_variance=args.bee_variance)
+
+    if args.output_file:
+        with open(args.output_file, "w", newline="") as output:
+            write_apiary(apiary, output)
+    else:
+        write_apiary(apiary, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Runs beehive simulations from asyncio.  Each run is advanced in chunks of steps on a thread pool, and the event loop
+gets control back between chunks, so one loop can interleave many runs with progress reports and output writers.  A
+run can be cancelled, and it can have a deadline that is checked between chunks.
+
+All the calls into a simulation are made on the thread pool, and a chunk that is running when its run is cancelled is
+finished before the simulation is shut down.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import inspect
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scarab.simulation import Simulation
+
+from scarab_examples.beehive.cli_beehive import BeehiveApp
+from scarab_examples.beehive.sweep import summary_stats, write_table
+
+# The bee temps come from the shared random module, so runs are created one at a time to get the same bees for a seed.
+_CREATE_LOCK = threading.Lock()
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when a run is still going at its deadline."""
+
+    def __init__(self, run):
+        """
+        Creates the error for the run.
+        :param BeehiveRun run: The run that didn't finish.
+        """
+        super().__init__(f"beehive run stopped at its deadline after {run.time} of {run.max_steps} steps")
+        self.run = run
+
+
+class BeehiveRun:
+    """One beehive simulation, set up the same way as cli_beehive, that is advanced in awaitable chunks."""
+
+    def __init__(self, max_steps, chunk_steps=100, seed=None, deadline=None, **parameters):
+        """
+        Creates the run.  The simulation isn't created until the run starts.
+        :param int max_steps: The number of steps (minutes) to run.
+        :param int chunk_steps: The number of steps in each chunk.
+        :param int seed: The seed for the random bee temps.
+        :param float deadline: The seconds the run may take.  It is checked between chunks.  None for no deadline.
+        :param parameters: The parameters for BeehiveApp.create_entities, such as number_bees.
+        """
+        assert chunk_steps > 0
+        self.max_steps = max_steps
+        self.chunk_steps = chunk_steps
+        self.seed = seed
+        self.deadline = deadline
+        self.parameters = parameters
+
+        self.time = 0
+        self.display_model = None
+        self.__exit_stack = contextlib.ExitStack()
+
+    @property
+    def done(self) -> bool:
+        """Returns true once every step has been run."""
+        return self.time >= self.max_steps
+
+    async def run(self, executor=None, on_chunk=None) -> dict:
+        """
+        Runs the simulation to the end.
+        :param concurrent.futures.Executor executor: The thread pool for the simulation calls.  Defaults to the loop's.
+        :param on_chunk: Called with the run after each chunk.  It may be a coroutine function.
+        :return: The run parameters and the summary stats from the display model, the same as a sweep.
+        :raises DeadlineExceeded: If the deadline passed before the last chunk.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline if self.deadline is not None else None
+
+        try:
+            await _call(executor, self.__create)
+            while not self.done:
+                if deadline is not None and loop.time() >= deadline:
+                    raise DeadlineExceeded(self)
+
+                steps = min(self.chunk_steps, self.max_steps - self.time)
+                await _call(executor, self.__advance, steps)
+                if on_chunk is not None:
+                    result = on_chunk(self)
+                    if inspect.isawaitable(result):
+                        await result
+        finally:
+            await _call(executor, self.__exit_stack.close)
+
+        return self.summary()
+
+    def summary(self) -> dict:
+        """
+        Returns the parameters of the run and the summary stats so far.
+        :return: Dictionary of the parameters, the seed, the time reached, the final hive temp and the summary stats
+        with OBSERVED_PREFIX.
+        """
+        summary = dict(self.parameters, max_steps=self.max_steps, seed=self.seed, time=self.time)
+        display_model = self.display_model
+        summary["final_hive_temp"] = display_model.beehive.current_temp if display_model and display_model.beehive \
+            else None
+        summary.update(summary_stats(display_model))
+        return summary
+
+    def __create(self) -> None:
+        """Creates the simulation and the entities.  Runs on the thread pool."""
+        simulation = self.__exit_stack.enter_context(Simulation(name="beehive", time_stepped=True,
+                                                                minimum_step_time=0))
+        self.__simulation = simulation
+        with _CREATE_LOCK:
+            if self.seed is not None:
+                random.seed(self.seed)
+            self.display_model = BeehiveApp.create_entities(simulation=simulation, **self.parameters)
+
+    def __advance(self, steps) -> None:
+        """Runs a chunk of steps.  Runs on the thread pool."""
+        self.__simulation.advance_and_wait(steps=steps)
+        self.time += steps
+
+
+async def _call(executor, function, *args):
+    """
+    Calls the function on the executor.  If the caller is cancelled, the call is still finished before the
+    cancellation goes on, so the simulation is never shut down while it is being advanced.
+    """
+    future = asyncio.get_running_loop().run_in_executor(executor, function, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+async def run_many(runs, max_concurrent=None, on_chunk=None) -> list:
+    """
+    Runs the simulations on one event loop, with at most max_concurrent of them set up at a time.
+    :param list of BeehiveRun runs: The runs.
+    :param int max_concurrent: The most runs at once, which is also the number of threads.  Defaults to the number of
+    cores.
+    :param on_chunk: Called with a run after each of its chunks.  It may be a coroutine function.
+    :return: The summary of each run in the same order as the runs, or the exception it raised.
+    """
+    max_concurrent = max_concurrent or os.cpu_count()
+    slots = asyncio.Semaphore(max_concurrent)
+
+    async def run_one(run):
+        async with slots:
+            return await run.run(executor=executor, on_chunk=on_chunk)
+
+    with ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="beehive") as executor:
+        return await asyncio.gather(*[run_one(run) for run in runs], return_exceptions=True)
+
+
+async def report_progress(runs, interval=1.0, output=sys.stderr) -> None:
+    """
+    Writes how far the runs have got every interval until it is cancelled.
+    :param list of BeehiveRun runs: The runs.
+    :param float interval: The seconds between reports.
+    :param file output: The file to write to.
+    """
+    total_steps = sum([run.max_steps for run in runs])
+    while True:
+        await asyncio.sleep(interval)
+        steps = sum([run.time for run in runs])
+        print(f"{sum([run.done for run in runs])} of {len(runs)} runs done, "
+              f"{100.0 * steps / max(1, total_steps):.1f}% of the steps", file=output)
+
+
+async def run_batch(runs, max_concurrent=None, progress_interval=1.0) -> list:
+    """
+    Runs the simulations with progress reports.  An interrupt cancels the runs that haven't finished.
+    :param list of BeehiveRun runs: The runs.
+    :param int max_concurrent: The most runs at once.
+    :param float progress_interval: The seconds between progress reports.
+    :return: The summary of each run, as far as it got.
+    """
+    loop = asyncio.get_running_loop()
+    batch = asyncio.ensure_future(run_many(runs, max_concurrent=max_concurrent))
+    progress = asyncio.ensure_future(report_progress(runs, interval=progress_interval))
+    with contextlib.suppress(NotImplementedError):  # no signal handlers on some platforms.
+        loop.add_signal_handler(signal.SIGINT, batch.cancel)
+
+    try:
+        await batch
+    except asyncio.CancelledError:
+        print("Interrupted, the runs that didn't finish are reported as far as they got.", file=sys.stderr)
+    finally:
+        progress.cancel()
+        with contextlib.suppress(NotImplementedError):
+            loop.remove_signal_handler(signal.SIGINT)
+
+    summaries = []
+    for run in runs:
+        summary = run.summary()
+        summary["status"] = "done" if run.done else "stopped"
+        summaries.append(summary)
+    return summaries
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for the batch.
+    """
+    parser = argparse.ArgumentParser(description="Runs many small beehive simulations on one event loop and writes "
+                                                 "the summary stats for each run as a CSV table.")
+
+    parser.add_argument("--runs", type=int, default=100, help="number of runs, each with the next seed")
+    parser.add_argument("--number_bees", type=int, default=10, help="number of bees in each hive")
+    parser.add_argument("--bee_variance", default="vary", choices=["vary", "same"],
+                        help="whether bees have different or the same temps for buzz and fan")
+    parser.add_argument("--max_steps", type=int, default=1440, help="Number of steps as simulation minutes.")
+    parser.add_argument("--chunk_steps", type=int, default=100, help="steps run between giving the loop control")
+    parser.add_argument("--deadline", type=float, default=None, help="seconds each run may take")
+    parser.add_argument("--max_concurrent", type=int, default=None,
+                        help="most runs at once (default: the number of cores)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the first run, incremented for each run")
+    parser.add_argument("--output_file", default=None, help="file for the CSV table (default: stdout)")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs the batch."""
+    args = get_args()
+
+    runs = [BeehiveRun(max_steps=args.max_steps, chunk_steps=args.chunk_steps, seed=args.seed + run_number,
+                       deadline=args.deadline, number_bees=args.number_bees, bee_variance=args.bee_variance)
+            for run_number in range(0, args.runs)]
+    start = time.perf_counter()
+    summaries = asyncio.run(run_batch(runs, max_concurrent=args.max_concurrent))
+    print(f"Ran {len(runs)} beehive simulations in {time.perf_counter() - start:.1f} seconds.", file=sys.stderr)
+
+    if args.output_file:
+        with open(args.output_file, "w", newline="") as output:
+            write_table(summaries, output)
+    else:
+        write_table(summaries, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,9 +20,19 @@ and try to keep it in a given temperature range.
 It also includes the test code to show how entities can be verified.
 """
 
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+import numpy
+
 from scarab.entities import *
 
+from scarab_examples.beehive.kernel import MAX_ADAPTIVE_STEPS, QUIET_STEPS, integrate_steps
+from scarab_examples.beehive.stats import StreamingStats
+from scarab_examples.beehive.temperature_profile import outside_temperature_profile, outside_temperatures_at
+
 BEE_ENTITY_NAME = "bee"
+BEE_POPULATION_ENTITY_NAME = "bee_population"
 BEEHIVE_ENTITY_NAME = "beehive"
 OUTSIDE_TEMPERATURE_NAME = "outside_temperature"
 BEEHIVE_DISPLAY_MODEL_NAME = "beehive_display_model"
@@ -46,6 +56,26 @@ class Bee(Entity):
         self.is_fanning = False
         super().__init__(name=BEE_ENTITY_NAME)
 
+    def get_state(self) -> dict:
+        """
+        Returns the state of the bee for a snapshot.
+        :return: Dictionary with the buzz and fan temps and whether the bee is buzzing or fanning.
+        """
+        return {"buzz_temp": self.buzz_temp, "fan_temp": self.fan_temp,
+                "is_buzzing": bool(self.is_buzzing), "is_fanning": bool(self.is_fanning)}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Creates a bee from the state in a snapshot.
+        :param dict state: The state from get_state.
+        :return: The bee in the same state.
+        """
+        bee = cls(buzz_temp=state["buzz_temp"], fan_temp=state["fan_temp"])
+        bee.is_buzzing = state["is_buzzing"]
+        bee.is_fanning = state["is_fanning"]
+        return bee
+
     @entity_changed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
     def handle_temperature_change(self, beehive, changed_properties) -> None:
         """
@@ -64,15 +94,464 @@ class Bee(Entity):
                 self.is_buzzing, self.is_fanning = False, False
 
 
+class BeeBandSubscriptions:
+    """
+    Registers the [buzz_temp, fan_temp] band of each bee so that a change in hive temp only wakes the bees whose band
+    edges were crossed.  Every other bee would end up in the same state it is already in.
+    """
+
+    def __init__(self, buzz_temps, fan_temps):
+        """
+        Creates the subscriptions for the bees, one band per pair of buzz and fan temps.
+        :param numpy.ndarray buzz_temps: The temperature below which each bee buzzes.
+        :param numpy.ndarray fan_temps: The temperature above which each bee fans.
+        """
+        assert len(buzz_temps) == len(fan_temps)
+
+        self.__buzz_order = numpy.argsort(buzz_temps, kind="stable")
+        self.__sorted_buzz_temps = numpy.asarray(buzz_temps)[self.__buzz_order]
+        self.__fan_order = numpy.argsort(fan_temps, kind="stable")
+        self.__sorted_fan_temps = numpy.asarray(fan_temps)[self.__fan_order]
+
+    def crossed(self, previous_temp, new_temp) -> numpy.ndarray:
+        """
+        Returns the bees with a band edge between the two temperatures.
+        :param float previous_temp: The hive temperature the bees were last updated for.
+        :param float new_temp: The new hive temperature.
+        :return: Sorted indexes of the bees to wake.
+        """
+        low, high = min(previous_temp, new_temp), max(previous_temp, new_temp)
+
+        # "temp < buzz_temp" changes when buzz_temp is in (low, high].  "temp > fan_temp" changes in [low, high).
+        buzz_start = numpy.searchsorted(self.__sorted_buzz_temps, low, side="right")
+        buzz_end = numpy.searchsorted(self.__sorted_buzz_temps, high, side="right")
+        fan_start = numpy.searchsorted(self.__sorted_fan_temps, low, side="left")
+        fan_end = numpy.searchsorted(self.__sorted_fan_temps, high, side="left")
+
+        return numpy.union1d(self.__buzz_order[buzz_start:buzz_end], self.__fan_order[fan_start:fan_end])
+
+
+class BeeThresholds:
+    """
+    The buzz and fan temps of a group of bees, sorted so the number of bees buzzing or fanning at any hive temperature
+    is a binary search.  It can't be changed after it is created, so copies share it instead of copying the arrays.
+    """
+
+    def __init__(self, buzz_temps, fan_temps):
+        """
+        Creates the thresholds for the bees, one bee per pair of buzz and fan temps.
+        :param numpy.ndarray buzz_temps: The temperature below which each bee buzzes.
+        :param numpy.ndarray fan_temps: The temperature above which each bee fans.
+        """
+        buzz_temps = numpy.asarray(buzz_temps, dtype=numpy.float64)
+        fan_temps = numpy.asarray(fan_temps, dtype=numpy.float64)
+        assert len(buzz_temps) == len(fan_temps)
+
+        # Same as the BeeThresholdIndex:  bees with the fan temp below the buzz temp start fanning at the buzz temp.
+        overlap = fan_temps < buzz_temps
+        self.__buzz_temps = BeeThresholds.__sorted(buzz_temps)
+        self.__fan_temps = BeeThresholds.__sorted(fan_temps[~overlap])
+        self.__overlap_buzz_temps = BeeThresholds.__sorted(buzz_temps[overlap])
+
+    @staticmethod
+    def __sorted(values) -> numpy.ndarray:
+        """Returns a sorted read-only copy of the values."""
+        values = numpy.sort(values)
+        values.setflags(write=False)
+        return values
+
+    def __len__(self) -> int:
+        """
+        Returns the number of bees.
+        :return: The number of bees.
+        """
+        return len(self.__buzz_temps)
+
+    def __copy__(self):
+        """Returns the thresholds since they can't be changed."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Returns the thresholds since they can't be changed."""
+        return self
+
+    def number_buzzing(self, temp) -> int:
+        """
+        Returns the number of bees that buzz at the given hive temperature.
+        :param float temp: The hive temperature.
+        :return: The number of bees with a buzz temp above the hive temperature.
+        """
+        return len(self.__buzz_temps) - int(numpy.searchsorted(self.__buzz_temps, temp, side="right"))
+
+    def number_fanning(self, temp) -> int:
+        """
+        Returns the number of bees that fan at the given hive temperature.
+        :param float temp: The hive temperature.
+        :return: The number of bees with a fan temp below the hive temperature that aren't buzzing.
+        """
+        return int(numpy.searchsorted(self.__fan_temps, temp, side="left")) + \
+            int(numpy.searchsorted(self.__overlap_buzz_temps, temp, side="right"))
+
+    def counts_at(self, temps) -> tuple:
+        """
+        Returns the number of bees buzzing and fanning at each of the hive temperatures.
+        :param numpy.ndarray temps: The hive temperatures.
+        :return: Tuple of arrays with the number of bees buzzing and fanning at each temperature.
+        """
+        return BeeThresholds._counts_at(self.__buzz_temps, self.__fan_temps, self.__overlap_buzz_temps, temps)
+
+    @staticmethod
+    def _counts_at(buzz_temps, fan_temps, overlap_buzz_temps, temps) -> tuple:
+        """Returns the number of bees buzzing and fanning at each of the temps for the sorted thresholds."""
+        buzzing = len(buzz_temps) - numpy.searchsorted(buzz_temps, temps, side="right")
+        fanning = numpy.searchsorted(fan_temps, temps, side="left") + \
+            numpy.searchsorted(overlap_buzz_temps, temps, side="right")
+        return buzzing, fanning
+
+
+class BeePopulation(Entity):
+    """
+    Represents a population of bees in the hive.  Each bee behaves exactly like a single Bee, but the whole population
+    is updated in one pass and only the aggregate counts are published, so the hive doesn't get an event per bee.
+    """
+
+    def __init__(self, buzz_temps, fan_temps, crossing_only=True, name=BEE_POPULATION_ENTITY_NAME):
+        """
+        Creates a new population of bees, one bee per pair of buzz and fan temps.
+        :param list of float buzz_temps: The minimum temperature for each bee.  Below this level it starts buzzing.
+        :param list of float fan_temps: The maximum temperature for each bee.  Above this level it starts fanning.
+        :param bool crossing_only: If true, only the bees whose buzz or fan temp was crossed by a hive temp change are
+        updated.  If false, every bee is updated on every change.
+        :param str name: The entity name.  Only changed for hives that don't use the default names, see apiary.
+        """
+        assert len(buzz_temps) == len(fan_temps)
+
+        # The per-bee state is kept private so only the counts are sent to other entities.
+        self.__buzz_temp = numpy.array(buzz_temps, dtype=numpy.float64)
+        self.__fan_temp = numpy.array(fan_temps, dtype=numpy.float64)
+        self.__is_buzzing = numpy.zeros(len(self.__buzz_temp), dtype=bool)
+        self.__is_fanning = numpy.zeros(len(self.__fan_temp), dtype=bool)
+
+        self.__subscriptions = BeeBandSubscriptions(self.__buzz_temp, self.__fan_temp) if crossing_only else None
+        self.__updated_temp = None  # the hive temp the bees were last updated for.
+
+        self.number_bees = len(self.__buzz_temp)
+        self.number_bees_buzzing = 0
+        self.number_bees_fanning = 0
+
+        # Sent with the created event so the hive can add all of the bees to its threshold index at once.
+        self.thresholds = BeeThresholds(self.__buzz_temp, self.__fan_temp)
+
+        super().__init__(name=name)
+
+    def get_state(self) -> dict:
+        """
+        Returns the state of the population for a snapshot.  The arrays are read-only views, not copies.
+        :return: Dictionary with the temps and states of the bees, the counts and the last hive temp.
+        """
+        return {"buzz_temp": self.buzz_temp, "fan_temp": self.fan_temp, "is_buzzing": self.is_buzzing,
+                "is_fanning": self.is_fanning, "crossing_only": self.__subscriptions is not None,
+                "updated_temp": self.__updated_temp, "number_bees_buzzing": self.number_bees_buzzing,
+                "number_bees_fanning": self.number_bees_fanning}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Creates a population from the state in a snapshot.
+        :param dict state: The state from get_state.
+        :return: The population in the same state.
+        """
+        population = cls(buzz_temps=state["buzz_temp"], fan_temps=state["fan_temp"],
+                         crossing_only=state["crossing_only"])
+        population.__is_buzzing[:] = state["is_buzzing"]
+        population.__is_fanning[:] = state["is_fanning"]
+        population.__updated_temp = state["updated_temp"]
+        population.number_bees_buzzing = state["number_bees_buzzing"]
+        population.number_bees_fanning = state["number_bees_fanning"]
+        return population
+
+    @property
+    def buzz_temp(self) -> numpy.ndarray:
+        """Returns a read-only view of the buzz temperature of each bee."""
+        return self.__read_only(self.__buzz_temp)
+
+    @property
+    def fan_temp(self) -> numpy.ndarray:
+        """Returns a read-only view of the fan temperature of each bee."""
+        return self.__read_only(self.__fan_temp)
+
+    @property
+    def is_buzzing(self) -> numpy.ndarray:
+        """Returns a read-only view of whether each bee is buzzing."""
+        return self.__read_only(self.__is_buzzing)
+
+    @property
+    def is_fanning(self) -> numpy.ndarray:
+        """Returns a read-only view of whether each bee is fanning."""
+        return self.__read_only(self.__is_fanning)
+
+    @staticmethod
+    def __read_only(values) -> numpy.ndarray:
+        """Returns a view of the values that can't be written to."""
+        view = values.view()
+        view.setflags(write=False)
+        return view
+
+    @entity_changed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_temperature_change(self, beehive, changed_properties) -> None:
+        """
+        Handles changes to the temperature in the hive by updating the bees at once.
+        :param Beehive beehive: The beehive that had a temp change.
+        :param dict changed_properties: The properties that changed.  Only interested in temp changes.
+        :return: None
+        """
+        if "current_temp" in changed_properties:
+            new_temp = beehive.current_temp
+
+            if self.__subscriptions is None or self.__updated_temp is None:
+                # Same rules as a single bee:  buzzing wins over fanning if the bee is outside both limits.
+                numpy.less(new_temp, self.__buzz_temp, out=self.__is_buzzing)
+                numpy.greater(new_temp, self.__fan_temp, out=self.__is_fanning)
+                self.__is_fanning &= ~self.__is_buzzing
+
+                self.number_bees_buzzing = int(numpy.count_nonzero(self.__is_buzzing))
+                self.number_bees_fanning = int(numpy.count_nonzero(self.__is_fanning))
+            else:
+                woken = self.__subscriptions.crossed(self.__updated_temp, new_temp)
+                if len(woken):
+                    was_buzzing = self.__is_buzzing[woken]
+                    was_fanning = self.__is_fanning[woken]
+                    is_buzzing = new_temp < self.__buzz_temp[woken]
+                    is_fanning = (new_temp > self.__fan_temp[woken]) & ~is_buzzing
+                    self.__is_buzzing[woken] = is_buzzing
+                    self.__is_fanning[woken] = is_fanning
+
+                    self.number_bees_buzzing += int(numpy.count_nonzero(is_buzzing)) - \
+                        int(numpy.count_nonzero(was_buzzing))
+                    self.number_bees_fanning += int(numpy.count_nonzero(is_fanning)) - \
+                        int(numpy.count_nonzero(was_fanning))
+
+            self.__updated_temp = new_temp
+
+
+class BeeThresholdIndex:
+    """
+    Keeps the buzz and fan temps of bees sorted so the number of bees buzzing or fanning at any hive temperature can be
+    found with a binary search instead of checking every bee.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty index.
+        """
+        # A bee buzzes below its buzz temp and otherwise fans above its fan temp.  When a bee's fan temp is below its
+        # buzz temp, buzzing wins until the buzz temp, so those bees start fanning at the buzz temp instead.
+        self.__buzz_temps = []  # buzz temps of all bees.
+        self.__fan_temps = []  # fan temps of bees with fan_temp >= buzz_temp.
+        self.__overlap_buzz_temps = []  # buzz temps of bees with fan_temp < buzz_temp.
+        self.__thresholds = []  # groups of bees added at once, such as populations.
+
+    def __len__(self) -> int:
+        """
+        Returns the number of bees in the index.
+        :return: The number of bees in the index.
+        """
+        return len(self.__buzz_temps) + sum([len(thresholds) for thresholds in self.__thresholds])
+
+    def add_thresholds(self, thresholds) -> None:
+        """
+        Adds a group of bees to the index at once.  The thresholds are kept as they are, not merged into the index.
+        :param BeeThresholds thresholds: The thresholds of the bees.
+        :return: None
+        """
+        self.__thresholds.append(thresholds)
+
+    def remove_thresholds(self, thresholds) -> None:
+        """
+        Removes a group of bees added with add_thresholds.
+        :param BeeThresholds thresholds: The thresholds of the bees.
+        :return: None
+        """
+        self.__thresholds.remove(thresholds)
+
+    def add(self, buzz_temp, fan_temp) -> None:
+        """
+        Adds a bee to the index.
+        :param float buzz_temp: The temperature below which the bee buzzes.
+        :param float fan_temp: The temperature above which the bee fans.
+        :return: None
+        """
+        insort(self.__buzz_temps, buzz_temp)
+        if fan_temp >= buzz_temp:
+            insort(self.__fan_temps, fan_temp)
+        else:
+            insort(self.__overlap_buzz_temps, buzz_temp)
+
+    def remove(self, buzz_temp, fan_temp) -> None:
+        """
+        Removes a bee from the index.
+        :param float buzz_temp: The temperature below which the bee buzzes.
+        :param float fan_temp: The temperature above which the bee fans.
+        :return: None
+        """
+        BeeThresholdIndex.__remove_value(self.__buzz_temps, buzz_temp)
+        if fan_temp >= buzz_temp:
+            BeeThresholdIndex.__remove_value(self.__fan_temps, fan_temp)
+        else:
+            BeeThresholdIndex.__remove_value(self.__overlap_buzz_temps, buzz_temp)
+
+    def number_buzzing(self, temp) -> int:
+        """
+        Returns the number of bees that buzz at the given hive temperature.
+        :param float temp: The hive temperature.
+        :return: The number of bees with a buzz temp above the hive temperature.
+        """
+        return len(self.__buzz_temps) - bisect_right(self.__buzz_temps, temp) + \
+            sum([thresholds.number_buzzing(temp) for thresholds in self.__thresholds])
+
+    def number_fanning(self, temp) -> int:
+        """
+        Returns the number of bees that fan at the given hive temperature.
+        :param float temp: The hive temperature.
+        :return: The number of bees with a fan temp below the hive temperature that aren't buzzing.
+        """
+        return bisect_left(self.__fan_temps, temp) + bisect_right(self.__overlap_buzz_temps, temp) + \
+            sum([thresholds.number_fanning(temp) for thresholds in self.__thresholds])
+
+    def counts_at(self, temps) -> tuple:
+        """
+        Returns the number of bees buzzing and fanning at each of the hive temperatures, such as the temps during a jump
+        in time.
+        :param numpy.ndarray temps: The hive temperatures.
+        :return: Tuple of arrays with the number of bees buzzing and fanning at each temperature.
+        """
+        buzzing, fanning = BeeThresholds._counts_at(self.__buzz_temps, self.__fan_temps, self.__overlap_buzz_temps,
+                                                    temps)
+        for thresholds in self.__thresholds:
+            group_buzzing, group_fanning = thresholds.counts_at(temps)
+            buzzing = buzzing + group_buzzing
+            fanning = fanning + group_fanning
+        return buzzing, fanning
+
+    @staticmethod
+    def __remove_value(values, value) -> None:
+        """Removes one copy of the value from the sorted list."""
+        i = bisect_left(values, value)
+        if i == len(values) or values[i] != value:
+            raise ValueError(f"{value} is not in the index")
+        del values[i]
+
+
+class BeeRegistry:
+    """
+    Keeps the state of each bee the hive knows about as a struct of arrays instead of an object per bee.  Each bee has a
+    slot with its state flags packed in a byte and its buzz and fan temps.  The slots of dead bees are reused.
+    """
+
+    # The flags in the state byte of each bee.
+    BUZZING = 1
+    FANNING = 2
+    INDEXED = 4  # the bee has buzz and fan temps.
+
+    def __init__(self):
+        """
+        Creates an empty registry.
+        """
+        self.__slots = {}  # guid -> slot
+        self.__free_slots = []
+        self.__states = bytearray()
+        self.__buzz_temps = array("d")
+        self.__fan_temps = array("d")
+
+    def __len__(self) -> int:
+        """
+        Returns the number of bees in the registry.
+        :return: The number of bees in the registry.
+        """
+        return len(self.__slots)
+
+    def __contains__(self, guid) -> bool:
+        """
+        Returns true if the bee is in the registry.
+        :param guid: The guid of the bee.
+        :return: True if the bee is in the registry.
+        """
+        return guid in self.__slots
+
+    def add(self, guid, is_buzzing, is_fanning, buzz_temp=None, fan_temp=None) -> None:
+        """
+        Adds a bee to the registry.
+        :param guid: The guid of the bee.
+        :param bool is_buzzing: True if the bee is buzzing.
+        :param bool is_fanning: True if the bee is fanning.
+        :param float buzz_temp: The temperature below which the bee buzzes, or None if it isn't known.
+        :param float fan_temp: The temperature above which the bee fans, or None if it isn't known.
+        :return: None
+        """
+        if guid in self.__slots:
+            raise ValueError(f"bee {guid} is already registered")
+
+        state = BeeRegistry.__state(is_buzzing, is_fanning)
+        if buzz_temp is not None and fan_temp is not None:
+            state |= BeeRegistry.INDEXED
+        else:
+            buzz_temp, fan_temp = 0.0, 0.0
+
+        if self.__free_slots:
+            slot = self.__free_slots.pop()
+            self.__states[slot] = state
+            self.__buzz_temps[slot] = buzz_temp
+            self.__fan_temps[slot] = fan_temp
+        else:
+            slot = len(self.__states)
+            self.__states.append(state)
+            self.__buzz_temps.append(buzz_temp)
+            self.__fan_temps.append(fan_temp)
+        self.__slots[guid] = slot
+
+    def update(self, guid, is_buzzing, is_fanning) -> int:
+        """
+        Updates whether a bee is buzzing or fanning.
+        :param guid: The guid of the bee.
+        :param bool is_buzzing: True if the bee is buzzing.
+        :param bool is_fanning: True if the bee is fanning.
+        :return: The previous state flags of the bee.
+        """
+        slot = self.__slots[guid]
+        previous_state = self.__states[slot]
+        self.__states[slot] = (previous_state & BeeRegistry.INDEXED) | BeeRegistry.__state(is_buzzing, is_fanning)
+        return previous_state
+
+    def remove(self, guid) -> tuple:
+        """
+        Removes a bee from the registry.  Its slot is reused for the next bee added.
+        :param guid: The guid of the bee.
+        :return: Tuple of the state flags, buzz temp and fan temp of the bee.  The temps are None if they weren't known.
+        """
+        slot = self.__slots.pop(guid)
+        self.__free_slots.append(slot)
+
+        state = self.__states[slot]
+        if state & BeeRegistry.INDEXED:
+            return state, self.__buzz_temps[slot], self.__fan_temps[slot]
+        return state, None, None
+
+    @staticmethod
+    def __state(is_buzzing, is_fanning) -> int:
+        """Returns the state flags."""
+        return (BeeRegistry.BUZZING if is_buzzing else 0) | (BeeRegistry.FANNING if is_fanning else 0)
+
+
 class Beehive(Entity):
     """Represents a beehive for which a range of temperatures is to be met."""
 
-    def __init__(self, start_temp, buzzing_impact, fanning_impact) -> None:
+    def __init__(self, start_temp, buzzing_impact, fanning_impact, name=BEEHIVE_ENTITY_NAME) -> None:
         """
         Creates a beehive with a standard range of healthy temperatures.
         :param float start_temp: The starting temperature for the beehive.
         :param float buzzing_impact: The impact on temperature for any given bee buzzing.
         :param float fanning_impact: The impact on temperature for any given bee fanning.
+        :param str name: The entity name.  Only changed for hives that don't use the default names, see apiary.
         :returns: None
         """
         self.current_temp = start_temp
@@ -84,23 +563,74 @@ class Beehive(Entity):
         self.number_bees_buzzing = 0
         self.number_bees_fanning = 0
 
-        self.__known_bees = {}  # keeps track of bees so we know their state.
+        self.__known_bees = BeeRegistry()  # keeps track of bees so we know their state.
+        self.__known_populations = {}  # keeps track of bee populations so we know their counts.
 
-        super().__init__(name=BEEHIVE_ENTITY_NAME)
+        # Bees that have known buzz and fan temps are also counted from the threshold index.  The counts from their
+        # events are kept separately so they can be swapped for the index counts.
+        self.__threshold_index = BeeThresholdIndex()
+        self.__indexed_bees_buzzing = 0
+        self.__indexed_bees_fanning = 0
+        self.__bees_notified = False  # true once the bees have been sent a hive temp.
+
+        super().__init__(name=name)
 
     def get_number_bees_buzzing(self) -> int:
         """
-        Returns the number of bees buzzing.
+        Returns the number of bees buzzing.  Bees with known temps are counted for the current hive temp, even if their
+        updates haven't arrived yet.
         :return: The number of bees buzzing.
         """
-        return sum([1 for b in self.__known_bees.values() if b.is_buzzing])
+        if not self.__bees_notified:
+            return self.number_bees_buzzing
+        return self.number_bees_buzzing - self.__indexed_bees_buzzing + \
+            self.__threshold_index.number_buzzing(self.current_temp)
 
     def get_number_bees_fanning(self) -> int:
         """
-        Returns the number of bees fanning.
+        Returns the number of bees fanning.  Bees with known temps are counted for the current hive temp, even if their
+        updates haven't arrived yet.
         :return: The number of bees fanning.
         """
-        return sum([1 for b in self.__known_bees.values() if b.is_fanning])
+        if not self.__bees_notified:
+            return self.number_bees_fanning
+        return self.number_bees_fanning - self.__indexed_bees_fanning + \
+            self.__threshold_index.number_fanning(self.current_temp)
+
+    def get_state(self) -> dict:
+        """
+        Returns the state of the hive for a snapshot.  The known bees aren't included since they are the bees and
+        populations in the snapshot.
+        :return: Dictionary with the temps, impacts and counters.
+        """
+        return {"current_temp": self.current_temp, "outside_temp": self._outside_temp,
+                "buzzing_impact": self.buzzing_impact, "fanning_impact": self.fanning_impact,
+                "bees_notified": self.__bees_notified, "number_bees": self.number_bees,
+                "number_bees_buzzing": self.number_bees_buzzing, "number_bees_fanning": self.number_bees_fanning}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Creates a hive from the state in a snapshot.  The hive starts with no bees.  The known bees and counters are
+        built again from the created events as the bees and populations from the snapshot are added after it.
+        :param dict state: The state from get_state.
+        :return: The hive at the same temps.
+        """
+        beehive = cls(start_temp=state["current_temp"], buzzing_impact=state["buzzing_impact"],
+                      fanning_impact=state["fanning_impact"])
+        beehive._outside_temp = state["outside_temp"]
+        beehive.__bees_notified = state["bees_notified"]
+        return beehive
+
+    @staticmethod
+    def __is_indexed(bee) -> bool:
+        """Returns true if the bee has buzz and fan temps so it can be kept in the threshold index."""
+        return getattr(bee, "buzz_temp", None) is not None and getattr(bee, "fan_temp", None) is not None
+
+    @staticmethod
+    def __has_thresholds(population) -> bool:
+        """Returns true if the population sent its thresholds so its bees can be kept in the threshold index."""
+        return getattr(population, "thresholds", None) is not None
 
     @entity_changed_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
     def handle_outside_temperature_update(self, outside_temperature, changed_properties) -> None:
@@ -122,20 +652,72 @@ class Beehive(Entity):
         """
         assert new_time > previous_time
 
-        # Note that weird things might happen if there are jumps in time because the bees may have state changes that
-        # were missed.
+        # A jump in time steps every minute until the bees with known temps are quiet, then integrates blocks of
+        # minutes with the closed form from the kernel, the same as its adaptive mode.  Each block is cut at the first
+        # minute where the threshold index says a bee with known temps changes state or the hive crosses the outside
+        # temp, so those bees change state during the jump the same as if every minute was stepped.  Bees without
+        # known temps keep their last state until their updates arrive.
+        steps = new_time - previous_time
+        quiet_steps = 0  # steps in a row where nothing changed.
+        block_size = QUIET_STEPS
+        while steps > 0:
+            if steps == 1 or quiet_steps < QUIET_STEPS or not self.__bees_notified:
+                previous_temp = self.current_temp
+                previous_counts = (self.get_number_bees_buzzing(), self.get_number_bees_fanning())
+                warmer_outside = self._outside_temp > previous_temp
+                self.__step()
+                steps -= 1
+                if self.current_temp == previous_temp:  # the same temp gives the same step for the rest of the jump.
+                    break
+
+                if steps and previous_counts == (self.get_number_bees_buzzing(), self.get_number_bees_fanning()) and \
+                        (self._outside_temp > self.current_temp) == warmer_outside:
+                    quiet_steps += 1
+                else:
+                    quiet_steps = 0
+                    block_size = QUIET_STEPS
+                continue
+
+            # a block of minutes, assuming nothing changes.
+            bee_impact = (self.get_number_bees_buzzing() * self.buzzing_impact) - \
+                         (self.get_number_bees_fanning() * self.fanning_impact)
+            warmer_outside = self._outside_temp > self.current_temp
+            size = min(block_size, steps)
+            block_temps = integrate_steps(self.current_temp, numpy.full(size, self._outside_temp), bee_impact,
+                                          warmer_outside)
+
+            # the block is good up to and including the first minute where the bees change or the hive crosses the
+            # outside temp, since the step to it still used the old state.
+            block_buzzing, block_fanning = self.__threshold_index.counts_at(block_temps)
+            changes = numpy.flatnonzero((block_buzzing != self.__threshold_index.number_buzzing(self.current_temp)) |
+                                        (block_fanning != self.__threshold_index.number_fanning(self.current_temp)) |
+                                        ((self._outside_temp > block_temps) != warmer_outside))
+            used = int(changes[0]) + 1 if len(changes) else size
+            self.current_temp = float(block_temps[used - 1])
+            steps -= used
+
+            if used == size:  # longer blocks while nothing changes.
+                block_size = min(block_size * 2, MAX_ADAPTIVE_STEPS)
+            else:  # back to single steps while the bees are busy.
+                quiet_steps = 0
+                block_size = QUIET_STEPS
+
+    def __step(self) -> None:
+        """Calculates the temp of the hive after one minute."""
         bee_impact = (self.get_number_bees_buzzing() * self.buzzing_impact) - \
                      (self.get_number_bees_fanning() * self.fanning_impact)
-        total_bee_impact = bee_impact * (new_time - previous_time)
 
-        # The impact of the outside temp is 20% of the difference.  So the warmer it gets, the more the hive wants
-        # to heat.  Reverse for cooler.
+        # The impact of the outside temp is 20% of the difference.  So the warmer it gets, the more the hive wants to
+        # heat.  Reverse for cooler.
         if self._outside_temp > self.current_temp:
             outside_temp_impact = .2 * (self._outside_temp - self.current_temp)
         else:
             outside_temp_impact = .2 * (self.current_temp - self._outside_temp)
 
-        self.current_temp = self.current_temp + outside_temp_impact + total_bee_impact
+        new_temp = self.current_temp + outside_temp_impact + bee_impact
+        if new_temp != self.current_temp:
+            self.__bees_notified = True
+        self.current_temp = new_temp
 
     @entity_created_event_handler(entity_name=BEE_ENTITY_NAME)
     def handle_new_bee(self, bee) -> None:
@@ -145,13 +727,20 @@ class Beehive(Entity):
         :return: None
         """
         self.number_bees += 1
-        self.__known_bees[bee.guid] = bee
 
         if bee.is_fanning:
             self.number_bees_fanning += 1
         if bee.is_buzzing:
             self.number_bees_buzzing += 1
 
+        if Beehive.__is_indexed(bee):
+            self.__known_bees.add(bee.guid, bee.is_buzzing, bee.is_fanning, bee.buzz_temp, bee.fan_temp)
+            self.__threshold_index.add(bee.buzz_temp, bee.fan_temp)
+            self.__indexed_bees_fanning += 1 if bee.is_fanning else 0
+            self.__indexed_bees_buzzing += 1 if bee.is_buzzing else 0
+        else:
+            self.__known_bees.add(bee.guid, bee.is_buzzing, bee.is_fanning)
+
     @entity_destroyed_event_handler(entity_name=BEE_ENTITY_NAME)
     def handle_dead_bee(self, bee) -> None:
         """
@@ -160,13 +749,19 @@ class Beehive(Entity):
         :return: None
         """
         self.number_bees -= 1
-        bee = self.__known_bees.pop(bee.guid)
+        state, buzz_temp, fan_temp = self.__known_bees.remove(bee.guid)
+        was_buzzing, was_fanning = bool(state & BeeRegistry.BUZZING), bool(state & BeeRegistry.FANNING)
 
-        if bee.is_fanning:
+        if was_fanning:
             self.number_bees_fanning -= 1
-        if bee.is_buzzing:
+        if was_buzzing:
             self.number_bees_buzzing -= 1
 
+        if state & BeeRegistry.INDEXED:
+            self.__threshold_index.remove(buzz_temp, fan_temp)
+            self.__indexed_bees_fanning -= 1 if was_fanning else 0
+            self.__indexed_bees_buzzing -= 1 if was_buzzing else 0
+
     @entity_changed_event_handler(entity_name=BEE_ENTITY_NAME)
     def handle_bee_update(self, bee, changed_properties) -> None:
         """
@@ -177,48 +772,129 @@ class Beehive(Entity):
         """
         assert bee and changed_properties
 
-        prev_bee = self.__known_bees[bee.guid]  # gets the previous state of the bee.
-        self.__known_bees[bee.guid] = bee
+        previous_state = self.__known_bees.update(bee.guid, bee.is_buzzing, bee.is_fanning)
+        fanning_change = int(bool(bee.is_fanning)) - int(bool(previous_state & BeeRegistry.FANNING))
+        buzzing_change = int(bool(bee.is_buzzing)) - int(bool(previous_state & BeeRegistry.BUZZING))
 
-        if prev_bee.is_fanning and not bee.is_fanning:  # was fanning and isn't now.
-            self.number_bees_fanning -= 1
-        if bee.is_fanning and not prev_bee.is_fanning:  # wasn't fanning and is now.
-            self.number_bees_fanning += 1
+        self.number_bees_fanning += fanning_change
+        self.number_bees_buzzing += buzzing_change
 
-        if prev_bee.is_buzzing and not bee.is_buzzing:  # was buzzing and isn't now.
-            self.number_bees_buzzing -= 1
-        if bee.is_buzzing and not prev_bee.is_buzzing:  # wasn't buzzing and is now.
-            self.number_bees_buzzing += 1
+        if previous_state & BeeRegistry.INDEXED:
+            self.__indexed_bees_fanning += fanning_change
+            self.__indexed_bees_buzzing += buzzing_change
+
+    @entity_created_event_handler(entity_name=BEE_POPULATION_ENTITY_NAME)
+    def handle_new_population(self, population) -> None:
+        """
+        Handle a new bee population being created.
+        :param RemoteEntity population: The population that was created.
+        :return: None
+        """
+        self.__known_populations[population.guid] = population
+
+        self.number_bees += population.number_bees
+        self.number_bees_buzzing += population.number_bees_buzzing
+        self.number_bees_fanning += population.number_bees_fanning
+
+        # All of the bees are added to the threshold index in one go, so they are counted the same as single bees.
+        if Beehive.__has_thresholds(population):
+            self.__threshold_index.add_thresholds(population.thresholds)
+            self.__indexed_bees_buzzing += population.number_bees_buzzing
+            self.__indexed_bees_fanning += population.number_bees_fanning
+
+    @entity_destroyed_event_handler(entity_name=BEE_POPULATION_ENTITY_NAME)
+    def handle_dead_population(self, population) -> None:
+        """
+        Handle a bee population being destroyed.
+        :param RemoteEntity population: The population that was destroyed.
+        :return: None
+        """
+        population = self.__known_populations.pop(population.guid)
+
+        self.number_bees -= population.number_bees
+        self.number_bees_buzzing -= population.number_bees_buzzing
+        self.number_bees_fanning -= population.number_bees_fanning
+
+        if Beehive.__has_thresholds(population):
+            self.__threshold_index.remove_thresholds(population.thresholds)
+            self.__indexed_bees_buzzing -= population.number_bees_buzzing
+            self.__indexed_bees_fanning -= population.number_bees_fanning
+
+    @entity_changed_event_handler(entity_name=BEE_POPULATION_ENTITY_NAME)
+    def handle_population_update(self, population, changed_properties) -> None:
+        """
+        Handles bee populations changing.  Only the counts are used, so there is one update per population.
+        :param RemoteEntity population: The population that changed.
+        :param list of str changed_properties: The properties that changed.
+        :return: None
+        """
+        assert population and changed_properties
+
+        prev_population = self.__known_populations[population.guid]  # gets the previous counts.
+        self.__known_populations[population.guid] = population
+
+        buzzing_change = population.number_bees_buzzing - prev_population.number_bees_buzzing
+        fanning_change = population.number_bees_fanning - prev_population.number_bees_fanning
+        self.number_bees += population.number_bees - prev_population.number_bees
+        self.number_bees_buzzing += buzzing_change
+        self.number_bees_fanning += fanning_change
+
+        if Beehive.__has_thresholds(prev_population):
+            self.__indexed_bees_buzzing += buzzing_change
+            self.__indexed_bees_fanning += fanning_change
 
 
 class OutsideTemperature(Entity):
     """Represents the outside temperature that varies throughout the day."""
 
-    def __init__(self, min_temp=50.0, max_temp=80.0) -> None:
+    def __init__(self, min_temp=50.0, max_temp=80.0, resolution=1.0, start_time=0) -> None:
         """
         Creates a new outside temperature.  The range of temperatures is fixed and will vary throughout the day.
         :param float min_temp:  The minimum temperature of the beehive to maintain in degrees F.  Default 50.0F
         :param float max_temp:  The maximum temperature of the beehive to maintain in degrees F.  Default 80.0F
+        :param float resolution:  The minutes between temps in the profile.  None calculates the temp for each time
+        instead of using a profile.  Default 1 minute.
+        :param int start_time:  The minutes into the day when the simulation starts.  Default 0, the coolest time.
         """
         assert min_temp is not None
         assert max_temp is not None
 
         self.min_temp = float(min_temp)
         self.max_temp = float(max_temp)
+        self.resolution = resolution
+        self.start_time = start_time
 
-        # Temp only varies by time of day, so just create a an array that pre-calculates the temps.
-        self.__increment_change = (self.max_temp - self.min_temp) / (
-                    24 * 60 / 2)  # increment over half days up and down.
-        self.__minute_temps = []
-        for minute in range(0, int(12 * 60)):  # calculate increasing temps
-            self.__minute_temps.append(self.min_temp + self.__increment_change * minute)
-        for minute in range(0, int(12 * 60)):  # calculate decreasing
-            self.__minute_temps.append(self.max_temp - self.__increment_change * minute)
-
-        self.current_temp = self.__minute_temps[0]
+        # Temp only varies by time of day, so the temps are pre-calculated in a profile shared with other instances.
+        if resolution is not None:
+            self.__profile = outside_temperature_profile(min_temp=self.min_temp, max_temp=self.max_temp,
+                                                         resolution=resolution)
+        self.current_temp = self.__temperature_at(start_time)
 
         super().__init__(name=OUTSIDE_TEMPERATURE_NAME)
 
+    def get_state(self) -> dict:
+        """
+        Returns the state of the outside temperature for a snapshot.
+        :return: Dictionary with the range, resolution, start time and current temp.
+        """
+        return {"min_temp": self.min_temp, "max_temp": self.max_temp, "resolution": self.resolution,
+                "start_time": self.start_time, "current_temp": self.current_temp}
+
+    @classmethod
+    def from_state(cls, state, elapsed_time=0):
+        """
+        Creates an outside temperature from the state in a snapshot.
+        :param dict state: The state from get_state.  Without a current_temp, such as when the range was changed, the
+        temp is worked out from the range at the time of day.
+        :param int elapsed_time: The simulation time of the snapshot.  The new outside temperature starts from there.
+        :return: The outside temperature at the same time of day.
+        """
+        outside_temperature = cls(min_temp=state["min_temp"], max_temp=state["max_temp"],
+                                  resolution=state["resolution"], start_time=state["start_time"] + elapsed_time)
+        if state.get("current_temp") is not None:
+            outside_temperature.current_temp = state["current_temp"]
+        return outside_temperature
+
     @time_update_event_handler
     def handle_time_update(self, previous_time, new_time) -> None:
         """Handles the time changing to calculate the temp of the hive.
@@ -226,36 +902,92 @@ class OutsideTemperature(Entity):
         :param int new_time: The new simulation time.
         """
         assert previous_time is not None
-        self.current_temp = self.__minute_temps[new_time % len(self.__minute_temps)]
+        self.current_temp = self.__temperature_at(new_time + self.start_time)
+
+    def __temperature_at(self, time) -> float:
+        """Returns the temp at the time of day."""
+        if self.resolution is not None:
+            return float(self.__profile[int(time // self.resolution) % len(self.__profile)])
+        return float(outside_temperatures_at(time, min_temp=self.min_temp, max_temp=self.max_temp))
+
+
+def _stat_property(series, stat):
+    """Returns a read-only property for one statistic of a series kept by the display model."""
+    return property(lambda self: getattr(self.stats[series], stat), doc=f"Returns the {stat} {series} so far.")
 
 
 class BeehiveDisplayModel(Entity):
     """Manages content for display by the application.  Used instead of the beehive display class."""
 
-    def __init__(self):
+    # The series that statistics are kept for.
+    STAT_SERIES = ["outside_temp", "hive_temp", "number_bees", "number_bees_buzzing", "number_bees_fanning"]
+
+    # The values kept by the display model in a snapshot, as well as the statistics.
+    STATE_PROPERTIES = ["outside_temp", "previous_time", "new_time"]
+
+    # The length of the window for the recent min and max, one day of simulation minutes.
+    STATS_WINDOW = 24 * 60
+
+    min_outside_temp = _stat_property("outside_temp", "min")
+    max_outside_temp = _stat_property("outside_temp", "max")
+    min_hive_temp = _stat_property("hive_temp", "min")
+    max_hive_temp = _stat_property("hive_temp", "max")
+    min_number_bees = _stat_property("number_bees", "min")
+    max_number_bees = _stat_property("number_bees", "max")
+    min_number_bees_buzzing = _stat_property("number_bees_buzzing", "min")
+    max_number_bees_buzzing = _stat_property("number_bees_buzzing", "max")
+    min_number_bees_fanning = _stat_property("number_bees_fanning", "min")
+    max_number_bees_fanning = _stat_property("number_bees_fanning", "max")
+
+    def __init__(self, window=STATS_WINDOW):
         """
         Creates a new beehive display model.
+        :param int window: The length of time for the recent min and max of each series.
         """
         super().__init__(name=BEEHIVE_DISPLAY_MODEL_NAME)
 
         self.beehive = None
         self.outside_temp = None
 
-        # mins are set to a very large number so they will be properly set the next time.
-        self.min_outside_temp = 1000000
-        self.max_outside_temp = 0
-        self.min_hive_temp = 1000000
-        self.max_hive_temp = 0
-        self.min_number_bees = 1000000
-        self.max_number_bees = 0
-        self.min_number_bees_buzzing = 1000000
-        self.max_number_bees_buzzing = 0
-        self.min_number_bees_fanning = 1000000
-        self.max_number_bees_fanning = 0
+        # the stats for each series, private so they aren't sent as entity properties.  The mins and maxes are None
+        # until there is a value.
+        self.__stats = {series: StreamingStats(window=window) for series in BeehiveDisplayModel.STAT_SERIES}
 
         self.previous_time = -1
         self.new_time = 0
 
+    @property
+    def stats(self) -> dict:
+        """Returns the StreamingStats for each of the STAT_SERIES."""
+        return self.__stats
+
+    def get_state(self) -> dict:
+        """
+        Returns the statistics for a snapshot.  The beehive isn't included, it is set again when the hive changes.
+        :return: Dictionary with the values and the state of the stats for each series.
+        """
+        state = {name: getattr(self, name) for name in BeehiveDisplayModel.STATE_PROPERTIES}
+        state["stats"] = {series: stats.get_state() for series, stats in self.stats.items()}
+        return state
+
+    @classmethod
+    def from_state(cls, state, elapsed_time=0):
+        """
+        Creates a display model from the statistics in a snapshot.
+        :param dict state: The state from get_state.
+        :param int elapsed_time: The simulation time of the snapshot.  The times are moved back by it for a new
+        simulation that starts at time 0.
+        :return: The display model with the same statistics.
+        """
+        display_model = cls()
+        for name in BeehiveDisplayModel.STATE_PROPERTIES:
+            setattr(display_model, name, state[name])
+        display_model.previous_time -= elapsed_time
+        display_model.new_time -= elapsed_time
+        display_model.__stats = {series: StreamingStats.from_state(stats, elapsed_time)
+                                 for series, stats in state["stats"].items()}
+        return display_model
+
     @entity_changed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
     def handle_beehive_changed(self, beehive, changed_properties) -> None:
         """
@@ -266,15 +998,10 @@ class BeehiveDisplayModel(Entity):
         assert changed_properties is not None
         self.beehive = beehive
 
-        self.min_hive_temp = min(self.min_hive_temp, beehive.current_temp)
-        self.max_hive_temp = max(self.max_hive_temp, beehive.current_temp)
-
-        self.min_number_bees = min(self.min_number_bees, beehive.number_bees)
-        self.max_number_bees = max(self.max_number_bees, beehive.number_bees)
-        self.min_number_bees_fanning = min(self.min_number_bees_fanning, beehive.number_bees_fanning)
-        self.max_number_bees_fanning = max(self.max_number_bees_fanning, beehive.number_bees_fanning)
-        self.min_number_bees_buzzing = min(self.min_number_bees_buzzing, beehive.number_bees_buzzing)
-        self.max_number_bees_buzzing = max(self.max_number_bees_buzzing, beehive.number_bees_buzzing)
+        self.stats["hive_temp"].update(beehive.current_temp, self.new_time)
+        self.stats["number_bees"].update(beehive.number_bees, self.new_time)
+        self.stats["number_bees_buzzing"].update(beehive.number_bees_buzzing, self.new_time)
+        self.stats["number_bees_fanning"].update(beehive.number_bees_fanning, self.new_time)
 
     @entity_changed_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
     def handle_temp_changed(self, temp, changed_properties) -> None:
@@ -285,8 +1012,7 @@ class BeehiveDisplayModel(Entity):
         """
         assert changed_properties
         self.outside_temp = temp.current_temp
-        self.min_outside_temp = min(self.min_outside_temp, self.outside_temp)
-        self.max_outside_temp = max(self.max_outside_temp, self.outside_temp)
+        self.stats["outside_temp"].update(self.outside_temp, self.new_time)
 
     @time_update_event_handler
     def handle_time_update(self, previous_time, new_time) -> None:
@@ -0,0 +1,156 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+The data behind the live charts of qt_beehive.  The simulation appends a row per step to a fixed size ring buffer, and
+the display copies it out at its own frame rate and reduces it to a min and max per pixel column, so drawing costs the
+same however long the history is.  The latest display statistics are handed over in a double buffer.  Neither side
+uses Qt, so the simulation never waits for a redraw.
+"""
+
+import threading
+
+import numpy
+
+
+class RingBuffer:
+    """
+    Keeps the latest rows of a time series in preallocated arrays, one per field.  Rows are appended by the simulation
+    thread and copied out by the display thread.
+    """
+
+    def __init__(self, fields, capacity=65536):
+        """
+        Creates an empty buffer.
+        :param list of str fields: The fields in each row, after the time.
+        :param int capacity: The number of rows kept.  Older rows are overwritten.
+        """
+        assert capacity > 0
+        self.__fields = list(fields)
+        self.__times = numpy.zeros(capacity, dtype=numpy.int64)
+        self.__values = numpy.full((len(self.__fields), capacity), numpy.nan)
+        self.__appended = 0  # rows appended since the buffer was created.
+        self.__lock = threading.Lock()
+
+    @property
+    def fields(self) -> list:
+        """Returns the fields in each row, after the time."""
+        return list(self.__fields)
+
+    @property
+    def capacity(self) -> int:
+        """Returns the number of rows kept."""
+        return len(self.__times)
+
+    @property
+    def version(self) -> int:
+        """Returns the number of rows appended so far, so readers can tell if anything is new."""
+        return self.__appended
+
+    def __len__(self) -> int:
+        """
+        Returns the number of rows in the buffer.
+        :return: The number of rows, at most the capacity.
+        """
+        return min(self.__appended, len(self.__times))
+
+    def append(self, time, values) -> None:
+        """
+        Adds a row, overwriting the oldest row if the buffer is full.
+        :param int time: The simulation time of the row.
+        :param list of float values: The value of each field.  None is kept as not a number.
+        """
+        with self.__lock:
+            slot = self.__appended % len(self.__times)
+            self.__times[slot] = time
+            self.__values[:, slot] = [numpy.nan if value is None else value for value in values]
+            self.__appended += 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of the rows, oldest first.
+        :return: Dictionary with the "time" and an array for each field.
+        """
+        with self.__lock:
+            end = self.__appended % len(self.__times)
+            if self.__appended <= len(self.__times):  # not wrapped yet, so the rows start at the beginning.
+                times, values = self.__times[:self.__appended].copy(), self.__values[:, :self.__appended].copy()
+            else:  # wrapped, so the oldest row is at the end.
+                times = numpy.concatenate([self.__times[end:], self.__times[:end]])
+                values = numpy.concatenate([self.__values[:, end:], self.__values[:, :end]], axis=1)
+
+        snapshot = {"time": times}
+        snapshot.update(zip(self.__fields, values))
+        return snapshot
+
+
+def decimate_min_max(times, values, columns) -> tuple:
+    """
+    Reduces a series to the min and max in each of a number of columns, such as the pixel columns of a chart.  Drawing
+    a line through the mins and maxes shows every spike, unlike taking every n-th value.
+    :param numpy.ndarray times: The time of each value, in order.
+    :param numpy.ndarray values: The values.  Not a number is ignored.
+    :param int columns: The number of columns.
+    :return: Tuple of the first time, the min and the max in each column.  Series shorter than the number of columns
+    are returned as they are.
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    if len(values) <= columns:
+        return numpy.asarray(times), values, values
+
+    starts = numpy.linspace(0, len(values), columns, endpoint=False).astype(numpy.int64)
+    mins = numpy.fmin.reduceat(values, starts)
+    maxs = numpy.fmax.reduceat(values, starts)
+    return numpy.asarray(times)[starts], mins, maxs
+
+
+class DoubleBuffer:
+    """
+    Hands the latest snapshot from the simulation thread to the display thread without a lock.  The writer fills the
+    back slot and then flips which slot is the front, so the reader always gets a whole snapshot.  Snapshots must not
+    be changed after they are published, such as tuples.
+    """
+
+    def __init__(self, initial=None):
+        """
+        Creates a buffer with the initial snapshot in the front.
+        :param initial: The snapshot before any are published.
+        """
+        self.__slots = [initial, initial]
+        self.__front = 0
+        self.__published = 0
+
+    @property
+    def version(self) -> int:
+        """Returns the number of snapshots published so far, so readers can tell if anything is new."""
+        return self.__published
+
+    def publish(self, snapshot) -> None:
+        """
+        Makes the snapshot the latest one.  Only one thread may publish.
+        :param snapshot: The snapshot, which isn't changed afterwards.
+        """
+        back = 1 - self.__front
+        self.__slots[back] = snapshot
+        self.__front = back  # a single assignment, so the reader sees either the old or the new front.
+        self.__published += 1
+
+    def latest(self):
+        """
+        Returns the latest snapshot.
+        :return: The snapshot most recently published.
+        """
+        return self.__slots[self.__front]
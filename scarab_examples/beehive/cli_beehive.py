@@ -18,16 +18,38 @@ Command line version of beehive that writes the output to the terminal.
 """
 
 import argparse
+import contextlib
 import random
+import sys
 
+import numpy
+
+from scarab_examples.beehive import kernel
 from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.event_log import EventLogRecorder
+from scarab_examples.beehive.output import REPORT_WRITERS, create_kernel_reports, create_report
+from scarab_examples.beehive.partitioned import PartitionedBeePopulation
+from scarab_examples.beehive.profiling import HandlerProfiler
+from scarab_examples.beehive.recorder import TimeSeriesRecorder
+from scarab_examples.beehive.telemetry import TelemetryPublisher, TelemetryServer
+from scarab_examples.beehive.weather import WeatherOutsideTemperature, WeatherSource
 from scarab.loggers import StdOutLogger
 from scarab.simulation import Simulation, SIMULATION_LOGGING
 # from scarab.simulation import Simulation, SIMULATION_LOGGING, EVENT_LOGGING, ENTITY_LOGGING
 
-StdOutLogger(topics=SIMULATION_LOGGING)
-# StdOutLogger(topics=EVENT_LOGGING)
-# StdOutLogger(topics=ENTITY_LOGGING)
+OUTPUT_BUFFER_SIZE = 1 << 20  # output file buffer so long runs write in large blocks.
+
+# The hive used by both the simulation and the adaptive run.  The values are arbitrary, but they give a hive that has
+# to work to stay in range.
+BUZZING_IMPACT = 0.5
+FANNING_IMPACT = 0.5
+MIN_OUTSIDE_TEMP = 50.0
+MAX_OUTSIDE_TEMP = 90.0
+TARGET_BEE_BUZZING = 60.0
+TARGET_BEE_FANNING = 65.0
+
+# Options that need the entities, so they can't be used with the adaptive run.
+ENTITY_OPTIONS = ["bee_model", "profile", "record", "event_log", "telemetry_port"]
 
 
 class BeehiveApp:
@@ -38,44 +60,199 @@ class BeehiveApp:
         Creates a new beehive display.
         """
         self.display_model = None
+        self.report_writer = None
 
     def main(self):
         """Runs the application."""
         args = BeehiveApp.get_args()
 
-        print("Running the beehive simulation.")
-        print(args)
+        # Only text output goes to the terminal with the messages.  Other formats keep stdout for the records.
+        messages = sys.stdout if args.output == "text" or args.output_file else sys.stderr
+        if messages is sys.stdout:
+            StdOutLogger(topics=SIMULATION_LOGGING)
+            # StdOutLogger(topics=EVENT_LOGGING)
+            # StdOutLogger(topics=ENTITY_LOGGING)
+
+        print("Running the beehive simulation.", file=messages)
+        print(args, file=messages)
+
+        if args.seed is not None:
+            random.seed(args.seed)
+
+        # Everything that is set up is undone in the finally, even if a later step fails.
+        profiler = None
+        output = None
+        telemetry = None
+        closers = contextlib.ExitStack()  # closes the entities that hold resources once the simulation is done.
+        try:
+            # The handlers have to be wrapped before the entities are created.
+            if args.profile:
+                profiler = HandlerProfiler()
+                profiler.install()
+
+            writer_class = REPORT_WRITERS[args.output]
+            if args.output_file:
+                output = open(args.output_file, "wb" if writer_class.binary else "w", buffering=OUTPUT_BUFFER_SIZE)
+                report_output = output
+            else:
+                report_output = sys.stdout.buffer if writer_class.binary else sys.stdout
+            # text goes out as it happens, the other formats in batches.
+            self.report_writer = writer_class(output=report_output, batch_size=1 if args.output == "text" else 256)
+
+            if args.telemetry_port is not None:
+                telemetry = TelemetryServer(port=args.telemetry_port)
+                telemetry.start()
+                print(f"Telemetry at http://{telemetry.host}:{telemetry.port}/history and "
+                      f"ws://{telemetry.host}:{telemetry.port}/stream", file=messages)
+
+            if args.adaptive:
+                self.run_adaptive(args)
+                return
+
+            with Simulation(name="beehive", time_stepped=True, minimum_step_time=args.step_length) as simulation:
+
+                # The recorders and telemetry are added first so they see the other entities being created.
+                if args.record:
+                    recorder = TimeSeriesRecorder(path=args.record)
+                    closers.callback(recorder.close)
+                    simulation.add_entity(recorder)
+                if args.event_log:
+                    event_log = EventLogRecorder(path=args.event_log)
+                    closers.callback(event_log.close)
+                    simulation.add_entity(event_log)
+                if telemetry:
+                    simulation.add_entity(TelemetryPublisher(server=telemetry))
+
+                self.display_model = BeehiveApp.create_entities(simulation=simulation,
+                                                                number_bees=args.number_bees,
+                                                                bee_variance=args.bee_variance,
+                                                                bee_model=args.bee_model,
+                                                                weather_file=args.weather_file,
+                                                                weather_sample_minutes=args.weather_sample_minutes,
+                                                                bee_workers=args.bee_workers,
+                                                                closers=closers)
+
+                for step in range(1, args.max_steps, args.report_every):
+                    simulation.advance_and_wait(steps=args.report_every)
+                    self.update_display()
+        finally:
+            closers.close()
+            if telemetry:
+                telemetry.stop()
+            if self.report_writer:
+                self.report_writer.close()
+            if output is not None:
+                output.close()
+
+            if profiler:
+                profiler.uninstall()
+                print("Handler profile:", file=messages)
+                print(profiler.report(), file=messages)
+
+    def run_adaptive(self, args) -> None:
+        """
+        Runs the headless kernel, jumping over the stretches where the bees don't change, and writes the same reports
+        as the simulation.
+        :param argparse.Namespace args: The command line arguments.
+        """
+        buzz_temps, fan_temps = BeehiveApp.create_bee_temps(number_bees=args.number_bees,
+                                                            bee_variance=args.bee_variance,
+                                                            target_bee_buzzing=TARGET_BEE_BUZZING,
+                                                            target_bee_fanning=TARGET_BEE_FANNING)
 
-        with Simulation(name="beehive", time_stepped=True, minimum_step_time=args.step_length) as simulation:
+        # the same number of steps as the simulation runs.
+        max_steps = len(range(1, args.max_steps, args.report_every)) * args.report_every
+        outside_temps = None
+        if args.weather_file:
+            source = WeatherSource(path=args.weather_file, sample_minutes=args.weather_sample_minutes)
+            outside_temps = source.temperatures_at(numpy.arange(0, max_steps + 1))
 
-            # pick some arbitrary values.
-            buzzing_impact = 0.5
-            fanning_impact = 0.5
-            min_outside_temp = 50.0
-            max_outside_temp = 90.0
-            target_bee_buzzing = 60.0  # warm up
-            target_bee_fanning = 65.0  # cool down
+        results = kernel.run(buzz_temps=buzz_temps, fan_temps=fan_temps, max_steps=max_steps,
+                             start_temp=TARGET_BEE_BUZZING, buzzing_impact=BUZZING_IMPACT,
+                             fanning_impact=FANNING_IMPACT,
+                             min_outside_temp=MIN_OUTSIDE_TEMP, max_outside_temp=MAX_OUTSIDE_TEMP,
+                             outside_temps=outside_temps, adaptive=True)
+        for report in create_kernel_reports(results, number_bees=args.number_bees, report_every=args.report_every):
+            self.report_writer.write(report)
 
-            simulation.add_entity(Beehive(start_temp=target_bee_buzzing,
-                                          buzzing_impact=buzzing_impact, fanning_impact=fanning_impact))
+    @staticmethod
+    def create_entities(simulation, number_bees, bee_variance="vary", bee_model="bees",
+                        buzzing_impact=BUZZING_IMPACT, fanning_impact=FANNING_IMPACT,
+                        min_outside_temp=MIN_OUTSIDE_TEMP, max_outside_temp=MAX_OUTSIDE_TEMP,
+                        target_bee_buzzing=TARGET_BEE_BUZZING, target_bee_fanning=TARGET_BEE_FANNING,
+                        weather_file=None, weather_sample_minutes=1.0, bee_workers=None,
+                        closers=None) -> BeehiveDisplayModel:
+        """
+        Creates the beehive, outside temperature, display model and bees and adds them to the simulation.
+        :param Simulation simulation: The simulation to add the entities to.
+        :param int number_bees: The number of bees in the hive.
+        :param str bee_variance: "vary" for random temps around the targets, "same" for the target temps.
+        :param str bee_model: "bees" for an entity per bee, "population" for all bees in one entity, "partitioned" for
+        one entity with the bees split across worker processes.
+        :param float buzzing_impact: The impact on temperature for any given bee buzzing.
+        :param float fanning_impact: The impact on temperature for any given bee fanning.
+        :param float min_outside_temp: The minimum outside temperature during the day.
+        :param float max_outside_temp: The maximum outside temperature during the day.
+        :param float target_bee_buzzing: The target temperature below which bees buzz (warm up).
+        :param float target_bee_fanning: The target temperature above which bees fan (cool down).
+        :param str weather_file: Weather file for the outside temperature instead of the min and max temps.
+        :param float weather_sample_minutes: The minutes between the samples in the weather file.
+        :param int bee_workers: The number of worker processes for the partitioned bees.  Defaults to the number of
+        cores.
+        :param contextlib.ExitStack closers: Gets the close of the entities that hold resources, such as the workers of
+        the partitioned bees, to call once the simulation is done.  None to leave them until they are garbage collected
+        or the program exits.
+        :return: The display model that tracks the simulation.
+        """
+        simulation.add_entity(Beehive(start_temp=target_bee_buzzing,
+                                      buzzing_impact=buzzing_impact, fanning_impact=fanning_impact))
+        if weather_file:
+            simulation.add_entity(WeatherOutsideTemperature(path=weather_file, sample_minutes=weather_sample_minutes))
+        else:
             simulation.add_entity(OutsideTemperature(min_temp=min_outside_temp, max_temp=max_outside_temp))
-            self.display_model = BeehiveDisplayModel()
-            simulation.add_entity(self.display_model)
-
-            # create and add the bees
-            for bee_number in range(0, args.number_bees):
-                # if the variance is "same", then all bees get the same fan and flap temps.  If not, vary randomly.
-                if args.bee_variance == "vary":
-                    bee_fan = random.uniform(target_bee_fanning * .9, target_bee_fanning * 1.1)
-                    bee_buzz = random.uniform(target_bee_buzzing * .9, target_bee_buzzing * 1.1)
-                    simulation.add_entity(Bee(fan_temp=bee_fan, buzz_temp=bee_buzz))
-                else:
-                    simulation.add_entity(Bee(fan_temp=target_bee_fanning, buzz_temp=target_bee_buzzing))
-
-            step_size = 100
-            for step in range(1, args.max_steps, step_size):
-                simulation.advance_and_wait(steps=step_size)
-                self.update_display()
+        display_model = BeehiveDisplayModel()
+        simulation.add_entity(display_model)
+
+        # create and add the bees, either as one entity per bee or as a single population.
+        buzz_temps, fan_temps = BeehiveApp.create_bee_temps(number_bees=number_bees,
+                                                            bee_variance=bee_variance,
+                                                            target_bee_buzzing=target_bee_buzzing,
+                                                            target_bee_fanning=target_bee_fanning)
+        if bee_model == "population":
+            simulation.add_entity(BeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps))
+        elif bee_model == "partitioned":
+            population = PartitionedBeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps, workers=bee_workers)
+            if closers is not None:
+                closers.callback(population.close)
+            simulation.add_entity(population)
+        else:
+            for bee_buzz, bee_fan in zip(buzz_temps, fan_temps):
+                simulation.add_entity(Bee(fan_temp=bee_fan, buzz_temp=bee_buzz))
+
+        return display_model
+
+    @staticmethod
+    def create_bee_temps(number_bees, bee_variance, target_bee_buzzing, target_bee_fanning) -> tuple:
+        """
+        Creates the buzz and fan temps for each bee.  The random draws are in the same order for either bee model, so
+        the same seed gives the same bees.
+        :param int number_bees: The number of bees to create temps for.
+        :param str bee_variance: "vary" for random temps around the targets, "same" for the target temps.
+        :param float target_bee_buzzing: The target temperature below which bees buzz.
+        :param float target_bee_fanning: The target temperature above which bees fan.
+        :return: Tuple of the list of buzz temps and the list of fan temps.
+        """
+        buzz_temps, fan_temps = [], []
+        for bee_number in range(0, number_bees):
+            # if the variance is "same", then all bees get the same fan and flap temps.  If not, vary randomly.
+            if bee_variance == "vary":
+                fan_temps.append(random.uniform(target_bee_fanning * .9, target_bee_fanning * 1.1))
+                buzz_temps.append(random.uniform(target_bee_buzzing * .9, target_bee_buzzing * 1.1))
+            else:
+                fan_temps.append(target_bee_fanning)
+                buzz_temps.append(target_bee_buzzing)
+
+        return buzz_temps, fan_temps
 
     @staticmethod
     def get_args() -> argparse.Namespace:
@@ -95,41 +272,59 @@ class BeehiveApp:
                             choices=["vary", "same"],
                             help="vary: bees have different temps for buzz and fan.\n"
                                  "same: bees have same temp for buzz and fan.")
+        parser.add_argument("--bee_model", default=None,
+                            choices=["population", "partitioned", "bees"],
+                            help="bees: each bee is a separate entity (default).\n"
+                                 "population: all bees are updated together by one entity.\n"
+                                 "partitioned: one entity with the bees split across worker processes.")
+        parser.add_argument("--bee_workers", type=int, default=None,
+                            help="number of worker processes for the partitioned bees (default: all cores)")
+        parser.add_argument("--seed", type=int, default=None, help="seed for the random bee temps")
+        parser.add_argument("--profile", action="store_true",
+                            help="time the entity event handlers and print a report at the end")
+        parser.add_argument("--record", default=None,
+                            help="directory to record the hive and outside temps and bee counts for every step")
+        parser.add_argument("--event_log", default=None,
+                            help="file to log every event between the beehive entities to, for event_log.py to "
+                                 "print or replay")
+        parser.add_argument("--telemetry_port", type=int, default=None,
+                            help="port on localhost to serve the history and stream every step for dashboards "
+                                 "(0 picks a free port)")
+        parser.add_argument("--weather_file", default=None,
+                            help="weather file for the outside temp, from weather.py (default: the synthetic day)")
+        parser.add_argument("--weather_sample_minutes", type=float, default=1.0,
+                            help="minutes between the samples in the weather file")
+        parser.add_argument("--adaptive", action="store_true",
+                            help="run the headless model, jumping over the steps where no bee changes instead of "
+                                 "running the entities every minute.  Can't be used with the options for the "
+                                 "entities: " + ", ".join(["--" + option for option in ENTITY_OPTIONS]))
         parser.add_argument("--max_steps", type=int, default=10080, help="Number of steps as simulation minutes.")
+        parser.add_argument("--output", default="text", choices=list(REPORT_WRITERS.keys()),
+                            help="text: reports for people to read.\n"
+                                 "jsonl: a JSON object per report.\n"
+                                 "csv: a CSV row per report.\n"
+                                 "binary: fixed size records (see output.BINARY_RECORD_DTYPE).")
+        parser.add_argument("--report_every", "--report-every", type=int, default=100,
+                            help="number of steps between reports")
+        parser.add_argument("--output_file", "--output-file", default=None,
+                            help="file for the reports (default: stdout)")
 
-        return parser.parse_args()
+        args = parser.parse_args()
+        if args.report_every < 1:
+            parser.error(f"--report_every must be at least 1, not {args.report_every}")
+        if args.adaptive:
+            entity_options = ["--" + option for option in ENTITY_OPTIONS if getattr(args, option) not in [None, False]]
+            if entity_options:
+                parser.error(f"--adaptive can't be used with {', '.join(entity_options)}")
+        if args.bee_model is None:
+            args.bee_model = "bees"
+        return args
 
     def update_display(self):
         """
         Write output on the stats every update call.
         """
-
-        print("=======================================")
-        print(f"Update from time {self.display_model.previous_time} to {self.display_model.new_time}")
-
-        print(f"Temperature status:")
-        if not self.display_model or not self.display_model.outside_temp:
-            print("\tunknown")
-        else:
-            print(f"\toutside temp: {self.display_model.outside_temp:.1f}"
-                  f" (min: {self.display_model.min_outside_temp:.1f}"
-                  f" max: {self.display_model.max_outside_temp:.1f})")
-            print(f"\thive temp: {self.display_model.beehive.current_temp:.1f}"
-                  f" (min: {self.display_model.min_hive_temp:.1f} max: {self.display_model.max_hive_temp:.1f})")
-
-        print(f"Bees:")
-        if not self.display_model or not self.display_model.beehive:
-            print("\tunknown")
-        else:
-            print(f"\ttotal bees: {self.display_model.beehive.number_bees}"
-                  f" (min: {self.display_model.min_number_bees} max: {self.display_model.max_number_bees})")
-            print(f"\tbees buzzing: {self.display_model.beehive.number_bees_buzzing}"
-                  f" (min: {self.display_model.min_number_bees_buzzing}"
-                  f" max: {self.display_model.max_number_bees_buzzing})")
-            print(f"\tbees fanning: {self.display_model.beehive.number_bees_fanning}"
-                  f" (min: {self.display_model.min_number_bees_fanning}"
-                  f" max: {self.display_model.max_number_bees_fanning})")
-        print("")
+        self.report_writer.write(create_report(self.display_model))
 
 
 if __name__ == "__main__":
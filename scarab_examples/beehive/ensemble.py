@@ -0,0 +1,167 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Runs Monte Carlo ensembles of the beehive where each replica has different random bee temps.  Each replica has its own
+random stream spawned from a master seed, so the results are the same for a seed no matter how many workers are used.
+
+The replicas are run with the headless kernel, which gives the same results as the entity simulation.
+"""
+
+import argparse
+import csv
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from scarab_examples.beehive import kernel
+
+# The series from each replica that are summarized for the ensemble.
+ENSEMBLE_SERIES = ["hive_temp", "number_bees_buzzing", "number_bees_fanning"]
+
+
+def create_bee_temps(rng, number_bees, bee_variance="vary", target_bee_buzzing=60.0, target_bee_fanning=65.0) -> tuple:
+    """
+    Creates the buzz and fan temps for each bee with the same ranges as cli_beehive.
+    :param numpy.random.Generator rng: The random generator for the replica.
+    :param int number_bees: The number of bees to create temps for.
+    :param str bee_variance: "vary" for random temps around the targets, "same" for the target temps.
+    :param float target_bee_buzzing: The target temperature below which bees buzz.
+    :param float target_bee_fanning: The target temperature above which bees fan.
+    :return: Tuple of the array of buzz temps and the array of fan temps.
+    """
+    if bee_variance == "vary":
+        fan_temps = rng.uniform(target_bee_fanning * .9, target_bee_fanning * 1.1, size=number_bees)
+        buzz_temps = rng.uniform(target_bee_buzzing * .9, target_bee_buzzing * 1.1, size=number_bees)
+    else:
+        fan_temps = numpy.full(number_bees, target_bee_fanning, dtype=numpy.float64)
+        buzz_temps = numpy.full(number_bees, target_bee_buzzing, dtype=numpy.float64)
+
+    return buzz_temps, fan_temps
+
+
+def run_replica(replica) -> dict:
+    """
+    Runs one replica.  This is run in the worker processes.
+    :param tuple replica: The SeedSequence for the replica and the dictionary of model parameters.
+    :return: The series for the replica from the kernel.
+    """
+    seed_sequence, parameters = replica
+    parameters = dict(parameters)
+
+    target_bee_buzzing = parameters.pop("target_bee_buzzing")
+    buzz_temps, fan_temps = create_bee_temps(rng=numpy.random.default_rng(seed_sequence),
+                                             number_bees=parameters.pop("number_bees"),
+                                             bee_variance=parameters.pop("bee_variance"),
+                                             target_bee_buzzing=target_bee_buzzing,
+                                             target_bee_fanning=parameters.pop("target_bee_fanning"))
+
+    # the hive starts at the buzzing target, the same as cli_beehive.
+    results = kernel.run(buzz_temps=buzz_temps, fan_temps=fan_temps, start_temp=target_bee_buzzing, **parameters)
+    return {name: results[name] for name in ENSEMBLE_SERIES}
+
+
+def run_ensemble(number_replicas, number_bees, max_steps, seed=0, workers=None, percentiles=(5, 50, 95),
+                 bee_variance="vary", buzzing_impact=0.5, fanning_impact=0.5, min_outside_temp=50.0,
+                 max_outside_temp=90.0, target_bee_buzzing=60.0, target_bee_fanning=65.0) -> dict:
+    """
+    Runs the replicas across worker processes and summarizes them for each step.
+    :param int number_replicas: The number of replicas in the ensemble.
+    :param int number_bees: The number of bees in each hive.
+    :param int max_steps: The number of steps (minutes) for each replica.
+    :param int seed: The master seed the replica seeds are spawned from.
+    :param int workers: The number of worker processes.  Defaults to the number of cores.
+    :param tuple of float percentiles: The percentiles to report for each step.
+    :param str bee_variance: "vary" for random temps around the targets, "same" for the target temps.
+    :param float buzzing_impact: The impact on temperature for any given bee buzzing.
+    :param float fanning_impact: The impact on temperature for any given bee fanning.
+    :param float min_outside_temp: The minimum outside temperature during the day.
+    :param float max_outside_temp: The maximum outside temperature during the day.
+    :param float target_bee_buzzing: The target temperature below which bees buzz.  The hive starts at this temp.
+    :param float target_bee_fanning: The target temperature above which bees fan.
+    :return: Dictionary with the "time" and, for each series, "<series>_mean" and "<series>_p<percentile>" arrays.
+    """
+    parameters = {"number_bees": number_bees, "bee_variance": bee_variance, "max_steps": max_steps,
+                  "buzzing_impact": buzzing_impact, "fanning_impact": fanning_impact,
+                  "min_outside_temp": min_outside_temp, "max_outside_temp": max_outside_temp,
+                  "target_bee_buzzing": target_bee_buzzing, "target_bee_fanning": target_bee_fanning}
+    replicas = [(seed_sequence, parameters) for seed_sequence in numpy.random.SeedSequence(seed).spawn(number_replicas)]
+
+    # map keeps the replica order, so the reductions below see the same arrays for any number of workers.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run_replica, replicas))
+
+    summary = {"time": numpy.arange(0, max_steps + 1)}
+    for name in ENSEMBLE_SERIES:
+        values = numpy.stack([result[name] for result in results]).astype(numpy.float64)
+        summary[f"{name}_mean"] = values.mean(axis=0)
+        for percentile, band in zip(percentiles, numpy.percentile(values, percentiles, axis=0)):
+            summary[f"{name}_p{percentile:g}"] = band
+
+    return summary
+
+
+def write_summary(summary, output) -> None:
+    """
+    Writes the ensemble summary as a CSV table with one row per step.
+    :param dict summary: The summary from run_ensemble.
+    :param file output: The file to write to.
+    """
+    writer = csv.writer(output)
+    writer.writerow(summary.keys())
+    writer.writerows(zip(*[values.tolist() for values in summary.values()]))
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for the ensemble.
+    """
+    parser = argparse.ArgumentParser(description="Runs an ensemble of beehive simulations with different random bees "
+                                                 "and writes the mean and percentile bands for each step as CSV.")
+
+    parser.add_argument("--replicas", type=int, default=100, help="number of replicas in the ensemble")
+    parser.add_argument("--number_bees", type=int, default=10, help="number of bees in the hive")
+    parser.add_argument("--bee_variance", default="vary", choices=["vary", "same"],
+                        help="vary: bees have different temps for buzz and fan.\n"
+                             "same: bees have same temp for buzz and fan.")
+    parser.add_argument("--max_steps", type=int, default=10080, help="Number of steps as simulation minutes.")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=[5, 50, 95],
+                        help="percentiles to report for each step")
+    parser.add_argument("--seed", type=int, default=0, help="master seed for the replicas")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--output_file", default=None, help="file for the CSV table (default: stdout)")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs the ensemble."""
+    args = get_args()
+
+    summary = run_ensemble(number_replicas=args.replicas, number_bees=args.number_bees, max_steps=args.max_steps,
+                           seed=args.seed, workers=args.workers, percentiles=tuple(args.percentiles),
+                           bee_variance=args.bee_variance)
+
+    if args.output_file:
+        with open(args.output_file, "w", newline="") as output:
+            write_summary(summary, output)
+    else:
+        write_summary(summary, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
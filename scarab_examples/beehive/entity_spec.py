@@ -0,0 +1,157 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Creates entity classes from a simulation description such as beehive.yaml.  Each class has the declared attributes,
+set from its arguments or the defaults, and a handler for each subscription that has a body.  The handlers are
+decorated the same as hand-written ones, so the simulation sends them the same events.  The generated classes are plain
+entities with the attributes in the instance dictionary, where the simulation finds the properties to publish, so they
+are no smaller or faster than hand-written ones.
+
+The bodies are the methods of the hand-written entities, see BEEHIVE_IMPLEMENTATIONS.  Only the bee is generated.  The
+hive and outside temp keep private state the description doesn't have, such as the threshold index, the bee registry
+and the shared profiles, so they stay hand-written.
+"""
+
+import os
+
+import yaml
+
+from scarab.entities import *
+
+from scarab_examples.beehive.beehive import Bee
+
+BEEHIVE_SPEC_FILE = os.path.join(os.path.dirname(__file__), "beehive.yaml")
+
+# The decorators for the entity events in a description.
+_ENTITY_EVENT_DECORATORS = {
+    "created": entity_created_event_handler,
+    "changed": entity_changed_event_handler,
+    "destroyed": entity_destroyed_event_handler,
+}
+
+# The decorators for the simulation events in a description.
+_EVENT_DECORATORS = {
+    "time_update": time_update_event_handler,
+}
+
+# The implementation of the generated beehive classes by class name:
+# - defaults:  the starting value of attributes that aren't None.
+# - handlers:  the hand-written body for each (entity name, event) for entity events or event name for simulation
+#   events.
+BEEHIVE_IMPLEMENTATIONS = {
+    "Bee": {
+        "defaults": {"is_buzzing": False, "is_fanning": False},
+        "handlers": {("beehive", "changed"): Bee.handle_temperature_change},
+    },
+}
+
+
+def load_spec(path=BEEHIVE_SPEC_FILE) -> dict:
+    """
+    Loads a simulation description.
+    :param str path: The YAML file with the description.
+    :return: The description.
+    """
+    with open(path) as spec_file:
+        return yaml.safe_load(spec_file)
+
+
+def handler_name(entity_name, event) -> str:
+    """
+    Returns the name of the generated method for an entity event.
+    :param str entity_name: The name of the entity the handler subscribes to.
+    :param str event: created, changed or destroyed.
+    :return: The method name.
+    """
+    return f"handle_{entity_name}_{event}"
+
+
+def create_entity_class(class_name, entity_spec, implementation) -> type:
+    """
+    Creates an entity class from its description.
+    :param str class_name: The name of the class.
+    :param dict entity_spec: The description with the entity name, attributes and handlers.
+    :param dict implementation: The "defaults" for the attributes and the "handlers" bodies for each (entity name,
+    event) or simulation event name, see BEEHIVE_IMPLEMENTATIONS.
+    :return: The class.  It is created with the attributes as arguments in the order they are declared.  Attributes
+    not given get the default or None.
+    """
+    attributes = tuple(entity_spec.get("attributes") or [])
+    entity_name = entity_spec["name"]
+    defaults = dict.fromkeys(attributes)
+    defaults.update(implementation.get("defaults") or {})
+    handler_bodies = implementation.get("handlers") or {}
+
+    for attribute in attributes:
+        if not attribute.isidentifier():
+            raise ValueError(f"{class_name} attribute {attribute!r} isn't a valid name")
+
+    def __init__(self, *args, **kwargs):
+        if len(args) > len(attributes):
+            raise TypeError(f"{class_name} takes at most {len(attributes)} arguments ({len(args)} given)")
+        values = dict(defaults)
+        values.update(zip(attributes, args))
+        for name, value in kwargs.items():
+            if name not in values:
+                raise TypeError(f"{class_name} has no attribute {name!r}")
+            values[name] = value
+        for name, value in values.items():
+            setattr(self, name, value)
+        Entity.__init__(self, name=entity_name)
+
+    namespace = {"__init__": __init__, "__doc__": f"Entity {entity_name} created from a simulation description."}
+
+    handlers = entity_spec.get("handlers") or {}
+    for subscribed_name, events in (handlers.get("entities") or {}).items():
+        for event in events:
+            body = handler_bodies.get((subscribed_name, event))
+            if body is not None:
+                namespace[handler_name(subscribed_name, event)] = \
+                    _ENTITY_EVENT_DECORATORS[event](entity_name=subscribed_name)(_unwrap(body))
+    for event in handlers.get("events") or []:
+        body = handler_bodies.get(event)
+        if body is not None:
+            namespace[f"handle_{event}"] = _EVENT_DECORATORS[event](_unwrap(body))
+
+    return type(class_name, (Entity,), namespace)
+
+
+def _unwrap(body):
+    """Returns the function under any wrappers, such as a hand-written handler that is being profiled."""
+    while hasattr(body, "__wrapped__"):
+        body = body.__wrapped__
+    return body
+
+
+def create_entity_classes(spec, implementations) -> dict:
+    """
+    Creates a class for each entity in the description that has an implementation.
+    :param dict spec: The simulation description.
+    :param dict implementations: The implementation for each class name, see create_entity_class.
+    :return: Dictionary of the classes by name.
+    """
+    return {class_name: create_entity_class(class_name, entity_spec, implementations[class_name])
+            for class_name, entity_spec in spec["entities"].items() if class_name in implementations}
+
+
+def load_beehive_classes(path=BEEHIVE_SPEC_FILE) -> dict:
+    """
+    Creates the beehive classes with the hand-written handlers.
+    :param str path: The YAML file with the description.
+    :return: Dictionary of the classes by name.
+    """
+    return create_entity_classes(load_spec(path), BEEHIVE_IMPLEMENTATIONS)
@@ -0,0 +1,504 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Binary logs of the events between the beehive entities, so a divergent run can be looked at and replayed without
+running the simulation again or logging every event as text.
+
+The log is a header followed by length prefixed records, one per event.  Entity names and property keys are interned:
+the first time a string is used a name record gives it a number, and the events only have the number.  When the log is
+closed a footer with the names and a sparse index of the offsets of the time updates is added, so a reader can seek to
+a time without reading what comes before it.  A log without a footer, such as from a run that crashed, is still read
+by scanning it.
+
+Only the properties in LOGGED_PROPERTIES are kept.  They are the scalar properties the beehive entities read from each
+other, so the arrays of the populations are left out.
+"""
+
+import argparse
+import json
+import struct
+import sys
+from bisect import bisect_right
+
+import numpy
+
+from scarab.entities import *
+from scarab.testing import EntityTestWrapper
+
+from scarab_examples.beehive.beehive import BEE_ENTITY_NAME, BEE_POPULATION_ENTITY_NAME, BEEHIVE_ENTITY_NAME, \
+    OUTSIDE_TEMPERATURE_NAME
+
+EVENT_LOG_RECORDER_NAME = "event_log_recorder"
+
+EVENT_LOG_MAGIC = b"BEELOG"
+EVENT_LOG_VERSION = 1
+EVENT_LOG_INDEX_MAGIC = b"BEEIDX"
+_HEADER = struct.Struct("<6sH")  # magic, version.
+_TRAILER = struct.Struct("<QI6s")  # offset of the footer, length of the footer, index magic.
+
+# The properties logged for each entity, as well as the guid.
+LOGGED_PROPERTIES = {
+    BEE_ENTITY_NAME: ["buzz_temp", "fan_temp", "is_buzzing", "is_fanning"],
+    BEE_POPULATION_ENTITY_NAME: ["number_bees", "number_bees_buzzing", "number_bees_fanning"],
+    BEEHIVE_ENTITY_NAME: ["current_temp", "buzzing_impact", "fanning_impact", "number_bees", "number_bees_buzzing",
+                          "number_bees_fanning"],
+    OUTSIDE_TEMPERATURE_NAME: ["current_temp", "min_temp", "max_temp", "resolution", "start_time"],
+}
+
+# The kinds of events, which are the first item of each event read from a log, and their record kinds.  Record kind 0
+# gives a number to a name.
+_NAME = 0
+TIME = "time"
+CREATED = "created"
+CHANGED = "changed"
+DESTROYED = "destroyed"
+_KINDS = {TIME: 1, CREATED: 2, CHANGED: 3, DESTROYED: 4}
+_KIND_NAMES = {code: kind for kind, code in _KINDS.items()}
+
+# The tags for the types of values.
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR = range(0, 6)
+
+_LENGTH = struct.Struct("<I")
+_KIND = struct.Struct("<B")
+_NAME_ID = struct.Struct("<H")
+_TIMES = struct.Struct("<qq")
+_INT_VALUE = struct.Struct("<q")
+_FLOAT_VALUE = struct.Struct("<d")
+
+
+def _encode_value(value) -> bytes:
+    """Returns the value with its type tag."""
+    if value is None:
+        return bytes([_NONE])
+    if isinstance(value, (bool, numpy.bool_)):
+        return bytes([_TRUE if value else _FALSE])
+    if isinstance(value, (int, numpy.integer)):
+        return bytes([_INT]) + _INT_VALUE.pack(value)
+    if isinstance(value, (float, numpy.floating)):
+        return bytes([_FLOAT]) + _FLOAT_VALUE.pack(value)
+    if isinstance(value, str):
+        text = value.encode("utf-8")
+        return bytes([_STR]) + _LENGTH.pack(len(text)) + text
+    raise TypeError(f"can't log a value of type {type(value).__name__}")
+
+
+def _decode_value(buffer, offset) -> tuple:
+    """Returns the value at the offset and the offset after it."""
+    tag = buffer[offset]
+    offset += 1
+    if tag == _NONE:
+        return None, offset
+    if tag == _FALSE or tag == _TRUE:
+        return tag == _TRUE, offset
+    if tag == _INT:
+        return _INT_VALUE.unpack_from(buffer, offset)[0], offset + _INT_VALUE.size
+    if tag == _FLOAT:
+        return _FLOAT_VALUE.unpack_from(buffer, offset)[0], offset + _FLOAT_VALUE.size
+    if tag == _STR:
+        length = _LENGTH.unpack_from(buffer, offset)[0]
+        offset += _LENGTH.size
+        return bytes(buffer[offset:offset + length]).decode("utf-8"), offset + length
+    raise ValueError(f"unknown value type {tag} in the event log")
+
+
+class EventLogWriter:
+    """Writes events to a binary log file."""
+
+    def __init__(self, path, index_every=256, buffer_size=1 << 20):
+        """
+        Creates a new log.  Any file already at the path is replaced.
+        :param str path: The file for the log.
+        :param int index_every: The number of time updates between the entries of the sparse index.
+        :param int buffer_size: The bytes kept in memory before they are written.
+        """
+        assert index_every > 0
+        self.__file = open(path, "wb", buffering=buffer_size)
+        self.__file.write(_HEADER.pack(EVENT_LOG_MAGIC, EVENT_LOG_VERSION))
+        self.__offset = _HEADER.size
+        self.__names = {}  # string -> number.
+        self.__index = []  # [time, offset] of every index_every time updates.
+        self.__index_every = index_every
+        self.__number_times = 0
+
+    def write_time(self, previous_time, new_time) -> None:
+        """
+        Logs a time update.
+        :param int previous_time: The previous simulation time.
+        :param int new_time: The new simulation time.
+        """
+        if self.__number_times % self.__index_every == 0:
+            self.__index.append([new_time, self.__offset])
+        self.__number_times += 1
+        self.__write(_KIND.pack(_KINDS[TIME]) + _TIMES.pack(previous_time, new_time))
+
+    def write_entity(self, kind, entity_name, guid, properties=None) -> None:
+        """
+        Logs an entity being created, changed or destroyed.
+        :param str kind: CREATED, CHANGED or DESTROYED.
+        :param str entity_name: The name of the entity.
+        :param guid: The guid of the entity.
+        :param dict properties: The properties that are new or changed.  Not used for DESTROYED.
+        """
+        parts = [_KIND.pack(_KINDS[kind]), self.__name_id(entity_name), _encode_value(guid)]
+        if kind != DESTROYED:
+            parts.append(_NAME_ID.pack(len(properties)))
+            for key, value in properties.items():
+                parts.append(self.__name_id(key))
+                parts.append(_encode_value(value))
+        self.__write(b"".join(parts))
+
+    def close(self) -> None:
+        """
+        Adds the footer with the names and the index, and closes the file.
+        """
+        if self.__file is None:
+            return
+        footer = json.dumps({"names": list(self.__names), "index": self.__index}).encode("utf-8")
+        self.__file.write(footer)
+        self.__file.write(_TRAILER.pack(self.__offset, len(footer), EVENT_LOG_INDEX_MAGIC))
+        self.__file.close()
+        self.__file = None
+
+    def __name_id(self, name) -> bytes:
+        """Returns the packed number for the name, logging the name the first time it is used."""
+        name_id = self.__names.get(name)
+        if name_id is None:
+            name_id = self.__names[name] = len(self.__names)
+            self.__write(_KIND.pack(_NAME) + _NAME_ID.pack(name_id) + name.encode("utf-8"))
+        return _NAME_ID.pack(name_id)
+
+    def __write(self, record) -> None:
+        """Writes a record with its length."""
+        self.__file.write(_LENGTH.pack(len(record)))
+        self.__file.write(record)
+        self.__offset += _LENGTH.size + len(record)
+
+
+class EventLogRecorder(Entity):
+    """Logs the events of the beehive entities.  Add it to the simulation first so it sees the others being created."""
+
+    def __init__(self, path, index_every=256):
+        """
+        Creates a new recorder.
+        :param str path: The file for the log.
+        :param int index_every: The number of time updates between the entries of the sparse index.
+        """
+        self.__writer = EventLogWriter(path=path, index_every=index_every)
+        super().__init__(name=EVENT_LOG_RECORDER_NAME)
+
+    def close(self) -> None:
+        """
+        Finishes the log.  Call when the simulation is done.
+        """
+        self.__writer.close()
+
+    def __created(self, entity_name, entity) -> None:
+        """Logs every logged property of a new entity.  Some entities, like the weather outside temp, have fewer."""
+        self.__writer.write_entity(CREATED, entity_name, entity.guid,
+                                   {key: getattr(entity, key) for key in LOGGED_PROPERTIES[entity_name]
+                                    if hasattr(entity, key)})
+
+    def __changed(self, entity_name, entity, changed_properties) -> None:
+        """Logs the logged properties that changed, if any did."""
+        properties = {key: getattr(entity, key) for key in LOGGED_PROPERTIES[entity_name] if key in changed_properties}
+        if properties:
+            self.__writer.write_entity(CHANGED, entity_name, entity.guid, properties)
+
+    @entity_created_event_handler(entity_name=BEE_ENTITY_NAME)
+    def handle_bee_created(self, bee) -> None:
+        """
+        Handles a bee being created.
+        :param RemoteEntity bee: The bee that was created.
+        """
+        self.__created(BEE_ENTITY_NAME, bee)
+
+    @entity_changed_event_handler(entity_name=BEE_ENTITY_NAME)
+    def handle_bee_changed(self, bee, changed_properties) -> None:
+        """
+        Handles a bee changing.
+        :param RemoteEntity bee: The bee that changed.
+        :param list of str changed_properties: The properties that changed.
+        """
+        self.__changed(BEE_ENTITY_NAME, bee, changed_properties)
+
+    @entity_destroyed_event_handler(entity_name=BEE_ENTITY_NAME)
+    def handle_bee_destroyed(self, bee) -> None:
+        """
+        Handles a bee being destroyed.
+        :param RemoteEntity bee: The bee that was destroyed.
+        """
+        self.__writer.write_entity(DESTROYED, BEE_ENTITY_NAME, bee.guid)
+
+    @entity_created_event_handler(entity_name=BEE_POPULATION_ENTITY_NAME)
+    def handle_population_created(self, population) -> None:
+        """
+        Handles a bee population being created.
+        :param RemoteEntity population: The population that was created.
+        """
+        self.__created(BEE_POPULATION_ENTITY_NAME, population)
+
+    @entity_changed_event_handler(entity_name=BEE_POPULATION_ENTITY_NAME)
+    def handle_population_changed(self, population, changed_properties) -> None:
+        """
+        Handles a bee population changing.
+        :param RemoteEntity population: The population that changed.
+        :param list of str changed_properties: The properties that changed.
+        """
+        self.__changed(BEE_POPULATION_ENTITY_NAME, population, changed_properties)
+
+    @entity_destroyed_event_handler(entity_name=BEE_POPULATION_ENTITY_NAME)
+    def handle_population_destroyed(self, population) -> None:
+        """
+        Handles a bee population being destroyed.
+        :param RemoteEntity population: The population that was destroyed.
+        """
+        self.__writer.write_entity(DESTROYED, BEE_POPULATION_ENTITY_NAME, population.guid)
+
+    @entity_created_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_beehive_created(self, beehive) -> None:
+        """
+        Handles the beehive being created.
+        :param RemoteEntity beehive: The beehive that was created.
+        """
+        self.__created(BEEHIVE_ENTITY_NAME, beehive)
+
+    @entity_changed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_beehive_changed(self, beehive, changed_properties) -> None:
+        """
+        Handles the beehive changing.
+        :param RemoteEntity beehive: The beehive that changed.
+        :param list of str changed_properties: The properties that changed.
+        """
+        self.__changed(BEEHIVE_ENTITY_NAME, beehive, changed_properties)
+
+    @entity_destroyed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_beehive_destroyed(self, beehive) -> None:
+        """
+        Handles the beehive being destroyed.
+        :param RemoteEntity beehive: The beehive that was destroyed.
+        """
+        self.__writer.write_entity(DESTROYED, BEEHIVE_ENTITY_NAME, beehive.guid)
+
+    @entity_created_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
+    def handle_temp_created(self, temp) -> None:
+        """
+        Handles the outside temp being created.
+        :param RemoteEntity temp: The temperature entity that was created.
+        """
+        self.__created(OUTSIDE_TEMPERATURE_NAME, temp)
+
+    @entity_changed_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
+    def handle_temp_changed(self, temp, changed_properties) -> None:
+        """
+        Handles the outside temp changing.
+        :param RemoteEntity temp: The temperature entity that changed.
+        :param list of str changed_properties: The properties that changed.
+        """
+        self.__changed(OUTSIDE_TEMPERATURE_NAME, temp, changed_properties)
+
+    @entity_destroyed_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
+    def handle_temp_destroyed(self, temp) -> None:
+        """
+        Handles the outside temp being destroyed.
+        :param RemoteEntity temp: The temperature entity that was destroyed.
+        """
+        self.__writer.write_entity(DESTROYED, OUTSIDE_TEMPERATURE_NAME, temp.guid)
+
+    @time_update_event_handler
+    def handle_time_update(self, previous_time, new_time) -> None:
+        """
+        Handles the time changing.  The events after it in the log are from the new time.
+        :param int previous_time: The previous simulation time.
+        :param int new_time: The new simulation time.
+        """
+        self.__writer.write_time(previous_time, new_time)
+
+
+class EventLogReader:
+    """Reads the events from a log.  The whole log is read into memory, so events are decoded at memory speed."""
+
+    def __init__(self, path):
+        """
+        Opens a log.
+        :param str path: The file with the log.
+        :raises ValueError: If the file isn't an event log.
+        """
+        with open(path, "rb") as log_file:
+            self.__buffer = memoryview(log_file.read())
+
+        if len(self.__buffer) < _HEADER.size:
+            raise ValueError("not a beehive event log")
+        magic, version = _HEADER.unpack_from(self.__buffer, 0)
+        if magic != EVENT_LOG_MAGIC:
+            raise ValueError("not a beehive event log")
+        if version != EVENT_LOG_VERSION:
+            raise ValueError(f"event log version {version} isn't supported")
+
+        self.__end = len(self.__buffer)
+        self.__names = []
+        self.__index = []
+        if self.__end >= _HEADER.size + _TRAILER.size:
+            footer_offset, footer_length, index_magic = _TRAILER.unpack_from(self.__buffer, self.__end - _TRAILER.size)
+            if index_magic == EVENT_LOG_INDEX_MAGIC:
+                footer = json.loads(bytes(self.__buffer[footer_offset:footer_offset + footer_length]).decode("utf-8"))
+                self.__end = footer_offset
+                self.__names = footer["names"]
+                self.__index = footer["index"]
+                return
+        self.__scan()
+
+    @property
+    def index(self) -> list:
+        """Returns the sparse index as a list of [time, offset]."""
+        return [list(entry) for entry in self.__index]
+
+    def events(self, start_time=None, end_time=None):
+        """
+        Yields the events in the log.  Each event is a tuple that starts with its kind:
+        (TIME, previous_time, new_time), (CREATED, entity_name, guid, properties),
+        (CHANGED, entity_name, guid, changed_properties) or (DESTROYED, entity_name, guid).
+        :param int start_time: Start at the first time update to this time or later, using the index to skip the
+        events before it.  None to start at the beginning, with the events before the first time update.
+        :param int end_time: Stop before the first time update after this time.  None for the end of the log.
+        """
+        offset = _HEADER.size
+        if start_time is not None:
+            entry = bisect_right([time for time, _ in self.__index], start_time) - 1
+            if entry >= 0:
+                offset = self.__index[entry][1]
+
+        started = start_time is None
+        for offset, event in self.__records(offset):
+            if event[0] == TIME:
+                if not started and event[2] >= start_time:
+                    started = True
+                if end_time is not None and event[2] > end_time:
+                    return
+            if started:
+                yield event
+
+    def __records(self, offset):
+        """Yields the offset and event of each record from the offset to the end of the log."""
+        buffer, names, end = self.__buffer, self.__names, self.__end
+        while offset + _LENGTH.size <= end:
+            length = _LENGTH.unpack_from(buffer, offset)[0]
+            record_offset = offset
+            position, offset = offset + _LENGTH.size, offset + _LENGTH.size + length
+            if offset > end:  # the run stopped part way through the record.
+                return
+
+            kind = buffer[position]
+            position += 1
+            if kind == _NAME:
+                name_id = _NAME_ID.unpack_from(buffer, position)[0]
+                if name_id == len(names):  # names from the footer are already known.
+                    names.append(bytes(buffer[position + _NAME_ID.size:offset]).decode("utf-8"))
+                continue
+
+            kind = _KIND_NAMES[kind]
+            if kind == TIME:
+                yield record_offset, (TIME,) + _TIMES.unpack_from(buffer, position)
+                continue
+
+            entity_name = names[_NAME_ID.unpack_from(buffer, position)[0]]
+            guid, position = _decode_value(buffer, position + _NAME_ID.size)
+            if kind == DESTROYED:
+                yield record_offset, (DESTROYED, entity_name, guid)
+                continue
+
+            properties = {}
+            number_properties = _NAME_ID.unpack_from(buffer, position)[0]
+            position += _NAME_ID.size
+            for _ in range(0, number_properties):
+                key = names[_NAME_ID.unpack_from(buffer, position)[0]]
+                properties[key], position = _decode_value(buffer, position + _NAME_ID.size)
+            yield record_offset, (kind, entity_name, guid, properties)
+
+    def __scan(self) -> None:
+        """Reads the names and builds an index with every time update for a log that has no footer."""
+        for offset, event in self.__records(_HEADER.size):
+            if event[0] == TIME:
+                self.__index.append([event[2], offset])
+
+
+def replay(log, entity, start_time=None, end_time=None) -> EntityTestWrapper:
+    """
+    Replays the events in a log into one entity, the same way as the tests send events with EntityTestWrapper.  Created
+    and changed events have every logged property of the entity as it was then, so changed_properties has them all.
+    :param EventLogReader log: The log to replay.
+    :param Entity entity: The entity to send the events to.  It should be new, as in the simulation that was logged.
+    :param int start_time: Read the log up to this time without sending the events, then send created events for the
+    entities that exist at this time.  This is how a snapshot is restored.  None to send every event.
+    :param int end_time: Stop after the events for this time.  None for the end of the log.
+    :return: The entity wrapped in the EntityTestWrapper that sent the events.
+    """
+    wrapper = EntityTestWrapper(entity)
+    remote_entities = {}  # (entity name, guid) -> properties.
+    sending = start_time is None
+
+    for event in log.events(end_time=end_time):
+        kind = event[0]
+        if kind == TIME:
+            if not sending and event[2] >= start_time:
+                sending = True
+                for (entity_name, _), properties in remote_entities.items():
+                    wrapper.send_entity_created_event(entity_name=entity_name, properties=dict(properties))
+            if sending:
+                wrapper.send_new_time(new_time=event[2])
+        elif kind == DESTROYED:
+            remote_entities.pop((event[1], event[2]), None)
+            if sending:
+                wrapper.send_entity_destroyed_event(entity_name=event[1], entity_guid=event[2])
+        else:
+            _, entity_name, guid, properties = event
+            if kind == CREATED:
+                remote_entities[(entity_name, guid)] = dict(properties, guid=guid)
+            else:
+                remote_entities[(entity_name, guid)].update(properties)
+            if sending:
+                send = wrapper.send_entity_created_event if kind == CREATED else wrapper.send_entity_changed_event
+                send(entity_name=entity_name, properties=dict(remote_entities[(entity_name, guid)]))
+
+    return wrapper
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for printing a log.
+    """
+    parser = argparse.ArgumentParser(description="Prints the events in a beehive event log as JSON lines.")
+
+    parser.add_argument("log_file", help="event log from cli_beehive --event_log")
+    parser.add_argument("--start_time", type=int, default=None, help="first time to print (default: the start)")
+    parser.add_argument("--end_time", type=int, default=None, help="last time to print (default: the end)")
+    parser.add_argument("--entity_name", default=None, help="only print the events for this entity name")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Prints the events."""
+    args = get_args()
+
+    for event in EventLogReader(args.log_file).events(start_time=args.start_time, end_time=args.end_time):
+        if args.entity_name is None or event[0] == TIME or event[1] == args.entity_name:
+            sys.stdout.write(json.dumps(event) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Headless version of the beehive model for parameter studies.  The same rules as the Beehive, Bee and
+OutsideTemperature entities are applied with arrays instead of entities and events, so long runs take seconds.
+
+The results match a time stepped simulation with the same entities:  at each step the hive uses the bee counts and
+outside temperature from the end of the previous step, and the bees only react when the hive temperature changes.
+"""
+
+from bisect import bisect_left, bisect_right
+
+import numpy
+
+from scarab_examples.beehive.temperature_profile import outside_temperature_profile
+
+
+def outside_temperatures(min_temp=50.0, max_temp=80.0) -> numpy.ndarray:
+    """
+    Returns the outside temperature for each minute of the day, the same as OutsideTemperature calculates.
+    :param float min_temp: The minimum temperature during the day.
+    :param float max_temp: The maximum temperature during the day.
+    :return: Read-only array with the temperature for each minute of the day, shared with other runs.
+    """
+    return outside_temperature_profile(min_temp=min_temp, max_temp=max_temp, resolution=1.0)
+
+
+# The adaptive mode steps every minute until nothing has changed for QUIET_STEPS steps, then integrates blocks of steps
+# at once, doubling up to MAX_ADAPTIVE_STEPS.  The maximum also keeps the powers of the step factor in range.
+QUIET_STEPS = 16
+MAX_ADAPTIVE_STEPS = 1024
+
+
+def run(buzz_temps, fan_temps, max_steps, start_temp=60.0, buzzing_impact=0.5, fanning_impact=0.5,
+        min_outside_temp=50.0, max_outside_temp=80.0, outside_temps=None, adaptive=False) -> dict:
+    """
+    Runs the beehive model for the number of steps.  Each step is one minute.
+    :param list of float buzz_temps: The temperature below which each bee buzzes.
+    :param list of float fan_temps: The temperature above which each bee fans.
+    :param int max_steps: The number of steps to run.
+    :param float start_temp: The starting temperature for the beehive.
+    :param float buzzing_impact: The impact on temperature for any given bee buzzing.
+    :param float fanning_impact: The impact on temperature for any given bee fanning.
+    :param float min_outside_temp: The minimum outside temperature during the day.
+    :param float max_outside_temp: The maximum outside temperature during the day.
+    :param list of float outside_temps: The outside temperature for each time from 0 to max_steps, such as from a
+    weather file.  Replaces the min and max outside temps.
+    :param bool adaptive: True to jump from one bee state change to the next instead of stepping every minute.  The
+    temps are the same to rounding.
+    :return: Dictionary of arrays with one entry per time from 0 to max_steps:  time, hive_temp, outside_temp,
+    number_bees_buzzing and number_bees_fanning.  Each entry is the state at the end of that step.
+    """
+    assert max_steps >= 0
+
+    buzz_temps = numpy.asarray(buzz_temps, dtype=numpy.float64)
+    fan_temps = numpy.asarray(fan_temps, dtype=numpy.float64)
+    assert len(buzz_temps) == len(fan_temps)
+
+    # Sorted temps so the counts are a binary search.  Bees with the fan temp below the buzz temp buzz until the buzz
+    # temp and fan from there, so they are counted by their buzz temp.  Same as the BeeThresholdIndex.
+    overlap = fan_temps < buzz_temps
+    sorted_buzz_temps = numpy.sort(buzz_temps)
+    sorted_fan_temps = numpy.sort(fan_temps[~overlap])
+    sorted_overlap_buzz_temps = numpy.sort(buzz_temps[overlap])
+
+    times = numpy.arange(0, max_steps + 1)
+    if outside_temps is None:
+        profile = outside_temperatures(min_temp=min_outside_temp, max_temp=max_outside_temp)
+        outside_temps = profile[times % len(profile)]
+    else:
+        outside_temps = numpy.array(outside_temps[:max_steps + 1], dtype=numpy.float64)
+        assert len(outside_temps) == max_steps + 1
+
+    run_steps = _run_adaptive if adaptive else _run_every_step
+    hive_temps, buzzing, fanning = run_steps(sorted_buzz_temps, sorted_fan_temps, sorted_overlap_buzz_temps,
+                                             outside_temps, float(start_temp), buzzing_impact, fanning_impact)
+
+    return {
+        "time": times,
+        "hive_temp": hive_temps,
+        "outside_temp": outside_temps,
+        "number_bees_buzzing": buzzing,
+        "number_bees_fanning": fanning,
+    }
+
+
+def integrate_steps(current_temp, hive_outside_temps, bee_impact, warmer_outside) -> numpy.ndarray:
+    """
+    Calculates a run of steps at once, assuming the bees don't change and the hive stays on the same side of the
+    outside temp it sees.  Each step is H' = A * H + (1 - A) * O + k, where A is .8 when it is warmer outside and 1.2
+    when it is cooler (the outside temp always warms the hive) and k is the bee impact.  So after i steps
+    H[i] = A^i * (H[0] + sum over j < i of A^-(j + 1) * ((1 - A) * O[j] + k)).
+    :param float current_temp: The hive temp before the first step.
+    :param numpy.ndarray hive_outside_temps: The outside temp the hive sees at each step.
+    :param float bee_impact: The impact of the bees buzzing less the bees fanning.
+    :param bool warmer_outside: True if the outside temp is warmer than the hive.
+    :return: The hive temp at the end of each step.
+    """
+    factor = .8 if warmer_outside else 1.2
+    with numpy.errstate(over="ignore", invalid="ignore"):  # a runaway hive goes to infinity either way.
+        powers = factor ** numpy.arange(1, len(hive_outside_temps) + 1)
+        sums = numpy.cumsum(((1 - factor) * numpy.asarray(hive_outside_temps) + bee_impact) / powers)
+        return powers * (current_temp + sums)
+
+
+def _run_every_step(sorted_buzz_temps, sorted_fan_temps, sorted_overlap_buzz_temps, outside_temps, start_temp,
+                    buzzing_impact, fanning_impact) -> tuple:
+    """Runs the model one minute at a time.  Returns the hive temps, buzzing counts and fanning counts."""
+    sorted_buzz_temps = sorted_buzz_temps.tolist()
+    sorted_fan_temps = sorted_fan_temps.tolist()
+    sorted_overlap_buzz_temps = sorted_overlap_buzz_temps.tolist()
+    number_bees = len(sorted_buzz_temps)
+    outside_temps_list = outside_temps.tolist()
+
+    current_temp = start_temp
+    hive_outside_temp = start_temp  # the hive starts with its own temp until the outside temp changes.
+    number_bees_buzzing = 0  # bees start out doing nothing until the hive temp changes.
+    number_bees_fanning = 0
+
+    hive_temps = [current_temp]
+    buzzing = [number_bees_buzzing]
+    fanning = [number_bees_fanning]
+
+    for new_time in range(1, len(outside_temps_list)):
+        bee_impact = (number_bees_buzzing * buzzing_impact) - (number_bees_fanning * fanning_impact)
+
+        # Same as the beehive, including the outside temp always adding to the hive temp.
+        if hive_outside_temp > current_temp:
+            outside_temp_impact = .2 * (hive_outside_temp - current_temp)
+        else:
+            outside_temp_impact = .2 * (current_temp - hive_outside_temp)
+
+        new_temp = current_temp + outside_temp_impact + bee_impact
+        if new_temp != current_temp:  # the bees only react to changes.
+            current_temp = new_temp
+            number_bees_buzzing = number_bees - bisect_right(sorted_buzz_temps, current_temp)
+            number_bees_fanning = bisect_left(sorted_fan_temps, current_temp) + \
+                bisect_right(sorted_overlap_buzz_temps, current_temp)
+
+        if outside_temps_list[new_time] != outside_temps_list[new_time - 1]:
+            hive_outside_temp = outside_temps_list[new_time]
+
+        hive_temps.append(current_temp)
+        buzzing.append(number_bees_buzzing)
+        fanning.append(number_bees_fanning)
+
+    return (numpy.array(hive_temps, dtype=numpy.float64), numpy.array(buzzing, dtype=numpy.int64),
+            numpy.array(fanning, dtype=numpy.int64))
+
+
+def _run_adaptive(sorted_buzz_temps, sorted_fan_temps, sorted_overlap_buzz_temps, outside_temps, start_temp,
+                  buzzing_impact, fanning_impact) -> tuple:
+    """
+    Runs the model by jumping over the stretches where the bees don't change.  Returns the hive temps, buzzing counts
+    and fanning counts.
+
+    While the bee counts are fixed and the hive stays on the same side of the outside temp it sees, a block of steps is
+    calculated at once with integrate_steps for any outside temps, including where the outside temp turns around.  The
+    block is cut at the first step where the bees would change or the hive crosses the outside temp, and the next block
+    starts from there.
+
+    While the bees are changing every few steps the blocks don't pay off, so it steps every minute the same as
+    _run_every_step until the bees are quiet again.
+    """
+    number_steps = len(outside_temps) - 1
+    number_bees = len(sorted_buzz_temps)
+
+    # The outside temp the hive uses at each step is the temp seen at the end of the step before.  It starts with
+    # its own temp until the outside temp changes.
+    changed = numpy.concatenate([[False], outside_temps[1:] != outside_temps[:-1]])
+    last_change = numpy.maximum.accumulate(numpy.where(changed, numpy.arange(0, number_steps + 1), 0))
+    hive_outside_temps = numpy.where(last_change > 0, outside_temps[last_change], start_temp)
+    hive_outside_temps_list = hive_outside_temps.tolist()
+
+    buzz_temps_list = sorted_buzz_temps.tolist()
+    fan_temps_list = sorted_fan_temps.tolist()
+    overlap_buzz_temps_list = sorted_overlap_buzz_temps.tolist()
+
+    hive_temps = numpy.empty(number_steps + 1, dtype=numpy.float64)
+    buzzing = numpy.zeros(number_steps + 1, dtype=numpy.int64)
+    fanning = numpy.zeros(number_steps + 1, dtype=numpy.int64)
+    hive_temps[0] = start_temp
+
+    current_temp = start_temp
+    number_bees_buzzing = 0  # bees start out doing nothing until the hive temp changes.
+    number_bees_fanning = 0
+    bees_notified = False
+    quiet_steps = 0  # steps in a row where nothing changed.
+    block_size = QUIET_STEPS
+
+    time = 0
+    while time < number_steps:
+        hive_outside_temp = hive_outside_temps_list[time]
+        warmer_outside = hive_outside_temp > current_temp
+
+        if quiet_steps < QUIET_STEPS or not bees_notified:
+            # one step, the same as _run_every_step.
+            bee_impact = (number_bees_buzzing * buzzing_impact) - (number_bees_fanning * fanning_impact)
+            if warmer_outside:
+                outside_temp_impact = .2 * (hive_outside_temp - current_temp)
+            else:
+                outside_temp_impact = .2 * (current_temp - hive_outside_temp)
+
+            new_temp = current_temp + outside_temp_impact + bee_impact
+            previous_counts = (number_bees_buzzing, number_bees_fanning)
+            if new_temp != current_temp:  # the bees only react to changes.
+                bees_notified = True
+                current_temp = new_temp
+                number_bees_buzzing = number_bees - bisect_right(buzz_temps_list, current_temp)
+                number_bees_fanning = bisect_left(fan_temps_list, current_temp) + \
+                    bisect_right(overlap_buzz_temps_list, current_temp)
+
+            time += 1
+            hive_temps[time] = current_temp
+            buzzing[time] = number_bees_buzzing
+            fanning[time] = number_bees_fanning
+
+            still_warmer_outside = hive_outside_temps_list[time] > current_temp if time < number_steps else \
+                warmer_outside
+            if previous_counts == (number_bees_buzzing, number_bees_fanning) and \
+                    still_warmer_outside == warmer_outside:
+                quiet_steps += 1
+            else:
+                quiet_steps = 0
+                block_size = QUIET_STEPS
+            continue
+
+        # a block of steps, assuming nothing changes.
+        bee_impact = (number_bees_buzzing * buzzing_impact) - (number_bees_fanning * fanning_impact)
+        size = min(block_size, number_steps - time)
+        block_temps = integrate_steps(current_temp, hive_outside_temps[time:time + size], bee_impact, warmer_outside)
+
+        # the block is good up to and including the first step where the bees change or the hive crosses the outside
+        # temp, since the step to it still used the old state.
+        block_buzzing = number_bees - numpy.searchsorted(sorted_buzz_temps, block_temps, side="right")
+        block_fanning = numpy.searchsorted(sorted_fan_temps, block_temps, side="left") + \
+            numpy.searchsorted(sorted_overlap_buzz_temps, block_temps, side="right")
+        changes = numpy.flatnonzero((block_buzzing != number_bees_buzzing) | (block_fanning != number_bees_fanning) |
+                                    ((hive_outside_temps[time + 1:time + size + 1] > block_temps) != warmer_outside))
+        used = int(changes[0]) + 1 if len(changes) else size
+
+        hive_temps[time + 1:time + used + 1] = block_temps[:used]
+        buzzing[time + 1:time + used + 1] = block_buzzing[:used]
+        fanning[time + 1:time + used + 1] = block_fanning[:used]
+        time += used
+        current_temp = float(hive_temps[time])
+        number_bees_buzzing = int(buzzing[time])
+        number_bees_fanning = int(fanning[time])
+
+        if used == size:  # longer blocks while nothing changes.
+            block_size = min(block_size * 2, MAX_ADAPTIVE_STEPS)
+        else:  # back to single steps while the bees are busy.
+            quiet_steps = 0
+            block_size = QUIET_STEPS
+
+    return hive_temps, buzzing, fanning
@@ -0,0 +1,236 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Writers for the reports from the command line beehive.  A report is a tuple of the display model values in the order
+of REPORT_FIELDS.  Reports are written in batches, and only the text writer formats them for people to read.
+"""
+
+import csv
+import io
+import json
+from abc import ABC, abstractmethod
+
+import numpy
+
+# The fields in each report.  None is used for values that aren't known yet.
+REPORT_FIELDS = [
+    "previous_time",
+    "time",
+    "outside_temp",
+    "min_outside_temp",
+    "max_outside_temp",
+    "hive_temp",
+    "min_hive_temp",
+    "max_hive_temp",
+    "number_bees",
+    "min_number_bees",
+    "max_number_bees",
+    "number_bees_buzzing",
+    "min_number_bees_buzzing",
+    "max_number_bees_buzzing",
+    "number_bees_fanning",
+    "min_number_bees_fanning",
+    "max_number_bees_fanning",
+]
+
+# The layout of each record in the binary output.  Unknown temps are NaN and unknown counts are -1.
+BINARY_RECORD_DTYPE = numpy.dtype([(field, "<f8" if "temp" in field else "<i8") for field in REPORT_FIELDS])
+
+
+def create_report(display_model) -> tuple:
+    """
+    Creates a report from the current values of the display model.
+    :param BeehiveDisplayModel display_model: The display model for the simulation.
+    :return: The values in the order of REPORT_FIELDS.
+    """
+    beehive = display_model.beehive
+    return (display_model.previous_time,
+            display_model.new_time,
+            display_model.outside_temp,
+            display_model.min_outside_temp if display_model.outside_temp is not None else None,
+            display_model.max_outside_temp if display_model.outside_temp is not None else None,
+            beehive.current_temp if beehive else None,
+            display_model.min_hive_temp if beehive else None,
+            display_model.max_hive_temp if beehive else None,
+            beehive.number_bees if beehive else None,
+            display_model.min_number_bees if beehive else None,
+            display_model.max_number_bees if beehive else None,
+            beehive.number_bees_buzzing if beehive else None,
+            display_model.min_number_bees_buzzing if beehive else None,
+            display_model.max_number_bees_buzzing if beehive else None,
+            beehive.number_bees_fanning if beehive else None,
+            display_model.min_number_bees_fanning if beehive else None,
+            display_model.max_number_bees_fanning if beehive else None)
+
+
+def create_kernel_reports(results, number_bees, report_every) -> list:
+    """
+    Creates the reports for a run of the headless kernel, the same as the display model would give for the run.
+    :param dict results: The results from kernel.run.
+    :param int number_bees: The number of bees in the hive.
+    :param int report_every: The number of steps between reports.
+    :return: List of reports, each in the order of REPORT_FIELDS.
+    """
+    # the display model only sees the values from the first step on, so the starting values aren't in the stats.
+    minimums = {name: numpy.minimum.accumulate(values[1:]) for name, values in results.items()}
+    maximums = {name: numpy.maximum.accumulate(values[1:]) for name, values in results.items()}
+
+    reports = []
+    for time in range(report_every, len(results["time"]), report_every):
+        report = [time - 1, time]
+        for name in ["outside_temp", "hive_temp"]:
+            report += [float(results[name][time]), float(minimums[name][time - 1]), float(maximums[name][time - 1])]
+        report += [number_bees, number_bees, number_bees]
+        for name in ["number_bees_buzzing", "number_bees_fanning"]:
+            report += [int(results[name][time]), int(minimums[name][time - 1]), int(maximums[name][time - 1])]
+        reports.append(tuple(report))
+    return reports
+
+
+class ReportWriter(ABC):
+    """Writes reports to an output in batches.  Subclasses encode a batch of reports."""
+
+    binary = False  # true if the output has to be opened in binary mode.
+
+    def __init__(self, output, batch_size=64):
+        """
+        Creates a writer.
+        :param file output: The output to write to, binary or text as set by the class.
+        :param int batch_size: The number of reports to keep before they are written.
+        """
+        assert batch_size > 0
+        self._output = output
+        self._batch_size = batch_size
+        self._batch = []
+
+    def write(self, report) -> None:
+        """
+        Adds a report, writing the batch if it is full.
+        :param tuple report: The values in the order of REPORT_FIELDS.
+        """
+        self._batch.append(report)
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the reports in the batch.
+        """
+        if self._batch:
+            self._output.write(self._encode(self._batch))
+            self._batch = []
+        self._output.flush()
+
+    def close(self) -> None:
+        """
+        Writes any reports left in the batch.  The output isn't closed.
+        """
+        self.flush()
+
+    @abstractmethod
+    def _encode(self, reports):
+        """
+        Returns the reports as text or bytes to write.
+        :param list of tuple reports: The reports to encode.
+        """
+
+
+class TextReportWriter(ReportWriter):
+    """Writes the reports as text for people to read."""
+
+    def _encode(self, reports) -> str:
+        """Formats each report as a block of lines."""
+        return "".join([TextReportWriter.__format(dict(zip(REPORT_FIELDS, report))) for report in reports])
+
+    @staticmethod
+    def __format(report) -> str:
+        """Formats one report."""
+        lines = ["=======================================",
+                 f"Update from time {report['previous_time']} to {report['time']}",
+                 "Temperature status:"]
+        if report["outside_temp"] is None or report["hive_temp"] is None:
+            lines.append("\tunknown")
+        else:
+            lines.append(f"\toutside temp: {report['outside_temp']:.1f}"
+                         f" (min: {report['min_outside_temp']:.1f} max: {report['max_outside_temp']:.1f})")
+            lines.append(f"\thive temp: {report['hive_temp']:.1f}"
+                         f" (min: {report['min_hive_temp']:.1f} max: {report['max_hive_temp']:.1f})")
+
+        lines.append("Bees:")
+        if report["number_bees"] is None:
+            lines.append("\tunknown")
+        else:
+            lines.append(f"\ttotal bees: {report['number_bees']}"
+                         f" (min: {report['min_number_bees']} max: {report['max_number_bees']})")
+            lines.append(f"\tbees buzzing: {report['number_bees_buzzing']}"
+                         f" (min: {report['min_number_bees_buzzing']} max: {report['max_number_bees_buzzing']})")
+            lines.append(f"\tbees fanning: {report['number_bees_fanning']}"
+                         f" (min: {report['min_number_bees_fanning']} max: {report['max_number_bees_fanning']})")
+
+        lines.append("")
+        return "\n".join(lines) + "\n"
+
+
+class JsonlReportWriter(ReportWriter):
+    """Writes each report as a JSON object on its own line."""
+
+    def _encode(self, reports) -> str:
+        """Encodes each report as a line of JSON."""
+        return "".join([json.dumps(dict(zip(REPORT_FIELDS, report))) + "\n" for report in reports])
+
+
+class CsvReportWriter(ReportWriter):
+    """Writes the reports as CSV with a header row before the first report."""
+
+    def __init__(self, output, batch_size=64):
+        """
+        Creates a writer.
+        :param file output: The text output to write to.
+        :param int batch_size: The number of reports to keep before they are written.
+        """
+        super().__init__(output=output, batch_size=batch_size)
+        self.__header_written = False
+
+    def _encode(self, reports) -> str:
+        """Encodes the reports as CSV rows.  Unknown values are empty."""
+        text = io.StringIO()
+        writer = csv.writer(text, lineterminator="\n")
+        if not self.__header_written:
+            writer.writerow(REPORT_FIELDS)
+            self.__header_written = True
+        writer.writerows(reports)
+        return text.getvalue()
+
+
+class BinaryReportWriter(ReportWriter):
+    """Writes the reports as fixed size little endian records laid out as BINARY_RECORD_DTYPE."""
+
+    binary = True
+
+    def _encode(self, reports) -> bytes:
+        """Packs the reports as records."""
+        missing = tuple([numpy.nan if "temp" in field else -1 for field in REPORT_FIELDS])
+        records = [tuple([m if v is None else v for v, m in zip(report, missing)]) for report in reports]
+        return numpy.array(records, dtype=BINARY_RECORD_DTYPE).tobytes()
+
+
+# The writer for each output format.
+REPORT_WRITERS = {
+    "text": TextReportWriter,
+    "jsonl": JsonlReportWriter,
+    "csv": CsvReportWriter,
+    "binary": BinaryReportWriter,
+}
@@ -0,0 +1,248 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Splits the bees of one huge hive across worker processes.  The buzz and fan temps and the state of every bee are kept
+in one block of shared memory, and each worker owns a contiguous partition of the bees.  When the hive temp changes,
+the population writes it to the shared block and the workers update their partitions in parallel and leave their
+buzzing and fanning counts next to it.  The population adds up the counts and publishes them the same as a
+BeePopulation, so the hive sees no difference.
+
+The workers and the population only meet at a barrier, twice per hive temp change:  once to start the workers on the
+new temp and once when the counts are ready.  Nothing is pickled after the workers are started.
+"""
+
+import multiprocessing
+import os
+import threading
+import weakref
+from multiprocessing import shared_memory
+
+import numpy
+
+from scarab.entities import *
+
+from scarab_examples.beehive.beehive import BEE_POPULATION_ENTITY_NAME, BEEHIVE_ENTITY_NAME
+
+# The slots of the control array.
+_HIVE_TEMP = 0
+_STOP = 1
+
+# The seconds to wait for the workers when shutting down before they are stopped.
+SHUTDOWN_TIMEOUT = 5.0
+
+# The seconds to wait for the workers to update their partitions before giving up on them.
+WORKER_TIMEOUT = 60.0
+
+
+def _shared_arrays(buffer, number_bees, number_workers) -> dict:
+    """
+    Returns the arrays in the shared block.  The 8 byte arrays come first so every array is aligned.
+    :param memoryview buffer: The shared block.
+    :param int number_bees: The number of bees.
+    :param int number_workers: The number of workers.
+    :return: Dictionary of the arrays by name.
+    """
+    layout = [("buzz_temp", numpy.float64, number_bees), ("fan_temp", numpy.float64, number_bees),
+              ("control", numpy.float64, 2), ("counts", numpy.int64, 2 * number_workers),
+              ("is_buzzing", numpy.bool_, number_bees), ("is_fanning", numpy.bool_, number_bees)]
+    arrays, offset = {}, 0
+    for name, dtype, count in layout:
+        arrays[name] = numpy.ndarray(count, dtype=dtype, buffer=buffer, offset=offset)
+        offset += count * numpy.dtype(dtype).itemsize
+    arrays["counts"] = arrays["counts"].reshape(number_workers, 2)
+    return arrays
+
+
+def _shared_size(number_bees, number_workers) -> int:
+    """Returns the size of the shared block in bytes."""
+    return 8 * (2 * number_bees + 2 + 2 * number_workers) + 2 * number_bees
+
+
+def _run_partition(memory, number_bees, number_workers, worker, start, end, barrier) -> None:
+    """
+    Updates one partition of the bees each time the hive temp changes.  This is run in the worker processes.
+    :param SharedMemory memory: The shared block.
+    :param int number_bees: The number of bees.
+    :param int number_workers: The number of workers.
+    :param int worker: The number of this worker, which is its row in the counts.
+    :param int start: The first bee in the partition.
+    :param int end: The bee after the last one in the partition.
+    :param multiprocessing.Barrier barrier: The barrier shared with the population and the other workers.
+    """
+    arrays = _shared_arrays(memory.buf, number_bees, number_workers)
+    buzz_temp, fan_temp = arrays["buzz_temp"][start:end], arrays["fan_temp"][start:end]
+    is_buzzing, is_fanning = arrays["is_buzzing"][start:end], arrays["is_fanning"][start:end]
+    control, counts = arrays["control"], arrays["counts"][worker]
+
+    try:
+        while True:
+            barrier.wait()  # wait for a new hive temp.
+            if control[_STOP]:
+                break
+
+            # Same rules as a single bee:  buzzing wins over fanning if the bee is outside both limits.
+            hive_temp = control[_HIVE_TEMP]
+            numpy.less(hive_temp, buzz_temp, out=is_buzzing)
+            numpy.greater(hive_temp, fan_temp, out=is_fanning)
+            is_fanning &= ~is_buzzing
+            counts[0] = numpy.count_nonzero(is_buzzing)
+            counts[1] = numpy.count_nonzero(is_fanning)
+
+            barrier.wait()  # the counts are ready.
+    except threading.BrokenBarrierError:
+        pass  # the population was shut down.
+    finally:
+        del buzz_temp, fan_temp, is_buzzing, is_fanning, control, counts, arrays
+        memory.close()
+
+
+def _shutdown(memory, arrays, barrier, processes) -> None:
+    """Stops the workers and frees the shared block.  Doesn't use the population, so it can run after it is gone."""
+    # The barrier waits forever to wake a worker that exited while waiting at it, so then the others are terminated.
+    all_alive = all([process.is_alive() for process in processes])
+    if all_alive:
+        try:
+            arrays["control"][_STOP] = 1
+            barrier.wait(timeout=SHUTDOWN_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+    for process in processes:
+        if all_alive:
+            process.join(timeout=SHUTDOWN_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    arrays.clear()
+    try:
+        memory.close()
+    except BufferError:
+        pass  # views of the block are still held, such as at exit.  The block is still unlinked.
+    memory.unlink()
+
+
+class PartitionedBeePopulation(Entity):
+    """
+    A population of bees that is updated by worker processes, each with a partition of the bees in shared memory.  It
+    publishes the same counts as a BeePopulation.  Call close when the simulation is done to stop the workers.  They
+    are also stopped when the population is garbage collected or at exit.
+    """
+
+    def __init__(self, buzz_temps, fan_temps, workers=None, timeout=WORKER_TIMEOUT, name=BEE_POPULATION_ENTITY_NAME):
+        """
+        Creates the population and starts the workers.
+        :param list of float buzz_temps: The minimum temperature for each bee.  Below this level it starts buzzing.
+        :param list of float fan_temps: The maximum temperature for each bee.  Above this level it starts fanning.
+        :param int workers: The number of worker processes.  Defaults to the number of cores.
+        :param float timeout: The seconds to wait for the workers to update their partitions.
+        :param str name: The entity name.
+        """
+        assert len(buzz_temps) == len(fan_temps)
+        number_bees = len(buzz_temps)
+        number_workers = max(1, min(workers or os.cpu_count(), number_bees))
+
+        self.__memory = shared_memory.SharedMemory(create=True, size=max(1, _shared_size(number_bees, number_workers)))
+        self.__arrays = _shared_arrays(self.__memory.buf, number_bees, number_workers)
+        self.__arrays["buzz_temp"][:] = buzz_temps
+        self.__arrays["fan_temp"][:] = fan_temps
+        self.__arrays["is_buzzing"][:] = False
+        self.__arrays["is_fanning"][:] = False
+        self.__arrays["control"][:] = 0
+        self.__arrays["counts"][:] = 0
+
+        # The shared block is passed to the workers, not its name, so the workers don't register it again.
+        self.__barrier = multiprocessing.Barrier(number_workers + 1)
+        bounds = numpy.linspace(0, number_bees, number_workers + 1).astype(int).tolist()
+        self.__processes = [multiprocessing.Process(target=_run_partition, daemon=True,
+                                                    args=(self.__memory, number_bees, number_workers, worker,
+                                                          bounds[worker], bounds[worker + 1], self.__barrier))
+                            for worker in range(0, number_workers)]
+        for process in self.__processes:
+            process.start()
+        self.__shutdown = weakref.finalize(self, _shutdown, self.__memory, self.__arrays, self.__barrier,
+                                           self.__processes)
+        self.__timeout = timeout
+
+        self.number_bees = number_bees
+        self.number_bees_buzzing = 0
+        self.number_bees_fanning = 0
+
+        super().__init__(name=name)
+
+    @property
+    def number_workers(self) -> int:
+        """Returns the number of worker processes."""
+        return len(self.__processes)
+
+    @property
+    def is_buzzing(self) -> numpy.ndarray:
+        """Returns a read-only view of whether each bee is buzzing."""
+        return self.__read_only(self.__arrays["is_buzzing"])
+
+    @property
+    def is_fanning(self) -> numpy.ndarray:
+        """Returns a read-only view of whether each bee is fanning."""
+        return self.__read_only(self.__arrays["is_fanning"])
+
+    @staticmethod
+    def __read_only(values) -> numpy.ndarray:
+        """Returns a view of the values that can't be written to."""
+        view = values.view()
+        view.setflags(write=False)
+        return view
+
+    def close(self) -> None:
+        """
+        Stops the workers and frees the shared memory.  The population can't be used after it is closed.
+        """
+        self.__shutdown()
+
+    def __wait(self) -> None:
+        """
+        Waits at the barrier for the workers.  If a worker has exited or they don't get there in time, the workers are
+        stopped and a RuntimeError is raised, since the counts can't be trusted.
+        """
+        exited = [process for process in self.__processes if not process.is_alive()]
+        if not exited:
+            try:
+                self.__barrier.wait(timeout=self.__timeout)
+                return
+            except threading.BrokenBarrierError:
+                exited = [process for process in self.__processes if not process.is_alive()]
+
+        self.__shutdown()
+        if exited:
+            raise RuntimeError(f"{len(exited)} of {len(self.__processes)} bee workers exited (exit codes "
+                               f"{[process.exitcode for process in exited]})")
+        raise RuntimeError(f"the bee workers didn't update their partitions within {self.__timeout} seconds")
+
+    @entity_changed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_temperature_change(self, beehive, changed_properties) -> None:
+        """
+        Handles changes to the temperature in the hive by having the workers update their partitions.
+        :param Beehive beehive: The beehive that had a temp change.
+        :param dict changed_properties: The properties that changed.  Only interested in temp changes.
+        :return: None
+        """
+        if "current_temp" in changed_properties:
+            self.__arrays["control"][_HIVE_TEMP] = beehive.current_temp
+            self.__wait()  # start the workers.
+            self.__wait()  # wait for the counts.
+
+            counts = self.__arrays["counts"].sum(axis=0)
+            self.number_bees_buzzing = int(counts[0])
+            self.number_bees_fanning = int(counts[1])
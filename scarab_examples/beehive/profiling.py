@@ -0,0 +1,206 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Opt-in profiling of the event handlers of the beehive entities.  When installed, each handler is wrapped to count the
+calls and time them.  Nothing is wrapped until the profiler is installed, so there is no cost when it isn't used.
+
+The profiler must be installed before the entities are created and added to the simulation.
+"""
+
+import functools
+import time
+
+from scarab.entities import entity_changed_event_handler, entity_created_event_handler, \
+    entity_destroyed_event_handler, time_update_event_handler
+
+from scarab_examples.beehive.beehive import Bee, BeePopulation, Beehive, OutsideTemperature, BeehiveDisplayModel
+
+BEEHIVE_ENTITY_CLASSES = [Bee, BeePopulation, Beehive, OutsideTemperature, BeehiveDisplayModel]
+
+
+def _handler_markers() -> frozenset:
+    """
+    Returns the names of the attributes the scarab handler decorators set on a handler, which is how the simulation
+    finds the handlers of an entity.  They are found by decorating a handler with each decorator.
+    """
+    markers = set()
+    for decorator in [time_update_event_handler, entity_created_event_handler(entity_name="entity"),
+                      entity_changed_event_handler(entity_name="entity"),
+                      entity_destroyed_event_handler(entity_name="entity")]:
+        def handler(self, *args):
+            pass
+        plain = set(vars(handler))
+        markers.update(set(vars(decorator(handler))) - plain)
+    return frozenset(markers)
+
+
+_HANDLER_MARKERS = _handler_markers()
+
+
+def is_handler(function) -> bool:
+    """
+    Returns true if the function is decorated as a scarab event handler.
+    :param function: The class attribute to check.
+    :return: True if it has the attributes set by the handler decorators.
+    """
+    return callable(function) and any([hasattr(function, marker) for marker in _HANDLER_MARKERS])
+
+
+# Latencies are kept in buckets with 4 buckets per power of two, so the percentiles are within 25% without keeping
+# every call.
+_SUB_BUCKET_BITS = 2
+
+
+def _bucket(nanoseconds) -> int:
+    """Returns the histogram bucket for the latency."""
+    bits = nanoseconds.bit_length()
+    if bits <= _SUB_BUCKET_BITS:
+        return nanoseconds
+    return (bits << _SUB_BUCKET_BITS) | ((nanoseconds >> (bits - _SUB_BUCKET_BITS - 1)) & ((1 << _SUB_BUCKET_BITS) - 1))
+
+
+def _bucket_upper_bound(bucket) -> int:
+    """Returns the largest latency that goes in the bucket."""
+    if bucket < (1 << _SUB_BUCKET_BITS):
+        return bucket
+    bits, sub_bucket = bucket >> _SUB_BUCKET_BITS, bucket & ((1 << _SUB_BUCKET_BITS) - 1)
+    shift = bits - _SUB_BUCKET_BITS - 1
+    return ((((1 << _SUB_BUCKET_BITS) | sub_bucket) + 1) << shift) - 1
+
+
+class HandlerStats:
+    """Call count and latencies for one handler."""
+
+    def __init__(self, entity_type, handler_name):
+        """
+        Creates empty stats for the handler.
+        :param str entity_type: The name of the entity class.
+        :param str handler_name: The name of the handler method.
+        """
+        self.entity_type = entity_type
+        self.handler_name = handler_name
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = {}
+
+    def record(self, nanoseconds) -> None:
+        """
+        Records one call to the handler.
+        :param int nanoseconds: The time the call took.
+        """
+        self.calls += 1
+        self.total_ns += nanoseconds
+        if nanoseconds > self.max_ns:
+            self.max_ns = nanoseconds
+        bucket = _bucket(nanoseconds)
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def merge(self, other) -> None:
+        """
+        Adds the calls of other stats, such as another handler of the same entity type.
+        :param HandlerStats other: The stats to add.
+        """
+        self.calls += other.calls
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        for bucket, count in other.histogram.items():
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + count
+
+    def percentile(self, percent) -> int:
+        """
+        Returns the latency that the percent of calls are at or below.
+        :param float percent: The percentile from 0 to 100.
+        :return: The latency in nanoseconds, rounded up to the bucket.
+        """
+        if not self.calls:
+            return 0
+        needed = self.calls * percent / 100.0
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= needed:
+                return min(_bucket_upper_bound(bucket), self.max_ns)
+        return self.max_ns
+
+
+class HandlerProfiler:
+    """Wraps the handlers of entity classes to record how long they take."""
+
+    def __init__(self):
+        """
+        Creates a profiler that isn't installed on any classes.
+        """
+        self.stats = {}  # (entity type, handler name) -> HandlerStats
+        self.__originals = []  # (class, name, function) to restore.
+
+    def install(self, classes=None) -> None:
+        """
+        Wraps every handler of the classes.  Handlers are the methods with a scarab handler decorator, whatever their
+        names.
+        :param list of type classes: The entity classes to profile.  Defaults to all beehive entities.
+        """
+        for cls in classes if classes is not None else BEEHIVE_ENTITY_CLASSES:
+            for name, function in list(vars(cls).items()):
+                if is_handler(function):
+                    stats = self.stats.setdefault((cls.__name__, name), HandlerStats(cls.__name__, name))
+                    self.__originals.append((cls, name, function))
+                    setattr(cls, name, HandlerProfiler.__wrap(function, stats))
+
+    def uninstall(self) -> None:
+        """
+        Restores the original handlers.
+        """
+        for cls, name, function in reversed(self.__originals):
+            setattr(cls, name, function)
+        self.__originals = []
+
+    @staticmethod
+    def __wrap(function, stats):
+        """Returns the handler wrapped to record to the stats.  wraps keeps any attributes set by the decorators."""
+        @functools.wraps(function)
+        def profiled_handler(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.record(time.perf_counter_ns() - start)
+        return profiled_handler
+
+    def report(self) -> str:
+        """
+        Returns a report of the handlers sorted by total time, followed by the totals for each entity type.
+        :return: The report as text.
+        """
+        handlers = sorted([s for s in self.stats.values() if s.calls], key=lambda s: s.total_ns, reverse=True)
+
+        lines = [f"{'entity type':<22}{'handler':<36}{'calls':>12}{'total ms':>12}{'mean us':>10}{'p99 us':>10}"]
+        for stats in handlers:
+            lines.append(f"{stats.entity_type:<22}{stats.handler_name:<36}{stats.calls:>12}"
+                         f"{stats.total_ns / 1e6:>12.1f}{stats.total_ns / stats.calls / 1e3:>10.2f}"
+                         f"{stats.percentile(99) / 1e3:>10.2f}")
+
+        entity_types = {}  # entity type -> HandlerStats of all its handlers.
+        for stats in handlers:
+            entity_types.setdefault(stats.entity_type, HandlerStats(stats.entity_type, None)).merge(stats)
+
+        lines.append("")
+        lines.append(f"{'entity type':<22}{'calls':>12}{'total ms':>12}{'p99 us':>10}")
+        for stats in sorted(entity_types.values(), key=lambda s: s.total_ns, reverse=True):
+            lines.append(f"{stats.entity_type:<22}{stats.calls:>12}{stats.total_ns / 1e6:>12.1f}"
+                         f"{stats.percentile(99) / 1e3:>10.2f}")
+
+        return "\n".join(lines)
@@ -16,98 +16,227 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 This module shows how to add a more complex GUI to a simulation.
 This uses the beehive classes, but has a PyQt display.
+
+The simulation runs at full speed on a worker thread.  After each step it appends the values to a ring buffer for the
+charts and publishes an immutable snapshot of the display model to a double buffer.  A timer on the GUI thread redraws
+from them at a fixed frame rate, with the history reduced to a min and max per pixel column, so the simulation isn't
+slowed by redraws and the GUI stays responsive.  The GUI controls the worker by putting commands on a queue.
 """
+import queue
 import sys
+from collections import namedtuple
 
 from PyQt5 import QtWidgets as qtw
 from PyQt5 import QtGui as qtg
 from PyQt5 import QtCore as qtc
 
-import random
+import numpy
 
-from scarab_examples.beehive import *
+from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.chart_data import DoubleBuffer, RingBuffer, decimate_min_max
+from scarab_examples.beehive.cli_beehive import TARGET_BEE_BUZZING, TARGET_BEE_FANNING, BeehiveApp
 from scarab.entities import *
 from scarab.loggers import StdOutLogger
-from scarab.simulation import Simulation, ViewInterface, SIMULATION_LOGGING, EVENT_LOGGING, ENTITY_LOGGING
+from scarab.simulation import Simulation, SIMULATION_LOGGING, EVENT_LOGGING, ENTITY_LOGGING
 
 StdOutLogger(topics=SIMULATION_LOGGING)
 # StdOutLogger(topics=EVENT_LOGGING)
 # StdOutLogger(topics=ENTITY_LOGGING)
 
+FRAMES_PER_SECOND = 20  # the most the charts are redrawn, however fast the simulation runs.
+HISTORY_STEPS = 1 << 16  # the steps kept for the charts, about 45 days.
 
-class BeehiveDisplayModel(Entity):
-    """Manages content for display by the application.  Used instead of the beehive display class."""
+# The series in each chart as (field, label, color).
+TEMPERATURE_SERIES = [("outside_temp", "outside", "#1f77b4"), ("hive_temp", "hive", "#d62728")]
+ACTIVITY_SERIES = [("number_bees_buzzing", "buzzing", "#ff7f0e"), ("number_bees_fanning", "fanning", "#2ca02c")]
+CHART_FIELDS = [field for field, _, _ in TEMPERATURE_SERIES + ACTIVITY_SERIES]
 
-    def __init__(self):
+# The commands the GUI sends to the simulation worker.
+PAUSE = "pause"
+RESUME = "resume"
+SHUTDOWN = "shutdown"
+
+# The state of the display model after a step.  The mins and maxes are over the display model's window of a day, the
+# mean and median over the whole run.  Tuples can't be changed, so the GUI can read them from any thread.
+DisplaySnapshot = namedtuple("DisplaySnapshot", [
+    "time", "outside_temp", "hive_temp", "number_bees", "number_bees_buzzing", "number_bees_fanning",
+    "min_outside_temp", "max_outside_temp", "min_hive_temp", "max_hive_temp", "mean_hive_temp", "median_hive_temp",
+    "min_number_bees_buzzing", "max_number_bees_buzzing", "min_number_bees_fanning", "max_number_bees_fanning"])
+
+
+class QtBeehiveDisplayModel(BeehiveDisplayModel):
+    """The beehive display model with the hive as soon as it is created and snapshots of its state for the GUI."""
+
+    @entity_created_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_beehive_created(self, beehive) -> None:
         """
-        Creates a new beehive display model.
+        Handles the beehive being created, so the GUI has it before it first changes.
+        :param RemoteEntity beehive: The beehive that was created.
         """
-        self._beehive = None
-        self._outside_temp = None
-        super().__init__(name="behive_display_model")
-
-        # mins are set to a very large number so they will be properly set the next time.
-        self.min_outside_temp = 1000000
-        self.max_outside_temp = 0
-        self.min_hive_temp = 1000000
-        self.max_hive_temp = 0
-        self.min_number_bees = 1000000
-        self.max_number_bees = 0
-        self.min_number_bees_buzzing = 1000000
-        self.max_number_bees_buzzing = 0
-        self.min_number_bees_fanning = 1000000
-        self.max_number_bees_fanning = 0
-
-    @entity_created_event_handler(entity_name="beehive")
-    def handle_beehive_changed(self, beehive) -> None:
+        self.beehive = beehive
+
+    def snapshot(self) -> DisplaySnapshot:
         """
-        Handles the beehive changing.
-        :param RemoteEntity beehive: The beehive that changed.
+        Returns the current state for the GUI.
+        :return: The state, with None for values that aren't known yet.
         """
-        self._beehive = beehive
-
-    @entity_changed_event_handler(entity_name="beehive")
-    def handle_beehive_changed(self, beehive, changed_properties) -> None:
+        beehive = self.beehive
+        return DisplaySnapshot(time=self.new_time, outside_temp=self.outside_temp,
+                               hive_temp=beehive.current_temp if beehive else None,
+                               number_bees=beehive.number_bees if beehive else None,
+                               number_bees_buzzing=beehive.number_bees_buzzing if beehive else None,
+                               number_bees_fanning=beehive.number_bees_fanning if beehive else None,
+                               min_outside_temp=self.stats["outside_temp"].window_min,
+                               max_outside_temp=self.stats["outside_temp"].window_max,
+                               min_hive_temp=self.stats["hive_temp"].window_min,
+                               max_hive_temp=self.stats["hive_temp"].window_max,
+                               mean_hive_temp=self.stats["hive_temp"].mean,
+                               median_hive_temp=self.stats["hive_temp"].quantile(.5),
+                               min_number_bees_buzzing=self.stats["number_bees_buzzing"].window_min,
+                               max_number_bees_buzzing=self.stats["number_bees_buzzing"].window_max,
+                               min_number_bees_fanning=self.stats["number_bees_fanning"].window_min,
+                               max_number_bees_fanning=self.stats["number_bees_fanning"].window_max)
+
+
+class SimulationWorker(qtc.QThread):
+    """Runs the simulation on its own thread and publishes the display state after every step."""
+
+    def __init__(self, settings, chart_data, snapshots):
         """
-        Handles the beehive changing.
-        :param RemoteEntity beehive: The beehive that changed.
-        :param list of str changed_properties: The properties that changed.
+        Creates the worker.  The simulation is created on the worker thread when it starts.
+        :param dict settings: The number_bees, vary_bees, outside_min_temp, outside_max_temp, buzzing_impact and
+        fanning_impact for the simulation.
+        :param RingBuffer chart_data: The buffer the values for the charts are appended to.
+        :param DoubleBuffer snapshots: The buffer the display snapshots are published to.
         """
-        assert changed_properties is not None
-        self._beehive = beehive
+        super().__init__()
+        self.settings = settings
+        self.chart_data = chart_data
+        self.snapshots = snapshots
+        self.commands = queue.SimpleQueue()
+
+    def run(self) -> None:
+        """Runs the simulation until it is shut down, stepping as fast as it can unless paused."""
+        settings = self.settings
+        with Simulation(name="QtBeehive", time_stepped=True, minimum_step_time=0) as simulation:
+            display_model = QtBeehiveDisplayModel()
+            simulation.add_entity(display_model)
+            simulation.add_entity(OutsideTemperature(min_temp=settings["outside_min_temp"],
+                                                     max_temp=settings["outside_max_temp"]))
+            simulation.add_entity(Beehive(start_temp=settings["outside_min_temp"],
+                                          buzzing_impact=settings["buzzing_impact"],
+                                          fanning_impact=settings["fanning_impact"]))
+            bee_variance = "vary" if settings["vary_bees"] else "same"
+            buzz_temps, fan_temps = BeehiveApp.create_bee_temps(number_bees=settings["number_bees"],
+                                                                bee_variance=bee_variance,
+                                                                target_bee_buzzing=TARGET_BEE_BUZZING,
+                                                                target_bee_fanning=TARGET_BEE_FANNING)
+            simulation.add_entity(BeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps))
+
+            paused = False
+            while True:
+                # wait for a command when paused, otherwise only look.
+                command = self.commands.get() if paused else self.__next_command()
+                if command == SHUTDOWN:
+                    break
+                elif command in (PAUSE, RESUME):
+                    paused = command == PAUSE
+                    continue
+
+                simulation.advance_and_wait(steps=1)
+                snapshot = display_model.snapshot()
+                self.chart_data.append(snapshot.time, [snapshot.outside_temp, snapshot.hive_temp,
+                                                       snapshot.number_bees_buzzing, snapshot.number_bees_fanning])
+                self.snapshots.publish(snapshot)
+
+    def __next_command(self):
+        """Returns the next command if there is one, otherwise None."""
+        try:
+            return self.commands.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class ChartWidget(qtw.QWidget):
+    """Draws series from the chart data as lines through the min and max of each pixel column."""
 
-        self.min_hive_temp = min(self.min_hive_temp, self._beehive.current_temp)
-        self.max_hive_temp = max(self.max_hive_temp, self._beehive.current_temp)
+    MARGIN = 40  # pixels left for the axis labels.
 
-        self.min_number_bees = min(self.min_number_bees, self._beehive.number_bees)
-        self.max_number_bees = max(self.max_number_bees, self._beehive.number_bees)
-        self.min_number_bees_fanning = min(self.min_number_bees_fanning, self._beehive.number_bees_fanning)
-        self.max_number_bees_fanning = max(self.max_number_bees_fanning, self._beehive.number_bees_fanning)
-        self.min_number_bees_buzzing = min(self.min_number_bees_buzzing, self._beehive.number_bees_buzzing)
-        self.max_number_bees_buzzing = max(self.max_number_bees_buzzing, self._beehive.number_bees_buzzing)
+    def __init__(self, series):
+        """
+        Creates an empty chart.
+        :param list of tuple series: The (field, label, color) of each series.
+        """
+        super().__init__()
+        self.__series = series
+        self.__columns = {}  # field -> (times, mins, maxs) for the current width.
+        self.setMinimumHeight(150)
 
-    @entity_changed_event_handler(entity_name="outside_temperature")
-    def handle_temp_changed(self, temp, changed_properties) -> None:
+    def set_data(self, data) -> None:
         """
-        Handles the outside temp changing.
-        :param RemoteEntity temp: The temperature entity that changed.
-        :param list of str changed_properties: The properties that changed.
-        :return: None
+        Reduces the data to the width of the chart and schedules a repaint.
+        :param dict data: The "time" and the values for each field, such as a RingBuffer snapshot.
         """
-        assert changed_properties
-        self._outside_temp = temp.current_temp
-        self.min_outside_temp = min(self.min_outside_temp, self._outside_temp)
-        self.max_outside_temp = max(self.max_outside_temp, self._outside_temp)
+        columns = max(1, self.width() - ChartWidget.MARGIN)
+        self.__columns = {field: decimate_min_max(data["time"], data[field], columns)
+                          for field, _, _ in self.__series}
+        self.update()
+
+    def paintEvent(self, event) -> None:
+        """Draws the series scaled to fit the chart."""
+        painter = qtg.QPainter(self)
+        painter.fillRect(self.rect(), qtc.Qt.white)
+
+        columns = [self.__columns[field] for field, _, _ in self.__series if field in self.__columns]
+        values = numpy.concatenate([numpy.concatenate([mins, maxs]) for _, mins, maxs in columns]) \
+            if columns else numpy.zeros(0)
+        values = values[~numpy.isnan(values)]
+        if not len(values):
+            painter.end()
+            return
+
+        low, high = float(values.min()), float(values.max())
+        if high == low:
+            low, high = low - 1, high + 1
+        width, height = self.width() - ChartWidget.MARGIN, self.height() - 20
+        painter.setPen(qtc.Qt.black)
+        painter.drawText(2, 12, f"{high:.1f}")
+        painter.drawText(2, height, f"{low:.1f}")
+
+        for index, (field, label, color) in enumerate(self.__series):
+            if field not in self.__columns:
+                continue
+            times, mins, maxs = self.__columns[field]
+            painter.setPen(qtg.QPen(qtg.QColor(color), 1))
+            painter.drawText(ChartWidget.MARGIN + 80 * index, self.height() - 4, label)
+
+            # a vertical stroke from the min to the max of each column, joined to the next column.
+            polyline = qtg.QPolygonF()
+            for column, (low_value, high_value) in enumerate(zip(mins, maxs)):
+                if numpy.isnan(low_value):
+                    continue
+                x = ChartWidget.MARGIN + column * width / max(1, len(mins) - 1)
+                polyline.append(qtc.QPointF(x, height - (low_value - low) / (high - low) * (height - 10)))
+                polyline.append(qtc.QPointF(x, height - (high_value - low) / (high - low) * (height - 10)))
+            painter.drawPolyline(polyline)
+        painter.end()
 
 
 class MainWindow(qtw.QWidget):
-    """Creates a display for the simulation.  The display manages the simulation and updates."""
+    """Creates a display for the simulation.  The simulation runs on a worker thread and the display reads its state."""
 
     def __init__(self):
         """Creates a QT UI."""
         super().__init__(flags=qtc.Qt.WindowCloseButtonHint)
 
-        self.simulation = Simulation(name="QtBeehive")
+        self.worker = None
+        self.chart_data = RingBuffer(fields=CHART_FIELDS, capacity=HISTORY_STEPS)
+        self.snapshots = DoubleBuffer()
+        self.__drawn_version = 0  # the chart data version that was last drawn.
+
+        # redraws are driven by the timer, not the simulation.
+        self.frame_timer = qtc.QTimer(self)
+        self.frame_timer.setInterval(1000 // FRAMES_PER_SECOND)
 
         self.setWindowTitle("Beehive")
         self.resize(1200, 600)
@@ -119,41 +248,44 @@ class MainWindow(qtw.QWidget):
         self.show()
 
     def _create_simulation(self) -> None:
-        """Creates the simulation based on the settings."""
+        """Creates the simulation worker based on the settings."""
 
         # Get the settings and make sure they are valid.
         try:
-            number_bees = int(self.number_bees_edit.text())
-            vary_bees = self.vary_bees.isChecked()
-
-            outside_min_temp = float(self.outside_temp_min_edit.text())
-            outside_max_temp = float(self.outside_temp_max_edit.text())
-
-            buzzing_impact = float(self.beehive_buzzing_impact_edit.text())
-            fanning_impact = float(self.beehive_fanning_impact_edit.text())
-
-            with self.simulation as simulation:
-                self.simulation.register_view(
-                    view=ViewInterface(name="Beehive View", callback=self._handle_simulation_update))
-                # Create the entities.
-                self.simulation.add_entity(BeehiveDisplayModel())
-                self.simulation.add_entity(OutsideTemperature(min_temp=outside_min_temp, max_temp=outside_max_temp))
-                self.simulation.add_entity(Beehive(start_temp=outside_min_temp,
-                                                   buzzing_impact=buzzing_impact, fanning_impact=fanning_impact))
+            settings = {"number_bees": int(self.number_bees_edit.text()),
+                        "vary_bees": self.vary_bees.isChecked(),
+                        "outside_min_temp": float(self.outside_temp_min_edit.text()),
+                        "outside_max_temp": float(self.outside_temp_max_edit.text()),
+                        "buzzing_impact": float(self.beehive_buzzing_impact_edit.text()),
+                        "fanning_impact": float(self.beehive_fanning_impact_edit.text())}
+            self.worker = SimulationWorker(settings=settings, chart_data=self.chart_data, snapshots=self.snapshots)
 
         except Exception as e:
             print(f"Error creating the simulation: {e}")
 
-    def _handle_simulation_update(self, previous_time, new_time) -> None:
-        """
-        Handles the simulation updating.
-        :param int previous_time: The previous simulation time.
-        :param int new_time: The new simulation time.
-        :return: None
-        """
-        print("got new simulation time.")
-        if new_time % 100 == 0:
-            self.temp_chart.setText(f"Advancing time to {new_time}")
+    @qtc.pyqtSlot()
+    def _draw_frame(self) -> None:
+        """Redraws the charts if the simulation has moved on since the last frame."""
+        version = self.chart_data.version
+        if version == self.__drawn_version:
+            return
+        self.__drawn_version = version
+
+        data = self.chart_data.snapshot()
+        self.temp_chart.set_data(data)
+        self.bee_chart.set_data(data)
+
+        snapshot = self.snapshots.latest()
+        if snapshot is not None and None not in snapshot:  # everything is known once the hive and temp change.
+            self.status_label.setText(
+                f"Time: {snapshot.time}\n"
+                f"Outside: {snapshot.outside_temp:.1f} (last day: {snapshot.min_outside_temp:.1f} - "
+                f"{snapshot.max_outside_temp:.1f})\n"
+                f"Hive: {snapshot.hive_temp:.1f} (last day: {snapshot.min_hive_temp:.1f} - "
+                f"{snapshot.max_hive_temp:.1f}, mean: {snapshot.mean_hive_temp:.1f}, "
+                f"median: {snapshot.median_hive_temp:.1f})\n"
+                f"Buzzing: {snapshot.number_bees_buzzing} of {snapshot.number_bees}\n"
+                f"Fanning: {snapshot.number_bees_fanning} of {snapshot.number_bees}")
 
     def _create_widgets(self) -> None:
         """Create the widgets that will be used in the UI."""
@@ -191,9 +323,10 @@ class MainWindow(qtw.QWidget):
         self.start_pause_button = qtw.QPushButton("Start")
         self.exit_button = qtw.QPushButton("Exit")
 
-        # placeholders for charts.
-        self.temp_chart = qtw.QTextEdit()
-        self.bee_chart = qtw.QTextEdit()
+        # Status and charts.
+        self.status_label = qtw.QLabel()
+        self.temp_chart = ChartWidget(TEMPERATURE_SERIES)
+        self.bee_chart = ChartWidget(ACTIVITY_SERIES)
 
     def _layout_widgets(self) -> None:
         """Creates the layouts and lays out widgets."""
@@ -210,6 +343,7 @@ class MainWindow(qtw.QWidget):
         # Add the group box for settings and buttons.
         configuration_form = qtw.QGroupBox("Configuration")
         config_control_layout.addWidget(configuration_form)
+        config_control_layout.addWidget(self.status_label)
         config_control_layout.addWidget(self.start_pause_button)
         config_control_layout.addWidget(self.exit_button)
 
@@ -255,8 +389,6 @@ class MainWindow(qtw.QWidget):
         vbox.addWidget(self.no_vary_bees)
 
         # Add the charts to the window.
-        # TODO converts to charts.  For now, use placeholders.
-
         temp_chart_form = qtw.QGroupBox("Temperatures")
         charts_layout.addWidget(temp_chart_form)
         temp_chart_form_layout = qtw.QVBoxLayout()
@@ -275,6 +407,7 @@ class MainWindow(qtw.QWidget):
         """
         self.start_pause_button.clicked.connect(self.start_pause_button_clicked)
         self.exit_button.clicked.connect(self.exit_button_clicked)
+        self.frame_timer.timeout.connect(self._draw_frame)
 
     @qtc.pyqtSlot()
     def start_pause_button_clicked(self) -> None:
@@ -284,24 +417,34 @@ class MainWindow(qtw.QWidget):
             print("Starting the simulation.")
             self.start_pause_button.setText("Pause")
             self._create_simulation()
-            self.simulation.advance()
+            if self.worker:
+                self.frame_timer.start()
+                self.worker.start()
         elif button_text == "Pause":
             print("Pausing the simulation.")
             self.start_pause_button.setText("Resume")
-            self.simulation.pause()
+            self.worker.commands.put(PAUSE)
         elif button_text == "Resume":
             print("Resuming the simulation.")
             self.start_pause_button.setText("Pause")
-            self.simulation.advance()
+            self.worker.commands.put(RESUME)
         else:
             print("Unknown state - not doing anything.")
 
     @qtc.pyqtSlot()
     def exit_button_clicked(self) -> None:
         print("Exiting")
-        self.simulation.shutdown()
         self.close()
 
+    def closeEvent(self, event) -> None:
+        """Stops the simulation worker before the window closes, however it is closed."""
+        self.frame_timer.stop()
+        if self.worker:
+            self.worker.commands.put(SHUTDOWN)
+            self.worker.wait()
+            self.worker = None
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
     app = qtw.QApplication(sys.argv)
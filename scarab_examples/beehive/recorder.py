@@ -0,0 +1,181 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Records the beehive state at every step.  Each column is kept in a preallocated chunk that is appended to its own file
+when full, so long runs only keep one chunk in memory.  The files are raw arrays, so a recording can be read back as
+memory mapped NumPy arrays without copying.
+"""
+
+import json
+import os
+
+import numpy
+
+from scarab.entities import *
+
+from scarab_examples.beehive.beehive import BEEHIVE_ENTITY_NAME, OUTSIDE_TEMPERATURE_NAME
+
+TIME_SERIES_RECORDER_NAME = "time_series_recorder"
+
+# The recorded columns and their types.
+COLUMN_TYPES = {
+    "time": numpy.int64,
+    "hive_temp": numpy.float64,
+    "outside_temp": numpy.float64,
+    "number_bees": numpy.int64,
+    "number_bees_buzzing": numpy.int64,
+    "number_bees_fanning": numpy.int64,
+}
+
+COLUMNS_FILE_NAME = "columns.json"
+
+
+def _column_file_name(path, column) -> str:
+    """Returns the name of the file for the column."""
+    return os.path.join(path, f"{column}.bin")
+
+
+class TimeSeriesRecorder(Entity):
+    """Records the hive temp, outside temp and bee counts for every step to a directory of column files."""
+
+    def __init__(self, path, chunk_size=65536):
+        """
+        Creates a new recorder.  Any recording already in the directory is replaced.
+        :param str path: The directory for the column files.
+        :param int chunk_size: The number of steps kept in memory before they are written.
+        """
+        assert chunk_size > 0
+
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, COLUMNS_FILE_NAME), "w") as columns_file:
+            json.dump({column: numpy.dtype(dtype).str for column, dtype in COLUMN_TYPES.items()}, columns_file)
+
+        self.__path = path
+        self.__chunk = {column: numpy.zeros(chunk_size, dtype=dtype) for column, dtype in COLUMN_TYPES.items()}
+        self.__chunk_rows = 0
+        for column in COLUMN_TYPES:  # start with empty files that the chunks are appended to.
+            open(_column_file_name(path, column), "wb").close()
+
+        # The latest values, recorded when the time moves on.  Not a number until the values are known.
+        self.__latest = {"hive_temp": numpy.nan, "outside_temp": numpy.nan, "number_bees": -1,
+                         "number_bees_buzzing": -1, "number_bees_fanning": -1}
+        self.__last_time = None
+
+        super().__init__(name=TIME_SERIES_RECORDER_NAME)
+
+    @property
+    def path(self) -> str:
+        """Returns the directory of the recording."""
+        return self.__path
+
+    @entity_created_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_beehive_created(self, beehive) -> None:
+        """
+        Handles the beehive being created to get the starting values.
+        :param RemoteEntity beehive: The beehive that was created.
+        """
+        self.__update_beehive(beehive)
+
+    @entity_changed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_beehive_changed(self, beehive, changed_properties) -> None:
+        """
+        Handles the beehive changing.
+        :param RemoteEntity beehive: The beehive that changed.
+        :param list of str changed_properties: The properties that changed.
+        """
+        assert changed_properties is not None
+        self.__update_beehive(beehive)
+
+    @entity_created_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
+    def handle_temp_created(self, temp) -> None:
+        """
+        Handles the outside temp being created to get the starting temp.
+        :param RemoteEntity temp: The temperature entity that was created.
+        """
+        self.__latest["outside_temp"] = temp.current_temp
+
+    @entity_changed_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
+    def handle_temp_changed(self, temp, changed_properties) -> None:
+        """
+        Handles the outside temp changing.
+        :param RemoteEntity temp: The temperature entity that changed.
+        :param list of str changed_properties: The properties that changed.
+        """
+        assert changed_properties
+        self.__latest["outside_temp"] = temp.current_temp
+
+    @time_update_event_handler
+    def handle_time_update(self, previous_time, new_time) -> None:
+        """
+        Handles the time changing by recording the values at the end of the previous time.
+        :param int previous_time: The previous simulation time.
+        :param int new_time: The new simulation time.
+        """
+        self.__append(previous_time)
+        self.__last_time = new_time
+
+    def close(self) -> None:
+        """
+        Records the values for the last time and writes everything to the files.  Call when the simulation is done.
+        """
+        if self.__last_time is not None:
+            self.__append(self.__last_time)
+            self.__last_time = None
+        self.__flush()
+
+    def __update_beehive(self, beehive) -> None:
+        """Keeps the latest values from the beehive."""
+        self.__latest["hive_temp"] = beehive.current_temp
+        self.__latest["number_bees"] = beehive.number_bees
+        self.__latest["number_bees_buzzing"] = beehive.number_bees_buzzing
+        self.__latest["number_bees_fanning"] = beehive.number_bees_fanning
+
+    def __append(self, time) -> None:
+        """Adds a row with the latest values, writing the chunk if it is full."""
+        row = self.__chunk_rows
+        self.__chunk["time"][row] = time
+        for column, value in self.__latest.items():
+            self.__chunk[column][row] = value
+
+        self.__chunk_rows += 1
+        if self.__chunk_rows == len(self.__chunk["time"]):
+            self.__flush()
+
+    def __flush(self) -> None:
+        """Appends the rows in the chunk to the column files.  The files are only open while writing."""
+        for column, values in self.__chunk.items():
+            with open(_column_file_name(self.__path, column), "ab") as column_file:
+                column_file.write(values[:self.__chunk_rows].tobytes())
+        self.__chunk_rows = 0
+
+
+def load_recording(path) -> dict:
+    """
+    Opens a recording as read-only memory mapped arrays, so nothing is read until it is used.
+    :param str path: The directory with the recording.
+    :return: Dictionary with an array for each column.
+    """
+    with open(os.path.join(path, COLUMNS_FILE_NAME)) as columns_file:
+        column_types = json.load(columns_file)
+
+    recording = {}
+    for column, dtype in column_types.items():
+        file_name = _column_file_name(path, column)
+        if os.path.getsize(file_name) == 0:  # can't map an empty file.
+            recording[column] = numpy.zeros(0, dtype=dtype)
+        else:
+            recording[column] = numpy.memmap(file_name, dtype=dtype, mode="r")
+    return recording
@@ -0,0 +1,298 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Snapshots of a running beehive simulation.  A snapshot has the state of the hive, the outside temperature, the display
+model and every bee in a compact binary form, so a warmed up hive can be restored into new simulations and run under
+different what-if scenarios without running the warm up again.
+
+The snapshot is a header followed by the raw arrays.  The header is the magic bytes, the version and the length of a
+JSON description of the entities and arrays.  The bees are stored as columns, one array per property.
+"""
+
+import argparse
+import json
+import random
+import struct
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from scarab.simulation import Simulation
+
+from scarab_examples.beehive.beehive import Bee, BeePopulation, Beehive, BeehiveDisplayModel, OutsideTemperature
+from scarab_examples.beehive.cli_beehive import BUZZING_IMPACT, FANNING_IMPACT, MAX_OUTSIDE_TEMP, MIN_OUTSIDE_TEMP, \
+    TARGET_BEE_BUZZING, TARGET_BEE_FANNING, BeehiveApp
+from scarab_examples.beehive.sweep import create_runs, summary_stats, write_table
+
+SNAPSHOT_MAGIC = b"BEESNAP"
+SNAPSHOT_VERSION = 2  # 2: the display model keeps streaming stats for each series.
+_HEADER = struct.Struct("<7sHI")  # magic, version, length of the JSON description.
+
+# The columns kept for individual bees and populations.
+BEE_COLUMNS = {"buzz_temp": "<f8", "fan_temp": "<f8", "is_buzzing": "|b1", "is_fanning": "|b1"}
+
+# The what-if changes that can be made when restoring, and the entity state they replace.
+SNAPSHOT_OVERRIDES = {
+    "buzzing_impact": ("beehive", "buzzing_impact"),
+    "fanning_impact": ("beehive", "fanning_impact"),
+    "min_outside_temp": ("outside_temperature", "min_temp"),
+    "max_outside_temp": ("outside_temperature", "max_temp"),
+}
+
+# The entities of one hive.  bees and populations are lists.
+HiveEntities = namedtuple("HiveEntities", ["beehive", "outside_temperature", "display_model", "populations", "bees"])
+
+
+def take_snapshot(time, entities) -> bytes:
+    """
+    Takes a snapshot of the hive.  Call between steps, once the simulation has finished advancing.
+    :param int time: The simulation time of the snapshot.
+    :param HiveEntities entities: The entities of the hive.
+    :return: The snapshot.
+    """
+    description = {"time": time,
+                   "beehive": entities.beehive.get_state(),
+                   "outside_temperature": entities.outside_temperature.get_state(),
+                   "display_model": entities.display_model.get_state(),
+                   "populations": [],
+                   "arrays": []}
+    arrays = []
+
+    def add_columns(prefix, columns):
+        for column, dtype in BEE_COLUMNS.items():
+            values = numpy.ascontiguousarray(columns[column], dtype=dtype)
+            description["arrays"].append([f"{prefix}.{column}", dtype, len(values)])
+            arrays.append(values)
+
+    bee_states = [bee.get_state() for bee in entities.bees]
+    add_columns("bees", {column: [state[column] for state in bee_states] for column in BEE_COLUMNS})
+
+    for number, population in enumerate(entities.populations):
+        state = population.get_state()
+        add_columns(f"populations.{number}", state)
+        description["populations"].append({name: value for name, value in state.items() if name not in BEE_COLUMNS})
+
+    header = json.dumps(description).encode("utf-8")
+    return b"".join([_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)), header] +
+                    [values.tobytes() for values in arrays])
+
+
+def read_snapshot(snapshot) -> tuple:
+    """
+    Reads the description and arrays from a snapshot.  The arrays are read-only views of the snapshot, not copies.
+    :param bytes snapshot: The snapshot from take_snapshot.
+    :return: Tuple of the description and a dictionary of the arrays by name.
+    """
+    magic, version, header_length = _HEADER.unpack_from(snapshot, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("not a beehive snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"snapshot version {version} isn't supported")
+
+    offset = _HEADER.size
+    description = json.loads(bytes(snapshot[offset:offset + header_length]).decode("utf-8"))
+    offset += header_length
+
+    arrays = {}
+    for name, dtype, length in description["arrays"]:
+        arrays[name] = numpy.frombuffer(snapshot, dtype=dtype, count=length, offset=offset)
+        offset += arrays[name].nbytes
+    return description, arrays
+
+
+def restore_snapshot(snapshot, simulation=None, **overrides) -> tuple:
+    """
+    Creates the entities from a snapshot.  The new simulation starts at time 0, the outside temperature carries on
+    from the time of day of the snapshot and the times in the display model's window are moved back to match.
+    :param bytes snapshot: The snapshot from take_snapshot.
+    :param Simulation simulation: The simulation to add the entities to.  The hive is added before the bees so it
+    counts them again as they are created.
+    :param overrides: What-if values to use instead of the snapshot values.  The names are in SNAPSHOT_OVERRIDES.
+    :return: Tuple of the time of the snapshot and the HiveEntities.
+    """
+    description, arrays = read_snapshot(snapshot)
+    for name, value in overrides.items():
+        if name not in SNAPSHOT_OVERRIDES:
+            raise ValueError(f"{name} can't be changed when restoring a snapshot")
+        entity, state_name = SNAPSHOT_OVERRIDES[name]
+        if entity == "outside_temperature" and description[entity][state_name] != value:
+            description[entity]["current_temp"] = None  # from the old range, so it is worked out again.
+        description[entity][state_name] = value
+
+    def columns(prefix):
+        return {column: arrays[f"{prefix}.{column}"] for column in BEE_COLUMNS}
+
+    bee_columns = columns("bees")
+    bee_values = [bee_columns[column].tolist() for column in BEE_COLUMNS]
+    bees = [Bee.from_state({"buzz_temp": buzz_temp, "fan_temp": fan_temp,
+                            "is_buzzing": is_buzzing, "is_fanning": is_fanning})
+            for buzz_temp, fan_temp, is_buzzing, is_fanning in zip(*bee_values)]
+    populations = [BeePopulation.from_state(dict(state, **columns(f"populations.{number}")))
+                   for number, state in enumerate(description["populations"])]
+
+    entities = HiveEntities(beehive=Beehive.from_state(description["beehive"]),
+                            outside_temperature=OutsideTemperature.from_state(description["outside_temperature"],
+                                                                              elapsed_time=description["time"]),
+                            display_model=BeehiveDisplayModel.from_state(description["display_model"],
+                                                                         elapsed_time=description["time"]),
+                            populations=populations,
+                            bees=bees)
+
+    if simulation is not None:
+        # same order as BeehiveApp.create_entities.
+        simulation.add_entity(entities.beehive)
+        simulation.add_entity(entities.outside_temperature)
+        simulation.add_entity(entities.display_model)
+        for entity in entities.populations + entities.bees:
+            simulation.add_entity(entity)
+
+    return description["time"], entities
+
+
+def warm_up(number_bees, steps, seed=None, bee_variance="vary", bee_model="population") -> bytes:
+    """
+    Runs a hive set up the same way as cli_beehive and takes a snapshot of it.
+    :param int number_bees: The number of bees in the hive.
+    :param int steps: The number of steps (minutes) to run before the snapshot.
+    :param int seed: The seed for the random bee temps.
+    :param str bee_variance: "vary" for random temps around the targets, "same" for the target temps.
+    :param str bee_model: "population" for all bees in one entity, "bees" for an entity per bee.
+    :return: The snapshot.
+    """
+    if seed is not None:
+        random.seed(seed)
+    buzz_temps, fan_temps = BeehiveApp.create_bee_temps(number_bees=number_bees, bee_variance=bee_variance,
+                                                        target_bee_buzzing=TARGET_BEE_BUZZING,
+                                                        target_bee_fanning=TARGET_BEE_FANNING)
+    if bee_model == "population":
+        populations, bees = [BeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps)], []
+    else:
+        populations, bees = [], [Bee(buzz_temp=buzz_temp, fan_temp=fan_temp)
+                                 for buzz_temp, fan_temp in zip(buzz_temps, fan_temps)]
+    entities = HiveEntities(beehive=Beehive(start_temp=TARGET_BEE_BUZZING, buzzing_impact=BUZZING_IMPACT,
+                                            fanning_impact=FANNING_IMPACT),
+                            outside_temperature=OutsideTemperature(min_temp=MIN_OUTSIDE_TEMP,
+                                                                   max_temp=MAX_OUTSIDE_TEMP),
+                            display_model=BeehiveDisplayModel(), populations=populations, bees=bees)
+
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        for entity in [entities.beehive, entities.outside_temperature, entities.display_model] + populations + bees:
+            simulation.add_entity(entity)
+        simulation.advance_and_wait(steps=steps)
+        return take_snapshot(steps, entities)
+
+
+def run_branch(branch) -> dict:
+    """
+    Restores a snapshot into its own simulation and runs it.  This is run in the worker processes.
+    :param tuple branch: The snapshot, the number of steps to run and the dictionary of overrides.
+    :return: The overrides and the summary stats from the display model, see sweep.summary_stats.
+    """
+    snapshot, steps, overrides = branch
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        time, entities = restore_snapshot(snapshot, simulation, **overrides)
+        simulation.advance_and_wait(steps=steps)
+
+        summary = dict(overrides)
+        summary["time"] = time + steps
+        summary["final_hive_temp"] = entities.beehive.current_temp
+        summary.update(summary_stats(entities.display_model))
+    return summary
+
+
+def fork(snapshot, steps, branches, workers=None) -> list:
+    """
+    Runs a branch from the snapshot for each set of overrides in a process pool.  Only the snapshot bytes are sent to
+    the workers, so no branch runs the warm up again.
+    :param bytes snapshot: The snapshot to start each branch from.
+    :param int steps: The number of steps to run each branch.
+    :param list of dict branches: The overrides for each branch.
+    :param int workers: The number of worker processes.  Defaults to the number of cores.
+    :return: The summary for each branch in the same order as the branches.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_branch, [(snapshot, steps, overrides) for overrides in branches]))
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for the branches.
+    """
+    parser = argparse.ArgumentParser(description="Warms up a beehive, or loads a snapshot of one, then runs what-if "
+                                                 "branches from it in parallel and writes the summary stats for each "
+                                                 "branch as a CSV table.")
+
+    parser.add_argument("--number_bees", type=int, default=10, help="number of bees in the hive")
+    parser.add_argument("--bee_variance", default="vary", choices=["vary", "same"],
+                        help="whether bees have different or the same temps for buzz and fan")
+    parser.add_argument("--bee_model", default="population", choices=["population", "bees"],
+                        help="whether bees are one population entity or an entity per bee")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random bee temps")
+    parser.add_argument("--warm_up_steps", type=int, default=1440, help="steps to run before the snapshot")
+    parser.add_argument("--load_snapshot", default=None, help="snapshot file to start from instead of warming up")
+    parser.add_argument("--save_snapshot", default=None, help="file to save the snapshot to")
+
+    parser.add_argument("--buzzing_impact", type=float, nargs="*", default=[],
+                        help="impacts on temperature for any given bee buzzing")
+    parser.add_argument("--fanning_impact", type=float, nargs="*", default=[],
+                        help="impacts on temperature for any given bee fanning")
+    parser.add_argument("--min_outside_temp", type=float, nargs="*", default=[],
+                        help="minimum outside temperatures during the day")
+    parser.add_argument("--max_outside_temp", type=float, nargs="*", default=[],
+                        help="maximum outside temperatures during the day")
+    parser.add_argument("--combine", default="grid", choices=["grid", "list"],
+                        help="grid: run every combination of the values.\n"
+                             "list: run the nth value of every parameter together.")
+    parser.add_argument("--steps", type=int, default=1440, help="steps to run each branch")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--output_file", default=None, help="file for the CSV table (default: stdout)")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs the branches."""
+    args = get_args()
+
+    if args.load_snapshot:
+        with open(args.load_snapshot, "rb") as snapshot_file:
+            snapshot = snapshot_file.read()
+    else:
+        snapshot = warm_up(number_bees=args.number_bees, steps=args.warm_up_steps, seed=args.seed,
+                           bee_variance=args.bee_variance, bee_model=args.bee_model)
+    if args.save_snapshot:
+        with open(args.save_snapshot, "wb") as snapshot_file:
+            snapshot_file.write(snapshot)
+
+    # the parameters without values keep the snapshot values.
+    parameters = {name: getattr(args, name) for name in SNAPSHOT_OVERRIDES if getattr(args, name)}
+    branches = create_runs(parameters, combine=args.combine) if parameters else [{}]
+    print(f"Running {len(branches)} branches from a {len(snapshot)} byte snapshot.", file=sys.stderr)
+    summaries = fork(snapshot, steps=args.steps, branches=branches, workers=args.workers)
+
+    if args.output_file:
+        with open(args.output_file, "w", newline="") as output:
+            write_table(summaries, output)
+    else:
+        write_table(summaries, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Streaming statistics for the beehive displays.  Each value is added once and nothing else is kept, so the stats cost
+the same however long a run is:
+- RunningStats keeps the count, mean, variance, min and max (Welford's method).
+- SlidingWindowMinMax keeps the min and max of the values in a window of time with monotonic deques.
+- QuantileSketch estimates percentiles to a relative accuracy from counts of log sized buckets.
+
+RunningStats and QuantileSketch can be merged, so stats from runs in parallel can be combined into stats for them all.
+"""
+
+import math
+from collections import deque
+
+
+class RunningStats:
+    """The count, mean, variance, min and max of the values so far."""
+
+    def __init__(self):
+        """
+        Creates stats with no values.
+        """
+        self.__count = 0
+        self.__mean = 0.0
+        self.__m2 = 0.0  # sum of squared differences from the mean.
+        self.__min = None
+        self.__max = None
+
+    @property
+    def count(self) -> int:
+        """Returns the number of values."""
+        return self.__count
+
+    @property
+    def mean(self):
+        """Returns the mean of the values, or None if there aren't any."""
+        return self.__mean if self.__count else None
+
+    @property
+    def variance(self):
+        """Returns the sample variance of the values, or None if there are less than two."""
+        return self.__m2 / (self.__count - 1) if self.__count > 1 else None
+
+    @property
+    def std(self):
+        """Returns the sample standard deviation of the values, or None if there are less than two."""
+        return math.sqrt(self.__m2 / (self.__count - 1)) if self.__count > 1 else None
+
+    @property
+    def min(self):
+        """Returns the smallest value, or None if there aren't any."""
+        return self.__min
+
+    @property
+    def max(self):
+        """Returns the largest value, or None if there aren't any."""
+        return self.__max
+
+    def update(self, value) -> None:
+        """
+        Adds a value.
+        :param float value: The value to add.
+        """
+        self.__count += 1
+        delta = value - self.__mean
+        self.__mean += delta / self.__count
+        self.__m2 += delta * (value - self.__mean)
+        if self.__min is None or value < self.__min:
+            self.__min = value
+        if self.__max is None or value > self.__max:
+            self.__max = value
+
+    def merge(self, other) -> None:
+        """
+        Adds the values of other stats, as if they had been added to these stats (Chan's method).
+        :param RunningStats other: The stats to add.
+        """
+        if not other.__count:
+            return
+        count = self.__count + other.__count
+        delta = other.__mean - self.__mean
+        self.__m2 += other.__m2 + delta * delta * self.__count * other.__count / count
+        self.__mean += delta * other.__count / count
+        self.__count = count
+        self.__min = other.__min if self.__min is None else min(self.__min, other.__min)
+        self.__max = other.__max if self.__max is None else max(self.__max, other.__max)
+
+    def get_state(self) -> dict:
+        """
+        Returns the stats for a snapshot.
+        :return: Dictionary of the count, mean, sum of squared differences, min and max.
+        """
+        return {"count": self.__count, "mean": self.__mean, "m2": self.__m2, "min": self.__min, "max": self.__max}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Creates stats from a snapshot.
+        :param dict state: The state from get_state.
+        :return: The stats.
+        """
+        stats = cls()
+        stats.__count, stats.__mean, stats.__m2 = state["count"], state["mean"], state["m2"]
+        stats.__min, stats.__max = state["min"], state["max"]
+        return stats
+
+
+class SlidingWindowMinMax:
+    """
+    The min and max of the values added in the last window of time.  Each deque keeps only the values that could still
+    be the min or max, in time order, so an update is O(1) on average.
+    """
+
+    def __init__(self, window):
+        """
+        Creates an empty window.
+        :param int window: The length of the window in simulation time.  Values older than this are dropped.
+        """
+        assert window > 0
+        self.__window = window
+        self.__mins = deque()  # (time, value) with increasing values.
+        self.__maxes = deque()  # (time, value) with decreasing values.
+
+    @property
+    def window(self) -> int:
+        """Returns the length of the window."""
+        return self.__window
+
+    @property
+    def min(self):
+        """Returns the smallest value in the window, or None if it is empty."""
+        return self.__mins[0][1] if self.__mins else None
+
+    @property
+    def max(self):
+        """Returns the largest value in the window, or None if it is empty."""
+        return self.__maxes[0][1] if self.__maxes else None
+
+    def update(self, time, value) -> None:
+        """
+        Adds a value and drops the values that are now outside the window.
+        :param int time: The simulation time of the value.  Times must not go backwards.
+        :param float value: The value to add.
+        """
+        while self.__mins and self.__mins[-1][1] >= value:
+            self.__mins.pop()
+        self.__mins.append((time, value))
+        while self.__maxes and self.__maxes[-1][1] <= value:
+            self.__maxes.pop()
+        self.__maxes.append((time, value))
+
+        start = time - self.__window
+        while self.__mins[0][0] <= start:
+            self.__mins.popleft()
+        while self.__maxes[0][0] <= start:
+            self.__maxes.popleft()
+
+    def get_state(self) -> dict:
+        """
+        Returns the window for a snapshot.
+        :return: Dictionary of the window and the entries of both deques.
+        """
+        return {"window": self.__window, "mins": [list(entry) for entry in self.__mins],
+                "maxes": [list(entry) for entry in self.__maxes]}
+
+    @classmethod
+    def from_state(cls, state, elapsed_time=0):
+        """
+        Creates a window from a snapshot.
+        :param dict state: The state from get_state.
+        :param int elapsed_time: The simulation time of the snapshot.  The times of the values are moved back by it, so
+        a new simulation that starts at time 0 carries on with the same window.
+        :return: The window.
+        """
+        window = cls(state["window"])
+        window.__mins.extend([(time - elapsed_time, value) for time, value in state["mins"]])
+        window.__maxes.extend([(time - elapsed_time, value) for time, value in state["maxes"]])
+        return window
+
+
+class QuantileSketch:
+    """
+    Estimates quantiles of the values to a relative accuracy (DDSketch).  Each value is counted in the bucket for its
+    log, so the number of buckets grows with the log of the range of the values rather than the number of values.
+    Sketches with the same accuracy are merged by adding their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        """
+        Creates an empty sketch.
+        :param float relative_accuracy: The most an estimate is off by, as a fraction of the true value.
+        """
+        assert 0 < relative_accuracy < 1
+        self.__relative_accuracy = relative_accuracy
+        self.__gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.__log_gamma = math.log(self.__gamma)
+        self.__positive = {}  # bucket -> count for values above zero.
+        self.__negative = {}  # bucket of the absolute value -> count for values below zero.
+        self.__zero_count = 0
+        self.__count = 0
+
+    @property
+    def relative_accuracy(self) -> float:
+        """Returns the relative accuracy of the estimates."""
+        return self.__relative_accuracy
+
+    @property
+    def count(self) -> int:
+        """Returns the number of values."""
+        return self.__count
+
+    def update(self, value) -> None:
+        """
+        Adds a value.
+        :param float value: The value to add.
+        """
+        self.__count += 1
+        if value > 0:
+            bucket = math.ceil(math.log(value) / self.__log_gamma)
+            self.__positive[bucket] = self.__positive.get(bucket, 0) + 1
+        elif value < 0:
+            bucket = math.ceil(math.log(-value) / self.__log_gamma)
+            self.__negative[bucket] = self.__negative.get(bucket, 0) + 1
+        else:
+            self.__zero_count += 1
+
+    def merge(self, other) -> None:
+        """
+        Adds the values of another sketch, as if they had been added to this sketch.
+        :param QuantileSketch other: The sketch to add.  It must have the same relative accuracy.
+        """
+        if other.__relative_accuracy != self.__relative_accuracy:
+            raise ValueError(f"can't merge a sketch with relative accuracy {other.__relative_accuracy} into one with "
+                             f"{self.__relative_accuracy}")
+        for bucket, count in other.__positive.items():
+            self.__positive[bucket] = self.__positive.get(bucket, 0) + count
+        for bucket, count in other.__negative.items():
+            self.__negative[bucket] = self.__negative.get(bucket, 0) + count
+        self.__zero_count += other.__zero_count
+        self.__count += other.__count
+
+    def quantile(self, quantile):
+        """
+        Returns an estimate of the quantile.
+        :param float quantile: The quantile from 0 to 1, such as .5 for the median.
+        :return: The estimate, or None if there aren't any values.
+        """
+        assert 0 <= quantile <= 1
+        if not self.__count:
+            return None
+
+        rank = quantile * (self.__count - 1)
+        seen = 0
+        for bucket in sorted(self.__negative, reverse=True):  # most negative first.
+            seen += self.__negative[bucket]
+            if seen > rank:
+                return -self.__value(bucket)
+        seen += self.__zero_count
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.__positive):
+            seen += self.__positive[bucket]
+            if seen > rank:
+                return self.__value(bucket)
+        return self.__value(max(self.__positive))
+
+    def __value(self, bucket) -> float:
+        """Returns the estimate for the values in the bucket, which is within the relative accuracy of all of them."""
+        return 2 * self.__gamma ** bucket / (self.__gamma + 1)
+
+    def get_state(self) -> dict:
+        """
+        Returns the sketch for a snapshot.  The buckets are lists of [bucket, count] so they can be written as JSON.
+        :return: Dictionary of the relative accuracy, the zero count and the buckets.
+        """
+        return {"relative_accuracy": self.__relative_accuracy, "zero_count": self.__zero_count,
+                "positive": [[bucket, count] for bucket, count in sorted(self.__positive.items())],
+                "negative": [[bucket, count] for bucket, count in sorted(self.__negative.items())]}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Creates a sketch from a snapshot.
+        :param dict state: The state from get_state.
+        :return: The sketch.
+        """
+        sketch = cls(relative_accuracy=state["relative_accuracy"])
+        sketch.__zero_count = state["zero_count"]
+        sketch.__positive = {bucket: count for bucket, count in state["positive"]}
+        sketch.__negative = {bucket: count for bucket, count in state["negative"]}
+        sketch.__count = sketch.__zero_count + sum(sketch.__positive.values()) + sum(sketch.__negative.values())
+        return sketch
+
+
+class StreamingStats:
+    """The running stats, the min and max over a window of time and the quantiles of one series of values."""
+
+    def __init__(self, window=None, relative_accuracy=0.01):
+        """
+        Creates stats with no values.
+        :param int window: The length of time for the window min and max.  None for no window.
+        :param float relative_accuracy: The relative accuracy of the quantiles.
+        """
+        self.running = RunningStats()
+        self.window = SlidingWindowMinMax(window) if window is not None else None
+        self.sketch = QuantileSketch(relative_accuracy=relative_accuracy)
+
+    @property
+    def count(self) -> int:
+        """Returns the number of values."""
+        return self.running.count
+
+    @property
+    def mean(self):
+        """Returns the mean of the values, or None if there aren't any."""
+        return self.running.mean
+
+    @property
+    def std(self):
+        """Returns the sample standard deviation of the values, or None if there are less than two."""
+        return self.running.std
+
+    @property
+    def min(self):
+        """Returns the smallest value, or None if there aren't any."""
+        return self.running.min
+
+    @property
+    def max(self):
+        """Returns the largest value, or None if there aren't any."""
+        return self.running.max
+
+    @property
+    def window_min(self):
+        """Returns the smallest value in the window, or None if it is empty or there is no window."""
+        return self.window.min if self.window else None
+
+    @property
+    def window_max(self):
+        """Returns the largest value in the window, or None if it is empty or there is no window."""
+        return self.window.max if self.window else None
+
+    def quantile(self, quantile):
+        """
+        Returns an estimate of the quantile.
+        :param float quantile: The quantile from 0 to 1.
+        :return: The estimate, or None if there aren't any values.
+        """
+        return self.sketch.quantile(quantile)
+
+    def update(self, value, time=None) -> None:
+        """
+        Adds a value.
+        :param float value: The value to add.
+        :param int time: The simulation time of the value.  Needed if there is a window.
+        """
+        self.running.update(value)
+        self.sketch.update(value)
+        if self.window:
+            self.window.update(time, value)
+
+    def merge(self, other) -> None:
+        """
+        Adds the values of other stats, such as the stats of the same series from another run.  The window isn't
+        merged because the times of different runs aren't comparable.
+        :param StreamingStats other: The stats to add.
+        """
+        self.running.merge(other.running)
+        self.sketch.merge(other.sketch)
+
+    def get_state(self) -> dict:
+        """
+        Returns the stats for a snapshot.
+        :return: Dictionary with the state of the running stats, the window and the sketch.
+        """
+        return {"running": self.running.get_state(), "window": self.window.get_state() if self.window else None,
+                "sketch": self.sketch.get_state()}
+
+    @classmethod
+    def from_state(cls, state, elapsed_time=0):
+        """
+        Creates stats from a snapshot.
+        :param dict state: The state from get_state.
+        :param int elapsed_time: The simulation time of the snapshot, see SlidingWindowMinMax.from_state.
+        :return: The stats.
+        """
+        stats = cls()
+        stats.running = RunningStats.from_state(state["running"])
+        stats.window = SlidingWindowMinMax.from_state(state["window"], elapsed_time) if state["window"] else None
+        stats.sketch = QuantileSketch.from_state(state["sketch"])
+        return stats
@@ -0,0 +1,194 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Runs the command line beehive simulation for a grid or list of parameters.  Each run has its own simulation in a
+separate process, and the summary stats from the display model are written as one CSV table.
+"""
+
+import argparse
+import csv
+import itertools
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from scarab.simulation import Simulation
+
+from scarab_examples.beehive.cli_beehive import BeehiveApp
+
+# The parameters that can be swept.  All but max_steps are passed to BeehiveApp.create_entities.
+SWEEP_PARAMETERS = [
+    "number_bees",
+    "bee_variance",
+    "bee_model",
+    "buzzing_impact",
+    "fanning_impact",
+    "min_outside_temp",
+    "max_outside_temp",
+    "target_bee_buzzing",
+    "target_bee_fanning",
+    "max_steps",
+]
+
+# The stats tracked by the display model that are reported for each run.  They are reported with OBSERVED_PREFIX, so
+# they don't replace the parameters with the same names, such as min_outside_temp.
+OBSERVED_PREFIX = "observed_"
+SUMMARY_STATS = [
+    "min_outside_temp",
+    "max_outside_temp",
+    "min_hive_temp",
+    "max_hive_temp",
+    "min_number_bees",
+    "max_number_bees",
+    "min_number_bees_buzzing",
+    "max_number_bees_buzzing",
+    "min_number_bees_fanning",
+    "max_number_bees_fanning",
+]
+
+
+def summary_stats(display_model) -> dict:
+    """
+    Returns the summary stats from the display model.
+    :param BeehiveDisplayModel display_model: The display model of the run.  None if the run didn't start.
+    :return: Dictionary of each of SUMMARY_STATS with OBSERVED_PREFIX.
+    """
+    return {OBSERVED_PREFIX + stat: getattr(display_model, stat) if display_model else None for stat in SUMMARY_STATS}
+
+
+def create_runs(parameters, combine="grid") -> list:
+    """
+    Creates the parameters for each run.
+    :param dict parameters: The list of values for each parameter name.
+    :param str combine: "grid" for every combination of the values, "list" to take the nth value of each parameter for
+    the nth run.  With "list", parameters with a single value are used for every run.
+    :return: List of dictionaries with the parameter values for each run.
+    """
+    names = list(parameters.keys())
+    if combine == "grid":
+        return [dict(zip(names, values)) for values in itertools.product(*[parameters[n] for n in names])]
+
+    number_runs = max([len(values) for values in parameters.values()])
+    for name, values in parameters.items():
+        if len(values) not in (1, number_runs):
+            raise ValueError(f"{name} has {len(values)} values, but there are {number_runs} runs")
+    return [{name: values[0] if len(values) == 1 else values[run] for name, values in parameters.items()}
+            for run in range(0, number_runs)]
+
+
+def run_beehive(run_parameters) -> dict:
+    """
+    Runs one beehive simulation with its own simulation instance.  This is run in the worker processes.
+    :param dict run_parameters: The parameters for the run, including the "seed" for the bee temps.
+    :return: The run parameters and the summary stats from the display model, see summary_stats.
+    """
+    parameters = dict(run_parameters)
+    seed = parameters.pop("seed")
+    max_steps = parameters.pop("max_steps")
+
+    random.seed(seed)
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        display_model = BeehiveApp.create_entities(simulation=simulation, **parameters)
+        simulation.advance_and_wait(steps=max_steps)
+
+        summary = dict(run_parameters)
+        summary["final_hive_temp"] = display_model.beehive.current_temp if display_model.beehive else None
+        summary.update(summary_stats(display_model))
+
+    return summary
+
+
+def sweep(runs, workers=None, seed=0) -> list:
+    """
+    Runs each simulation in a process pool.
+    :param list of dict runs: The parameters for each run.
+    :param int workers: The number of worker processes.  Defaults to the number of cores.
+    :param int seed: The seed for the first run.  Each run gets the next seed so runs can be repeated on their own.
+    :return: The summary for each run in the same order as the runs.
+    """
+    runs = [dict(run, seed=seed + run_number) for run_number, run in enumerate(runs)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_beehive, runs))
+
+
+def write_table(summaries, output) -> None:
+    """
+    Writes the summaries as a CSV table.
+    :param list of dict summaries: The summary for each run.
+    :param file output: The file to write to.
+    """
+    if not summaries:
+        return
+    writer = csv.DictWriter(output, fieldnames=list(summaries[0].keys()))
+    writer.writeheader()
+    writer.writerows(summaries)
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for the sweep.
+    """
+    parser = argparse.ArgumentParser(description="Runs the beehive simulation for a set of parameters in parallel "
+                                                 "and writes the summary stats for each run as a CSV table.")
+
+    parser.add_argument("--number_bees", type=int, nargs="+", default=[10], help="number of bees in the hive")
+    parser.add_argument("--bee_variance", nargs="+", default=["vary"], choices=["vary", "same"],
+                        help="whether bees have different or the same temps for buzz and fan")
+    parser.add_argument("--bee_model", nargs="+", default=["population"], choices=["population", "bees"],
+                        help="whether bees are one population entity or an entity per bee")
+    parser.add_argument("--buzzing_impact", type=float, nargs="+", default=[0.5],
+                        help="impact on temperature for any given bee buzzing")
+    parser.add_argument("--fanning_impact", type=float, nargs="+", default=[0.5],
+                        help="impact on temperature for any given bee fanning")
+    parser.add_argument("--min_outside_temp", type=float, nargs="+", default=[50.0],
+                        help="minimum outside temperature during the day")
+    parser.add_argument("--max_outside_temp", type=float, nargs="+", default=[90.0],
+                        help="maximum outside temperature during the day")
+    parser.add_argument("--target_bee_buzzing", type=float, nargs="+", default=[60.0],
+                        help="target temperature below which bees buzz")
+    parser.add_argument("--target_bee_fanning", type=float, nargs="+", default=[65.0],
+                        help="target temperature above which bees fan")
+    parser.add_argument("--max_steps", type=int, nargs="+", default=[10080],
+                        help="Number of steps as simulation minutes.")
+
+    parser.add_argument("--combine", default="grid", choices=["grid", "list"],
+                        help="grid: run every combination of the values.\n"
+                             "list: run the nth value of every parameter together.")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the first run, incremented for each run")
+    parser.add_argument("--output_file", default=None, help="file for the CSV table (default: stdout)")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs the sweep."""
+    args = get_args()
+
+    runs = create_runs({name: getattr(args, name) for name in SWEEP_PARAMETERS}, combine=args.combine)
+    print(f"Running {len(runs)} beehive simulations.", file=sys.stderr)
+    summaries = sweep(runs, workers=args.workers, seed=args.seed)
+
+    if args.output_file:
+        with open(args.output_file, "w", newline="") as output:
+            write_table(summaries, output)
+    else:
+        write_table(summaries, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Live telemetry for dashboards.  A small asyncio HTTP and WebSocket server on its own thread streams the hive temp,
+outside temp and bee counts for every step:
+
+    GET /history  JSON with the fields and the samples kept in the history buffer, for clients that join late.
+    GET /stream   WebSocket that gets a JSON list of new samples, each a list in the order of TELEMETRY_FIELDS.
+
+The simulation only hands samples over, it never waits for the clients.  Each client has a bounded backlog, and a
+client that can't keep up is sent every second sample, then every fourth and so on until it catches up.  The server
+only listens on the loopback interface.
+"""
+
+import asyncio
+import base64
+import collections
+import hashlib
+import ipaddress
+import json
+import socket
+import struct
+import threading
+
+from scarab.entities import *
+
+from scarab_examples.beehive.beehive import BEEHIVE_ENTITY_NAME, OUTSIDE_TEMPERATURE_NAME
+from scarab_examples.beehive.chart_data import RingBuffer
+
+TELEMETRY_PUBLISHER_NAME = "telemetry_publisher"
+
+# The fields of each sample.
+TELEMETRY_FIELDS = ["time", "outside_temp", "hive_temp", "number_bees_buzzing", "number_bees_fanning"]
+
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_MAX_REQUEST_SIZE = 8192
+_TEXT_FRAME = 0x1
+_CLOSE_FRAME = 0x8
+
+
+class ClientStream:
+    """
+    The samples waiting to be sent to one client.  When the backlog is full the client is sent fewer samples, and
+    when it has caught up it is sent more again.
+    """
+
+    def __init__(self, max_backlog=256):
+        """
+        Creates a stream that sends every sample.
+        :param int max_backlog: The most samples kept for the client.
+        """
+        assert max_backlog > 0
+        self.max_backlog = max_backlog
+        self.stride = 1  # send every stride-th sample.
+        self.__offered = 0
+        self.__backlog = []
+        self.ready = asyncio.Event()
+
+    def offer(self, sample) -> None:
+        """
+        Adds a sample unless it is skipped for the stride.  A full backlog doubles the stride and drops every other
+        sample in it, so the client gets the whole time span at a lower rate.
+        :param list sample: The sample.
+        """
+        if len(self.__backlog) >= self.max_backlog:
+            self.stride *= 2
+            self.__backlog = self.__backlog[1::2]
+
+        self.__offered += 1
+        if self.__offered % self.stride:
+            return
+        self.__backlog.append(sample)
+        self.ready.set()
+
+    def take(self) -> list:
+        """
+        Returns the samples in the backlog and empties it.  A backlog that was mostly empty halves the stride.
+        :return: The samples, oldest first.
+        """
+        samples, self.__backlog = self.__backlog, []
+        self.ready.clear()
+        if self.stride > 1 and len(samples) < self.max_backlog // 4:
+            self.stride //= 2
+        return samples
+
+
+def _is_loopback(host) -> bool:
+    """Returns true if the host is a loopback address, or a name that only resolves to loopback addresses."""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        pass
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror:
+        return False
+    return all([ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses])
+
+
+class TelemetryServer:
+    """Serves the history and streams new samples.  The server runs its own event loop on a daemon thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, history_size=65536, max_backlog=256):
+        """
+        Creates the server.  It doesn't listen until it is started.
+        :param str host: The loopback address or the name of one, such as localhost, to listen on.
+        :param int port: The port to listen on.  0 picks a free port.
+        :param int history_size: The number of samples kept for clients that join late.
+        :param int max_backlog: The most samples kept for each client before it is sent fewer.
+        """
+        if not _is_loopback(host):
+            raise ValueError(f"telemetry is only served on the loopback interface, not {host}")
+        self.host = host
+        self.port = port
+        self.history = RingBuffer(fields=TELEMETRY_FIELDS[1:], capacity=history_size)
+        self.max_backlog = max_backlog
+
+        self.__pending = collections.deque()  # samples from the simulation thread, not yet sent to the clients.
+        self.__wakeup_scheduled = False
+        self.__clients = set()
+        self.__loop = None
+        self.__server = None
+        self.__thread = None
+        self.__start_error = None
+
+    @property
+    def number_clients(self) -> int:
+        """Returns the number of clients streaming."""
+        return len(self.__clients)
+
+    def start(self) -> None:
+        """
+        Starts the server thread and waits for it to listen.  The port is set to the one being listened on.
+        :raises OSError: If the server can't listen, such as when the port is in use.
+        """
+        started = threading.Event()
+        self.__start_error = None
+        self.__thread = threading.Thread(target=self.__run, args=(started,), name="telemetry", daemon=True)
+        self.__thread.start()
+        started.wait()
+        if self.__start_error is not None:
+            self.__thread.join()
+            raise self.__start_error
+
+    def stop(self) -> None:
+        """
+        Closes the connections and stops the server thread.
+        """
+        if self.__loop is not None:
+            self.__loop.call_soon_threadsafe(self.__loop.stop)
+            self.__thread.join()
+            self.__loop = None
+
+    def publish(self, sample) -> None:
+        """
+        Adds a sample to the history and sends it to the clients.  Called from the simulation thread and never waits.
+        :param list sample: The values in the order of TELEMETRY_FIELDS.
+        """
+        self.history.append(sample[0], sample[1:])
+        self.__pending.append(sample)
+
+        # one wakeup for however many samples arrive before the loop gets to them.
+        if not self.__wakeup_scheduled and self.__loop is not None:
+            self.__wakeup_scheduled = True
+            self.__loop.call_soon_threadsafe(self.__send_pending)
+
+    def __run(self, started) -> None:
+        """Runs the event loop on the server thread.  An error starting the server is kept for start to raise."""
+        loop = asyncio.new_event_loop()
+        try:
+            self.__server = loop.run_until_complete(
+                asyncio.start_server(self.__handle_connection, host=self.host, port=self.port))
+        except Exception as e:
+            self.__start_error = e
+            loop.close()
+            started.set()
+            return
+        self.port = self.__server.sockets[0].getsockname()[1]
+        self.__loop = loop
+        started.set()
+        try:
+            self.__loop.run_forever()
+        finally:
+            self.__server.close()
+            for task in asyncio.all_tasks(self.__loop):
+                task.cancel()
+            self.__loop.run_until_complete(asyncio.sleep(0))
+            self.__loop.close()
+
+    def __send_pending(self) -> None:
+        """Hands the samples from the simulation thread to each client's stream."""
+        self.__wakeup_scheduled = False
+        while self.__pending:
+            sample = self.__pending.popleft()
+            for client in self.__clients:
+                client.offer(sample)
+
+    async def __handle_connection(self, reader, writer) -> None:
+        """Reads a request and serves the history or the stream."""
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+            lines = request.decode("latin-1").split("\r\n")
+            method, path = lines[0].split(" ")[:2]
+            headers = {name.strip().lower(): value.strip()
+                       for name, _, value in [line.partition(":") for line in lines[1:] if line]}
+
+            if method == "GET" and path == "/history":
+                self.__send_history(writer)
+            elif method == "GET" and path == "/stream" and headers.get("upgrade", "").lower() == "websocket":
+                await self.__stream(reader, writer, headers["sec-websocket-key"])
+            else:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, KeyError, ValueError):
+            pass  # the client went away or sent a bad request.
+        finally:
+            writer.close()
+
+    def __send_history(self, writer) -> None:
+        """Writes the history as a JSON response."""
+        history = self.history.snapshot()
+        columns = [[None if value != value else int(value) if field.startswith("number") else value  # NaN is unknown.
+                    for value in history[field].tolist()] for field in TELEMETRY_FIELDS[1:]]
+        samples = [list(sample) for sample in zip(history["time"].tolist(), *columns)]
+        body = json.dumps({"fields": TELEMETRY_FIELDS, "samples": samples}).encode()
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n" +
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+
+    async def __stream(self, reader, writer, key) -> None:
+        """Accepts the WebSocket and sends new samples until the client closes it."""
+        accept = base64.b64encode(hashlib.sha1((key + _WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n" +
+                     f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode())
+
+        client = ClientStream(max_backlog=self.max_backlog)
+        self.__clients.add(client)
+        closed = asyncio.ensure_future(_read_until_close(reader))
+        try:
+            while not closed.done():
+                ready = asyncio.ensure_future(client.ready.wait())
+                await asyncio.wait([ready, closed], return_when=asyncio.FIRST_COMPLETED)
+                ready.cancel()
+                samples = client.take()
+                if samples:
+                    writer.write(_frame(_TEXT_FRAME, json.dumps(samples).encode()))
+                    await writer.drain()  # a slow client only holds up its own stream.
+            writer.write(_frame(_CLOSE_FRAME, b""))
+        finally:
+            self.__clients.discard(client)
+            closed.cancel()
+
+
+def _frame(opcode, payload) -> bytes:
+    """Returns a final, unmasked WebSocket frame."""
+    if len(payload) < 126:
+        header = struct.pack("!BB", 0x80 | opcode, len(payload))
+    elif len(payload) < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, len(payload))
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, len(payload))
+    return header + payload
+
+
+async def _read_until_close(reader) -> None:
+    """Reads and drops the frames from the client until it sends a close frame or disconnects."""
+    try:
+        while True:
+            first, second = await reader.readexactly(2)
+            length = second & 0x7f
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            await reader.readexactly(length + (4 if second & 0x80 else 0))  # the mask and payload.
+            if first & 0x0f == _CLOSE_FRAME:
+                return
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return
+
+
+class TelemetryPublisher(Entity):
+    """Publishes the hive temp, outside temp and bee counts at the end of every step to a telemetry server."""
+
+    def __init__(self, server):
+        """
+        Creates a publisher.
+        :param TelemetryServer server: The server to publish to.
+        """
+        self.__server = server
+        self.__latest = {"outside_temp": None, "hive_temp": None, "number_bees_buzzing": None,
+                         "number_bees_fanning": None}
+        super().__init__(name=TELEMETRY_PUBLISHER_NAME)
+
+    @entity_created_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_beehive_created(self, beehive) -> None:
+        """
+        Handles the beehive being created to get the starting values.
+        :param RemoteEntity beehive: The beehive that was created.
+        """
+        self.__update_beehive(beehive)
+
+    @entity_changed_event_handler(entity_name=BEEHIVE_ENTITY_NAME)
+    def handle_beehive_changed(self, beehive, changed_properties) -> None:
+        """
+        Handles the beehive changing.
+        :param RemoteEntity beehive: The beehive that changed.
+        :param list of str changed_properties: The properties that changed.
+        """
+        assert changed_properties is not None
+        self.__update_beehive(beehive)
+
+    @entity_changed_event_handler(entity_name=OUTSIDE_TEMPERATURE_NAME)
+    def handle_temp_changed(self, temp, changed_properties) -> None:
+        """
+        Handles the outside temp changing.
+        :param RemoteEntity temp: The temperature entity that changed.
+        :param list of str changed_properties: The properties that changed.
+        """
+        assert changed_properties
+        self.__latest["outside_temp"] = temp.current_temp
+
+    @time_update_event_handler
+    def handle_time_update(self, previous_time, new_time) -> None:
+        """
+        Handles the time changing by publishing the values at the end of the previous time.
+        :param int previous_time: The previous simulation time.
+        :param int new_time: The new simulation time.
+        """
+        self.__server.publish([previous_time] + [self.__latest[field] for field in TELEMETRY_FIELDS[1:]])
+
+    def __update_beehive(self, beehive) -> None:
+        """Keeps the latest values from the beehive."""
+        self.__latest["hive_temp"] = beehive.current_temp
+        self.__latest["number_bees_buzzing"] = beehive.number_bees_buzzing
+        self.__latest["number_bees_fanning"] = beehive.number_bees_fanning
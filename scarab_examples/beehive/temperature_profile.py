@@ -0,0 +1,78 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+The outside temperature over the day.  The temperature rises from the min to the max over the first half of the day
+and falls back over the second half.
+
+Profiles are tables of the temperature at a fixed resolution.  They are cached by min temp, max temp and resolution, so
+every hive or replica with the same outside temperature shares one read-only array.  The analytic mode calculates the
+temperature for any time directly instead of looking it up.
+"""
+
+from functools import lru_cache
+
+import numpy
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def outside_temperature_profile(min_temp=50.0, max_temp=80.0, resolution=1.0) -> numpy.ndarray:
+    """
+    Returns the shared table of temperatures over the day.  At a resolution of one minute the values are the same as
+    OutsideTemperature has always used.
+    :param float min_temp: The minimum temperature during the day.
+    :param float max_temp: The maximum temperature during the day.
+    :param float resolution: The minutes between entries in the table.  Must divide the day evenly.
+    :return: Read-only array with the temperature at the start of each period of the day.
+    """
+    return _cached_profile(float(min_temp), float(max_temp), float(resolution))
+
+
+@lru_cache(maxsize=None)
+def _cached_profile(min_temp, max_temp, resolution) -> numpy.ndarray:
+    """Creates the profile for outside_temperature_profile.  Only called once for each key."""
+    assert resolution > 0
+    number_entries = MINUTES_PER_DAY / resolution
+    assert number_entries == int(number_entries), "resolution must divide the day evenly"
+
+    profile = outside_temperatures_at(numpy.arange(0, int(number_entries)) * resolution, min_temp=min_temp,
+                                      max_temp=max_temp)
+    profile.flags.writeable = False  # shared, so nobody can change it for the others.
+    return profile
+
+
+def outside_temperatures_at(times, min_temp=50.0, max_temp=80.0, resolution=None) -> numpy.ndarray:
+    """
+    Returns the temperature at each of the times.
+    :param numpy.ndarray times: The times in minutes.  Any shape, including a single time.
+    :param float min_temp: The minimum temperature during the day.
+    :param float max_temp: The maximum temperature during the day.
+    :param float resolution: The resolution of the profile to look the temps up in.  None to calculate the temps
+    directly, which is the same as the profile at the times in the table.
+    :return: Array of temperatures with the same shape as the times.
+    """
+    if resolution is not None:
+        profile = outside_temperature_profile(min_temp=min_temp, max_temp=max_temp, resolution=resolution)
+        return profile[numpy.floor_divide(times, resolution).astype(numpy.int64) % len(profile)]
+
+    min_temp, max_temp = float(min_temp), float(max_temp)
+    increment_change = (max_temp - min_temp) / (MINUTES_PER_DAY / 2)  # increment over half days up and down.
+
+    minutes = numpy.mod(numpy.asarray(times, dtype=numpy.float64), MINUTES_PER_DAY)
+    return numpy.where(minutes < MINUTES_PER_DAY / 2,
+                       min_temp + increment_change * minutes,  # increasing temps
+                       max_temp - increment_change * (minutes - MINUTES_PER_DAY / 2))  # decreasing temps
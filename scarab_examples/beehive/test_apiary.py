@@ -0,0 +1,69 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the apiary of hives that share the outside temperature.
+"""
+import unittest
+
+import numpy
+
+from scarab_examples.beehive import apiary, ensemble, kernel
+from scarab_examples.beehive.beehive import *
+from scarab.testing import EntityTestWrapper as etw
+
+
+class TestApiary(unittest.TestCase):
+
+    def test_hive_classes(self):
+        """Tests that the bees of a hive only hear their own hive."""
+        names = apiary.hive_entity_names(1)
+        population = etw(apiary.hive_classes(1)["BeePopulation"](buzz_temps=[55], fan_temps=[65]))
+        self.assertEqual(names[BEE_POPULATION_ENTITY_NAME], population.name)
+
+        population.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 50})
+        population.send_entity_changed_event(entity_name=apiary.hive_entity_names(2)[BEEHIVE_ENTITY_NAME],
+                                             properties={"current_temp": 50})
+        self.assertEqual(0, population.number_bees_buzzing)
+
+        population.send_entity_changed_event(entity_name=names[BEEHIVE_ENTITY_NAME], properties={"current_temp": 50})
+        self.assertEqual(1, population.number_bees_buzzing)
+
+        # the single hive classes are left as they were.
+        single = etw(BeePopulation(buzz_temps=[55], fan_temps=[65]))
+        single.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 50})
+        self.assertEqual(1, single.number_bees_buzzing)
+
+    def test_matches_kernel(self):
+        """Tests that each hive gives the same results as running it on its own, for any number of shards."""
+        one_shard = apiary.run_apiary(number_hives=4, number_bees=30, max_steps=300, seed=3, workers=1, shards=1)
+        three_shards = apiary.run_apiary(number_hives=4, number_bees=30, max_steps=300, seed=3, workers=2, shards=3)
+        for name in one_shard:
+            self.assertTrue(numpy.array_equal(one_shard[name], three_shards[name]), name)
+
+        for hive, seed_sequence in enumerate(numpy.random.SeedSequence(3).spawn(4)):
+            buzz_temps, fan_temps = ensemble.create_bee_temps(rng=numpy.random.default_rng(seed_sequence),
+                                                              number_bees=30)
+            results = kernel.run(buzz_temps=buzz_temps, fan_temps=fan_temps, max_steps=300, start_temp=60.0,
+                                 min_outside_temp=50.0, max_outside_temp=90.0)
+            self.assertEqual(results["outside_temp"].tolist(), one_shard["outside_temp"].tolist())
+            for name in apiary.APIARY_SERIES:
+                self.assertEqual(results[name].tolist(), one_shard[name][hive].tolist(), name)
+
+    def test_shard_hives(self):
+        """Tests splitting the hives into shards."""
+        self.assertEqual([[0, 1], [2, 3], [4]], apiary.shard_hives(5, 3))
+        self.assertEqual([[0], [1]], apiary.shard_hives(2, 4))
@@ -0,0 +1,94 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Tests for running beehive simulations from asyncio.
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from scarab_examples.beehive import async_runner, sweep
+
+
+class TestAsyncRunner(unittest.TestCase):
+
+    def test_run(self):
+        """Tests that a run in chunks gives the same summary as running all the steps at once."""
+        run = async_runner.BeehiveRun(max_steps=25, chunk_steps=10, seed=3, number_bees=10)
+        chunk_times = []
+        summary = asyncio.run(run.run(on_chunk=lambda r: chunk_times.append(r.time)))
+
+        self.assertEqual([10, 20, 25], chunk_times)
+        self.assertTrue(run.done)
+        expected = sweep.run_beehive({"number_bees": 10, "max_steps": 25, "seed": 3})
+        for name, value in expected.items():
+            self.assertEqual(value, summary[name], name)
+
+    def test_create_error(self):
+        """Tests that the simulation is shut down when the entities can't be created."""
+        run = async_runner.BeehiveRun(max_steps=10, number_bees=5, hive_size=5)
+        with mock.patch.object(async_runner, "Simulation") as simulation:
+            with self.assertRaises(TypeError):
+                asyncio.run(run.run())
+        simulation.return_value.__exit__.assert_called_once()
+        self.assertIsNone(run.summary()["observed_min_hive_temp"])
+
+    def test_run_many(self):
+        """Tests that runs on one loop are interleaved and each gets the results for its seed."""
+        runs = [async_runner.BeehiveRun(max_steps=20, chunk_steps=5, seed=seed, number_bees=5) for seed in [1, 2, 1]]
+        order = []
+
+        async def on_chunk(run):
+            order.append(runs.index(run))
+            await asyncio.sleep(0)
+
+        summaries = asyncio.run(async_runner.run_many(runs, max_concurrent=3, on_chunk=on_chunk))
+
+        self.assertEqual(12, len(order))
+        self.assertNotEqual(sorted(order), order)  # the chunks of different runs were mixed.
+        self.assertEqual(summaries[0], summaries[2])
+        self.assertEqual([1, 2, 1], [summary["seed"] for summary in summaries])
+
+    def test_deadline(self):
+        """Tests that a run stops between chunks at its deadline."""
+        run = async_runner.BeehiveRun(max_steps=1000, chunk_steps=1, deadline=0.0, number_bees=5)
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(run.run())
+        self.assertEqual(0, run.time)
+
+        summaries = asyncio.run(async_runner.run_many([run]))
+        self.assertIsInstance(summaries[0], async_runner.DeadlineExceeded)
+
+    def test_cancel(self):
+        """Tests that a cancelled run finishes its chunk and stops."""
+        run = async_runner.BeehiveRun(max_steps=1000, chunk_steps=2, number_bees=5)
+
+        async def cancel_after_chunks():
+            stop = asyncio.Event()
+            task = asyncio.ensure_future(run.run(on_chunk=lambda r: r.time >= 6 and stop.set()))
+            await stop.wait()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_after_chunks())
+        self.assertFalse(run.done)
+        self.assertEqual(0, run.time % 2)
+        self.assertEqual(run.time, run.summary()["time"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,8 +19,12 @@ and try to keep it in a given temperature range.
 
 It also includes the test code to show how entities can be verified.
 """
+import copy
+import random
 import unittest
 
+import numpy
+
 from scarab_examples.beehive.beehive import *
 from scarab.testing import EntityTestWrapper as etw
 
@@ -57,6 +61,193 @@ class TestBee(unittest.TestCase):
         self.assertFalse(bee.is_buzzing)
 
 
+class TestBeePopulation(unittest.TestCase):
+
+    def test_population_creation(self):
+        """Tests creating a population with set values."""
+        population = etw(BeePopulation(buzz_temps=[32, 40], fan_temps=[100, 90]))
+        self.assertEqual(2, population.number_bees)
+        self.assertEqual([32, 40], list(population.buzz_temp))
+        self.assertEqual([100, 90], list(population.fan_temp))
+        self.assertEqual(0, population.number_bees_buzzing)
+        self.assertEqual(0, population.number_bees_fanning)
+        self.assertFalse(population.is_buzzing.any())
+        self.assertFalse(population.is_fanning.any())
+
+    def test_population_temp_change(self):
+        """Tests temperature updates for the population."""
+        population = etw(BeePopulation(buzz_temps=[32, 40], fan_temps=[100, 90]))
+
+        population.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 95})
+        self.assertEqual([False, False], list(population.is_buzzing))
+        self.assertEqual([False, True], list(population.is_fanning))
+        self.assertEqual(0, population.number_bees_buzzing)
+        self.assertEqual(1, population.number_bees_fanning)
+
+        population.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 35})
+        self.assertEqual([False, True], list(population.is_buzzing))
+        self.assertEqual([False, False], list(population.is_fanning))
+        self.assertEqual(1, population.number_bees_buzzing)
+        self.assertEqual(0, population.number_bees_fanning)
+
+    def test_population_matches_bees(self):
+        """Tests that the population gives the same states as individual bees, including overlapping ranges."""
+        rng = random.Random(42)
+        buzz_temps = [rng.uniform(54, 66) for _ in range(200)]
+        fan_temps = [rng.uniform(58.5, 71.5) for _ in range(200)]
+
+        population = etw(BeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps))
+        bees = [etw(Bee(buzz_temp=buzz, fan_temp=fan)) for buzz, fan in zip(buzz_temps, fan_temps)]
+
+        for temp in [50, 58, 60.5, 63, 66, 75]:
+            population.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": temp})
+            for bee in bees:
+                bee.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": temp})
+
+            self.assertEqual([b.is_buzzing for b in bees], list(population.is_buzzing))
+            self.assertEqual([b.is_fanning for b in bees], list(population.is_fanning))
+            self.assertEqual(sum([1 for b in bees if b.is_buzzing]), population.number_bees_buzzing)
+            self.assertEqual(sum([1 for b in bees if b.is_fanning]), population.number_bees_fanning)
+
+    def test_crossing_only(self):
+        """Tests that only waking bees whose temps were crossed gives the same states as updating every bee."""
+        rng = random.Random(11)
+        buzz_temps = [rng.uniform(54, 66) for _ in range(500)]
+        fan_temps = [rng.uniform(58.5, 71.5) for _ in range(500)]
+
+        crossing = etw(BeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps, crossing_only=True))
+        every_bee = etw(BeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps, crossing_only=False))
+
+        temp = 60.0
+        for _ in range(200):
+            temp += rng.uniform(-3, 3)
+            for population in [crossing, every_bee]:
+                population.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME,
+                                                     properties={"current_temp": temp})
+            self.assertEqual(list(every_bee.is_buzzing), list(crossing.is_buzzing))
+            self.assertEqual(list(every_bee.is_fanning), list(crossing.is_fanning))
+            self.assertEqual(every_bee.number_bees_buzzing, crossing.number_bees_buzzing)
+            self.assertEqual(every_bee.number_bees_fanning, crossing.number_bees_fanning)
+
+    def test_band_subscriptions(self):
+        """Tests that only bees with a buzz or fan temp between the temps are woken."""
+        subscriptions = BeeBandSubscriptions(buzz_temps=numpy.array([55.0, 60.0, 64.0]),
+                                             fan_temps=numpy.array([65.0, 70.0, 62.0]))
+        self.assertEqual([], list(subscriptions.crossed(66, 69)))
+        self.assertEqual([0], list(subscriptions.crossed(64.5, 66)))
+        self.assertEqual([0], list(subscriptions.crossed(66, 64.5)))
+        self.assertEqual([1, 2], list(subscriptions.crossed(59, 63)))
+        self.assertEqual([0, 1, 2], list(subscriptions.crossed(50, 80)))
+
+
+class TestBeeThresholdIndex(unittest.TestCase):
+
+    def test_counts(self):
+        """Tests counting buzzing and fanning bees from the index."""
+        index = BeeThresholdIndex()
+        index.add(buzz_temp=55, fan_temp=65)
+        index.add(buzz_temp=60, fan_temp=70)
+        index.add(buzz_temp=64, fan_temp=62)  # buzzes below 64 and fans from 64 up.
+        self.assertEqual(3, len(index))
+
+        self.assertEqual(3, index.number_buzzing(50))
+        self.assertEqual(0, index.number_fanning(50))
+        self.assertEqual(2, index.number_buzzing(58))
+        self.assertEqual(1, index.number_buzzing(63))
+        self.assertEqual(0, index.number_fanning(63))
+        self.assertEqual(0, index.number_buzzing(64))
+        self.assertEqual(1, index.number_fanning(64))
+        self.assertEqual(2, index.number_fanning(66))
+        self.assertEqual(3, index.number_fanning(75))
+
+        thresholds = BeeThresholds(buzz_temps=[58], fan_temps=[66])
+        index.add_thresholds(thresholds)
+        buzzing, fanning = index.counts_at(numpy.array([50, 58, 64, 75]))
+        self.assertEqual([index.number_buzzing(temp) for temp in [50, 58, 64, 75]], buzzing.tolist())
+        self.assertEqual([index.number_fanning(temp) for temp in [50, 58, 64, 75]], fanning.tolist())
+        self.assertEqual([4, 2, 0, 0], buzzing.tolist())
+        self.assertEqual([0, 0, 1, 4], fanning.tolist())
+        index.remove_thresholds(thresholds)
+
+        index.remove(buzz_temp=64, fan_temp=62)
+        self.assertEqual(2, len(index))
+        self.assertEqual(0, index.number_fanning(64))
+        self.assertRaises(ValueError, index.remove, 64, 62)
+
+    def test_matches_bees(self):
+        """Tests that the index gives the same counts as individual bees."""
+        rng = random.Random(7)
+        index = BeeThresholdIndex()
+        bees = []
+        for _ in range(200):
+            bee = etw(Bee(buzz_temp=rng.uniform(54, 66), fan_temp=rng.uniform(58.5, 71.5)))
+            index.add(buzz_temp=bee.buzz_temp, fan_temp=bee.fan_temp)
+            bees.append(bee)
+
+        for temp in [50, 58, 60.5, 63, 66, 75]:
+            for bee in bees:
+                bee.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": temp})
+            self.assertEqual(sum([1 for b in bees if b.is_buzzing]), index.number_buzzing(temp))
+            self.assertEqual(sum([1 for b in bees if b.is_fanning]), index.number_fanning(temp))
+
+    def test_thresholds(self):
+        """Tests adding and removing a group of bees at once."""
+        index = BeeThresholdIndex()
+        index.add(buzz_temp=55, fan_temp=65)
+        thresholds = BeeThresholds(buzz_temps=[60, 64], fan_temps=[70, 62])
+        index.add_thresholds(thresholds)
+        self.assertEqual(3, len(index))
+        self.assertIs(thresholds, copy.deepcopy(thresholds))  # shared, not copied, with the events.
+
+        # the same counts as test_counts, where the bees were added one at a time.
+        self.assertEqual(2, index.number_buzzing(58))
+        self.assertEqual(0, index.number_buzzing(64))
+        self.assertEqual(1, index.number_fanning(64))
+        self.assertEqual(2, index.number_fanning(66))
+
+        index.remove_thresholds(thresholds)
+        self.assertEqual(1, len(index))
+        self.assertEqual(1, index.number_fanning(66))
+
+
+class TestBeeRegistry(unittest.TestCase):
+    """Test the registry of bee states."""
+
+    def test_add_update_remove(self):
+        """Tests the state of bees through their life."""
+        registry = BeeRegistry()
+        registry.add(guid="a", is_buzzing=True, is_fanning=False, buzz_temp=60, fan_temp=65)
+        registry.add(guid="b", is_buzzing=False, is_fanning=False)
+        self.assertEqual(2, len(registry))
+        self.assertIn("a", registry)
+        with self.assertRaises(ValueError):
+            registry.add(guid="a", is_buzzing=False, is_fanning=False)
+
+        self.assertEqual(BeeRegistry.BUZZING | BeeRegistry.INDEXED,
+                         registry.update(guid="a", is_buzzing=False, is_fanning=True))
+        self.assertEqual(0, registry.update(guid="b", is_buzzing=True, is_fanning=False))
+
+        self.assertEqual((BeeRegistry.FANNING | BeeRegistry.INDEXED, 60, 65), registry.remove(guid="a"))
+        self.assertEqual((BeeRegistry.BUZZING, None, None), registry.remove(guid="b"))
+        self.assertEqual(0, len(registry))
+        with self.assertRaises(KeyError):
+            registry.remove(guid="a")
+
+    def test_slot_reuse(self):
+        """Tests that the slots of removed bees are reused with the new bee's state."""
+        registry = BeeRegistry()
+        for guid in range(0, 100):
+            registry.add(guid=guid, is_buzzing=True, is_fanning=False, buzz_temp=guid, fan_temp=guid + 5)
+        for guid in range(0, 100, 2):
+            registry.remove(guid=guid)
+        for guid in range(100, 150):
+            registry.add(guid=guid, is_buzzing=False, is_fanning=True)
+
+        self.assertEqual(100, len(registry))
+        self.assertEqual((BeeRegistry.FANNING, None, None), registry.remove(guid=120))
+        self.assertEqual((BeeRegistry.BUZZING | BeeRegistry.INDEXED, 51, 56), registry.remove(guid=51))
+
+
 class TestBeehive(unittest.TestCase):
 
     def test_beehive_creation(self):
@@ -113,6 +304,99 @@ class TestBeehive(unittest.TestCase):
         self.assertEqual(0, beehive.number_bees_buzzing)
         self.assertEqual(1, beehive.number_bees_fanning)
 
+    def test_time_jump(self):
+        """Tests that bees with known temps change state at the right minute during a jump in time."""
+        beehive = etw(Beehive(start_temp=10, buzzing_impact=1, fanning_impact=1))
+        beehive.send_entity_created_event(entity_name=BEE_ENTITY_NAME,
+                                          properties={"guid": 1, "buzz_temp": 14, "fan_temp": 30,
+                                                      "is_buzzing": False, "is_fanning": False})
+        beehive.send_entity_changed_event(entity_name=OUTSIDE_TEMPERATURE_NAME, properties={"current_temp": 15})
+
+        # the bee hasn't been told about a hive temp yet, so only the outside temp matters.  10 + .2 * 5 = 11.
+        beehive.send_new_time(new_time=1)
+        self.assertAlmostEqual(11, beehive.current_temp)
+        self.assertEqual(1, beehive.get_number_bees_buzzing())
+
+        # no bee update arrives, but the bee buzzes for 2 minutes until the hive passes 14:  11 + .8 + 1 = 12.8,
+        # 12.8 + .44 + 1 = 14.24, then only the outside temp:  14.24 + .152 = 14.392, 14.392 + .1216 = 14.5136.
+        beehive.send_new_time(new_time=5)
+        self.assertAlmostEqual(14.5136, beehive.current_temp)
+        self.assertEqual(0, beehive.get_number_bees_buzzing())
+        self.assertEqual(0, beehive.number_bees_buzzing)
+
+    def test_long_time_jump(self):
+        """Tests that a long jump in time matches stepping every minute when no bee updates arrive."""
+        rng = random.Random(1)
+        bees = [{"guid": guid, "buzz_temp": rng.uniform(50, 70), "fan_temp": rng.uniform(60, 90),
+                 "is_buzzing": False, "is_fanning": False} for guid in range(50)]
+        stepped = etw(Beehive(start_temp=60, buzzing_impact=.05, fanning_impact=.05))
+        jumped = etw(Beehive(start_temp=60, buzzing_impact=.05, fanning_impact=.05))
+        for beehive in [stepped, jumped]:
+            for bee in bees:
+                beehive.send_entity_created_event(entity_name=BEE_ENTITY_NAME, properties=bee)
+            beehive.send_entity_changed_event(entity_name=OUTSIDE_TEMPERATURE_NAME, properties={"current_temp": 85})
+            beehive.send_new_time(new_time=1)
+
+        for time in range(2, 2001):
+            stepped.send_new_time(new_time=time)
+        jumped.send_new_time(new_time=2000)
+
+        self.assertAlmostEqual(stepped.current_temp, jumped.current_temp)
+        self.assertEqual(stepped.get_number_bees_buzzing(), jumped.get_number_bees_buzzing())
+        self.assertEqual(stepped.get_number_bees_fanning(), jumped.get_number_bees_fanning())
+
+    def test_populations(self):
+        """Tests handling bee populations."""
+        beehive = etw(Beehive(start_temp=10, buzzing_impact=.5, fanning_impact=.25))
+
+        beehive.send_entity_created_event(entity_name=BEE_POPULATION_ENTITY_NAME,
+                                          properties={"guid": 1, "number_bees": 10,
+                                                      "number_bees_buzzing": 0, "number_bees_fanning": 0})
+        beehive.send_entity_created_event(entity_name=BEE_ENTITY_NAME,
+                                          properties={"guid": 2, "is_buzzing": True, "is_fanning": False})
+        self.assertEqual(11, beehive.number_bees)
+        self.assertEqual(1, beehive.number_bees_buzzing)
+        self.assertEqual(0, beehive.number_bees_fanning)
+
+        beehive.send_entity_changed_event(entity_name=BEE_POPULATION_ENTITY_NAME,
+                                          properties={"guid": 1, "number_bees": 10,
+                                                      "number_bees_buzzing": 3, "number_bees_fanning": 2})
+        self.assertEqual(11, beehive.number_bees)
+        self.assertEqual(4, beehive.number_bees_buzzing)
+        self.assertEqual(2, beehive.number_bees_fanning)
+
+        # 4 buzzing and 2 fanning, so 4*0.5 - 2*0.25 = 1.5 change.
+        beehive.send_new_time(new_time=1)
+        self.assertEqual(11.5, beehive.current_temp)
+
+        beehive.send_entity_destroyed_event(entity_name=BEE_POPULATION_ENTITY_NAME, entity_guid=1)
+        self.assertEqual(1, beehive.number_bees)
+        self.assertEqual(1, beehive.number_bees_buzzing)
+        self.assertEqual(0, beehive.number_bees_fanning)
+
+    def test_population_thresholds(self):
+        """Tests that a population with thresholds is counted for the hive temp, the same as bees with known temps."""
+        beehive = etw(Beehive(start_temp=10, buzzing_impact=1, fanning_impact=1))
+        beehive.send_entity_created_event(entity_name=BEE_POPULATION_ENTITY_NAME,
+                                          properties={"guid": 1, "number_bees": 3, "number_bees_buzzing": 0,
+                                                      "number_bees_fanning": 0,
+                                                      "thresholds": BeeThresholds(buzz_temps=[11, 12, 14],
+                                                                                  fan_temps=[30, 30, 30])})
+        beehive.send_entity_changed_event(entity_name=OUTSIDE_TEMPERATURE_NAME, properties={"current_temp": 15})
+
+        # only the outside temp until the population has been told about a hive temp:  10 + .2 * 5 = 11.
+        beehive.send_new_time(new_time=1)
+        self.assertAlmostEqual(11, beehive.current_temp)
+
+        # no population update arrives, but 2 bees buzz at 11 and 1 at 13.8:  11 + .8 + 2 = 13.8, 13.8 + .24 + 1 = 15.04
+        beehive.send_new_time(new_time=3)
+        self.assertAlmostEqual(15.04, beehive.current_temp)
+        self.assertEqual(0, beehive.get_number_bees_buzzing())
+
+        beehive.send_entity_destroyed_event(entity_name=BEE_POPULATION_ENTITY_NAME, entity_guid=1)
+        self.assertEqual(0, beehive.number_bees)
+        self.assertEqual(0, beehive.get_number_bees_buzzing())
+
     def test_change_temp(self):
         """Tests changes in temperature."""
         beehive = etw(Beehive(start_temp=10, buzzing_impact=.5, fanning_impact=.25))
@@ -164,6 +448,19 @@ class TestOutsideTemp(unittest.TestCase):
         ot.send_new_time(new_time=820)
         self.assertEqual(620, ot.current_temp)
 
+    def test_resolution(self):
+        """Tests profiles at other resolutions and calculating the temps."""
+        ot = etw(OutsideTemperature(min_temp=0, max_temp=720, resolution=15))
+        ot.send_new_time(new_time=440)
+        self.assertEqual(435, ot.current_temp)  # the start of the 15 minute period.
+
+        ot = etw(OutsideTemperature(min_temp=0, max_temp=720, resolution=None))
+        self.assertEqual(0, ot.current_temp)
+        ot.send_new_time(new_time=820)
+        self.assertEqual(620, ot.current_temp)
+        ot.send_new_time(new_time=2160)
+        self.assertEqual(720, ot.current_temp)
+
 
 class TestBeehiveDisplayModel(unittest.TestCase):
     """Test the display class."""
@@ -188,3 +485,18 @@ class TestBeehiveDisplayModel(unittest.TestCase):
         display.send_entity_changed_event(entity_name=OUTSIDE_TEMPERATURE_NAME, properties={"current_temp": 55.0})
         display.send_new_time(new_time=5)
 
+    def test_stats(self):
+        """Tests the stats kept for the beehive series."""
+        display = etw(BeehiveDisplayModel(window=2))
+        self.assertIsNone(display.min_hive_temp)
+        for time, hive_temp in enumerate([50, 54, 52, 56]):
+            display.send_new_time(new_time=time)
+            display.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME,
+                                              properties={"current_temp": hive_temp, "number_bees": 4,
+                                                          "number_bees_fanning": 1, "number_bees_buzzing": time})
+
+        self.assertEqual((50, 56), (display.min_hive_temp, display.max_hive_temp))
+        self.assertEqual((52, 56), (display.stats["hive_temp"].window_min, display.stats["hive_temp"].window_max))
+        self.assertEqual(53, display.stats["hive_temp"].mean)
+        self.assertEqual((0, 3), (display.min_number_bees_buzzing, display.max_number_bees_buzzing))
+        self.assertEqual((4, 4), (display.min_number_bees, display.max_number_bees))
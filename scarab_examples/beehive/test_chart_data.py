@@ -0,0 +1,90 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the data behind the live charts.
+"""
+import unittest
+
+import numpy
+
+from scarab_examples.beehive.chart_data import DoubleBuffer, RingBuffer, decimate_min_max
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_append_and_wrap(self):
+        """Tests that the latest rows are kept in order once the buffer wraps around."""
+        buffer = RingBuffer(fields=["hive_temp", "number_bees_buzzing"], capacity=4)
+        self.assertEqual(0, len(buffer))
+        self.assertEqual([], buffer.snapshot()["time"].tolist())
+
+        buffer.append(1, [60.0, None])
+        buffer.append(2, [61.0, 3])
+        snapshot = buffer.snapshot()
+        self.assertEqual([1, 2], snapshot["time"].tolist())
+        self.assertEqual([60.0, 61.0], snapshot["hive_temp"].tolist())
+        self.assertTrue(numpy.isnan(snapshot["number_bees_buzzing"][0]))
+
+        # exactly full, before anything is overwritten.
+        buffer.append(3, [60.0, 3])
+        buffer.append(4, [61.0, 4])
+        self.assertEqual([1, 2, 3, 4], buffer.snapshot()["time"].tolist())
+
+        for time in range(5, 7):
+            buffer.append(time, [57.0 + time, time])
+        snapshot = buffer.snapshot()
+        self.assertEqual(4, len(buffer))
+        self.assertEqual(6, buffer.version)
+        self.assertEqual([3, 4, 5, 6], snapshot["time"].tolist())
+        self.assertEqual([3, 4, 5, 6], snapshot["number_bees_buzzing"].tolist())
+
+        # the snapshot is a copy, so it doesn't change when more rows arrive.
+        buffer.append(7, [64.0, 7])
+        self.assertEqual([3, 4, 5, 6], snapshot["time"].tolist())
+
+
+class TestDecimateMinMax(unittest.TestCase):
+
+    def test_decimate(self):
+        """Tests that every spike is kept in the min and max of its column."""
+        times = numpy.arange(0, 10)
+        values = numpy.array([1, 5, 2, numpy.nan, 3, 9, 0, 1, 1, 2])
+        column_times, mins, maxs = decimate_min_max(times, values, 3)
+        self.assertEqual([0, 3, 6], column_times.tolist())
+        self.assertEqual([1, 3, 0], mins.tolist())
+        self.assertEqual([5, 9, 2], maxs.tolist())
+
+    def test_short_series(self):
+        """Tests that a series shorter than the columns is left as it is."""
+        column_times, mins, maxs = decimate_min_max([1, 2], [3.0, 4.0], 100)
+        self.assertEqual([1, 2], column_times.tolist())
+        self.assertEqual([3.0, 4.0], mins.tolist())
+        self.assertEqual([3.0, 4.0], maxs.tolist())
+
+
+class TestDoubleBuffer(unittest.TestCase):
+
+    def test_publish(self):
+        """Tests that the reader gets the latest snapshot."""
+        buffer = DoubleBuffer()
+        self.assertIsNone(buffer.latest())
+        self.assertEqual(0, buffer.version)
+
+        for time in range(1, 4):
+            buffer.publish((time, 60.0 + time))
+            self.assertEqual((time, 60.0 + time), buffer.latest())
+        self.assertEqual(3, buffer.version)
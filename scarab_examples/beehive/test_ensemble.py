@@ -0,0 +1,51 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the Monte Carlo ensembles.
+"""
+import unittest
+
+import numpy
+
+from scarab_examples.beehive import ensemble
+
+
+class TestEnsemble(unittest.TestCase):
+
+    def test_same_for_any_workers(self):
+        """Tests that the results are bit identical no matter how many workers are used."""
+        one_worker = ensemble.run_ensemble(number_replicas=8, number_bees=30, max_steps=500, seed=9, workers=1)
+        four_workers = ensemble.run_ensemble(number_replicas=8, number_bees=30, max_steps=500, seed=9, workers=4)
+
+        self.assertEqual(list(one_worker.keys()), list(four_workers.keys()))
+        for name in one_worker:
+            self.assertTrue(numpy.array_equal(one_worker[name], four_workers[name]), name)
+
+    def test_seeds_differ(self):
+        """Tests that different master seeds give different ensembles and replicas differ from each other."""
+        first = ensemble.run_ensemble(number_replicas=4, number_bees=30, max_steps=200, seed=1, workers=2)
+        second = ensemble.run_ensemble(number_replicas=4, number_bees=30, max_steps=200, seed=2, workers=2)
+        self.assertFalse(numpy.array_equal(first["hive_temp_mean"], second["hive_temp_mean"]))
+        self.assertTrue((first["hive_temp_p5"] <= first["hive_temp_p95"]).all())
+        self.assertTrue((first["hive_temp_p5"] < first["hive_temp_p95"]).any())
+
+    def test_same_bees(self):
+        """Tests that replicas of identical bees all give the same results."""
+        summary = ensemble.run_ensemble(number_replicas=3, number_bees=10, max_steps=100, bee_variance="same",
+                                        percentiles=(0, 100), workers=1)
+        self.assertTrue(numpy.array_equal(summary["hive_temp_p0"], summary["hive_temp_p100"]))
+        self.assertTrue(numpy.allclose(summary["hive_temp_mean"], summary["hive_temp_p0"]))
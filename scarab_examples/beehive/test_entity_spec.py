@@ -0,0 +1,111 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for creating entity classes from a description.
+"""
+import random
+import unittest
+
+from scarab.simulation import Simulation
+
+from scarab_examples.beehive.beehive import BEE_ENTITY_NAME, BEEHIVE_ENTITY_NAME, Bee, Beehive, OutsideTemperature
+from scarab_examples.beehive.entity_spec import *
+from scarab.testing import EntityTestWrapper as etw
+
+
+def run_hive(beehive, outside_temperature, bee_class, steps=30) -> list:
+    """Runs a hive of 10 bees in a simulation and returns the hive temp after each step."""
+    random.seed(4)
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        simulation.add_entity(beehive)
+        simulation.add_entity(outside_temperature)
+        for _ in range(0, 10):
+            simulation.add_entity(bee_class(buzz_temp=random.uniform(54, 66), fan_temp=random.uniform(58.5, 71.5)))
+
+        temps = []
+        for _ in range(0, steps):
+            simulation.advance_and_wait(steps=1)
+            temps.append(beehive.current_temp)
+        return temps
+
+
+class TestEntitySpec(unittest.TestCase):
+
+    def test_beehive_classes(self):
+        """Tests the bee generated from beehive.yaml behaves the same as the hand-written bee."""
+        classes = load_beehive_classes()
+        self.assertEqual(["Bee"], list(classes))
+        bee_class = classes["Bee"]
+        self.assertTrue(hasattr(bee_class, handler_name("beehive", "changed")))
+
+        bee = bee_class(buzz_temp=32, fan_temp=100)
+        self.assertEqual({"buzz_temp": 32, "fan_temp": 100, "is_buzzing": False, "is_fanning": False},
+                         {name: vars(bee)[name] for name in ["buzz_temp", "fan_temp", "is_buzzing", "is_fanning"]})
+        bee = etw(bee)
+        self.assertEqual(BEE_ENTITY_NAME, bee.name)
+        self.assertFalse(bee.is_buzzing)
+        self.assertFalse(bee.is_fanning)
+
+        bee.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 101})
+        self.assertTrue(bee.is_fanning)
+        self.assertFalse(bee.is_buzzing)
+
+        bee.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 15})
+        self.assertFalse(bee.is_fanning)
+        self.assertTrue(bee.is_buzzing)
+
+    def test_create_entity_class(self):
+        """Tests the attributes and handlers of a generated class."""
+        def handle_time_update(self, previous_time, new_time):
+            self.ticks += new_time - previous_time
+
+        spec = {"name": "clock", "attributes": ["ticks", "label"],
+                "handlers": {"entities": {"bee": ["created", "destroyed"]}, "events": ["time_update"]}}
+        clock_class = create_entity_class("Clock", spec, {"defaults": {"ticks": 0},
+                                                          "handlers": {"time_update": handle_time_update}})
+
+        # only the handlers with bodies are created.
+        self.assertTrue(hasattr(clock_class, "handle_time_update"))
+        self.assertFalse(hasattr(clock_class, handler_name("bee", "created")))
+
+        clock = clock_class(label="wall")
+        self.assertEqual(0, clock.ticks)
+        self.assertEqual("wall", clock.label)
+        self.assertIn("ticks", vars(clock))  # published, so in the instance dictionary.
+        door_clock = clock_class(3, "door")
+        self.assertEqual((3, "door"), (door_clock.ticks, door_clock.label))
+
+        clock = etw(clock)
+        clock.send_new_time(new_time=5)
+        self.assertEqual(5, clock.ticks)
+
+        with self.assertRaises(ValueError):
+            create_entity_class("Bad", {"name": "bad", "attributes": ["not valid"]}, {})
+        with self.assertRaises(TypeError):
+            clock_class(colour="red")
+        with self.assertRaises(TypeError):
+            clock_class(1, "wall", "red")
+
+    def test_simulation(self):
+        """Tests the generated bees in a simulation, where the hive only sees their published properties."""
+        classes = load_beehive_classes()
+
+        hand_written = run_hive(Beehive(start_temp=60, buzzing_impact=.5, fanning_impact=.5),
+                                OutsideTemperature(min_temp=50, max_temp=90, resolution=None), Bee)
+        generated = run_hive(Beehive(start_temp=60, buzzing_impact=.5, fanning_impact=.5),
+                             OutsideTemperature(min_temp=50, max_temp=90, resolution=None), classes["Bee"])
+        self.assertEqual(hand_written, generated)
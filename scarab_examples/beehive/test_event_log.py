@@ -0,0 +1,97 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Tests for the binary event logs.
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from scarab.simulation import Simulation
+
+from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.cli_beehive import BeehiveApp
+from scarab_examples.beehive.event_log import *
+
+
+class TestEventLog(unittest.TestCase):
+
+    def setUp(self):
+        """Logs a small hive with an entity for each bee."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "events.bin")
+
+        random.seed(5)
+        with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+            recorder = EventLogRecorder(path=self.path, index_every=8)
+            simulation.add_entity(recorder)
+            self.display_model = BeehiveApp.create_entities(simulation=simulation, number_bees=6, bee_model="bees")
+            simulation.advance_and_wait(steps=50)
+            recorder.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_events(self):
+        """Tests that the log has the entities being created and every time update."""
+        events = list(EventLogReader(self.path).events())
+
+        created = [event[1] for event in events if event[0] == CREATED]
+        self.assertEqual(6, created.count(BEE_ENTITY_NAME))
+        self.assertIn(BEEHIVE_ENTITY_NAME, created)
+        self.assertEqual(list(range(1, 51)), [event[2] for event in events if event[0] == TIME])
+
+        # the last logged temp of the hive is the temp at the end of the run.
+        hive_temps = [event[3]["current_temp"] for event in events
+                      if event[0] != TIME and event[1] == BEEHIVE_ENTITY_NAME and "current_temp" in event[3]]
+        self.assertEqual(self.display_model.beehive.current_temp, hive_temps[-1])
+
+    def test_seek(self):
+        """Tests that reading from a time with the index gives the same events as reading the whole log."""
+        log = EventLogReader(self.path)
+        self.assertEqual([1, 9, 17, 25, 33, 41, 49], [time for time, _ in log.index])
+
+        events = list(log.events())
+        start = events.index((TIME, 19, 20))
+        end = events.index((TIME, 23, 24))
+        self.assertEqual(events[start:end], list(log.events(start_time=20, end_time=23)))
+
+        # a log from a run that stopped without a footer is scanned instead.
+        with open(self.path, "rb") as log_file:
+            data = log_file.read()
+        with open(self.path, "wb") as log_file:
+            log_file.write(data[:log.index[-1][1] + 3])
+        scanned = EventLogReader(self.path)
+        self.assertEqual(48, len(scanned.index))
+        self.assertEqual(events[start:end], list(scanned.events(start_time=20, end_time=23)))
+
+        self.assertRaises(ValueError, EventLogReader, __file__)
+
+    def test_replay(self):
+        """Tests that a new hive given the logged events ends up at the same temp."""
+        beehive = replay(EventLogReader(self.path), Beehive(start_temp=60.0, buzzing_impact=.5, fanning_impact=.5))
+        self.assertEqual(self.display_model.beehive.current_temp, beehive.current_temp)
+        self.assertEqual(self.display_model.beehive.number_bees_buzzing, beehive.number_bees_buzzing)
+
+        # replaying part of the log starts from the entities that exist at the start time.
+        beehive = replay(EventLogReader(self.path), Beehive(start_temp=60.0, buzzing_impact=.5, fanning_impact=.5),
+                         start_time=25, end_time=30)
+        self.assertEqual(6, beehive.number_bees)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Tests that the headless kernel gives the same results as the entity based simulation from cli_beehive.
+"""
+import random
+import unittest
+
+import numpy
+
+from scarab_examples.beehive import kernel
+from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.cli_beehive import BeehiveApp
+from scarab.simulation import Simulation
+from scarab.testing import EntityTestWrapper as etw
+
+
+def run_simulation(number_bees, bee_variance, bee_model, max_steps, seed) -> list:
+    """
+    Runs the entity based simulation the same way as cli_beehive and records the state after every step.
+    :return: List of (hive temp, outside temp, number buzzing, number fanning) for each step.
+    """
+    random.seed(seed)
+    states = []
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        display_model = BeehiveApp.create_entities(simulation=simulation, number_bees=number_bees,
+                                                   bee_variance=bee_variance, bee_model=bee_model)
+        for step in range(0, max_steps):
+            simulation.advance_and_wait(steps=1)
+            states.append((display_model.beehive.current_temp, display_model.outside_temp,
+                           display_model.beehive.number_bees_buzzing, display_model.beehive.number_bees_fanning))
+    return states
+
+
+def run_kernel(number_bees, bee_variance, max_steps, seed) -> list:
+    """
+    Runs the kernel with the same bees and settings as cli_beehive.
+    :return: List of (hive temp, outside temp, number buzzing, number fanning) for each step.
+    """
+    random.seed(seed)
+    buzz_temps, fan_temps = BeehiveApp.create_bee_temps(number_bees=number_bees, bee_variance=bee_variance,
+                                                        target_bee_buzzing=60.0, target_bee_fanning=65.0)
+    results = kernel.run(buzz_temps=buzz_temps, fan_temps=fan_temps, max_steps=max_steps, start_temp=60.0,
+                         buzzing_impact=0.5, fanning_impact=0.5, min_outside_temp=50.0, max_outside_temp=90.0)
+    return list(zip(results["hive_temp"][1:].tolist(), results["outside_temp"][1:].tolist(),
+                    results["number_bees_buzzing"][1:].tolist(), results["number_bees_fanning"][1:].tolist()))
+
+
+class TestKernel(unittest.TestCase):
+
+    def test_outside_temperatures(self):
+        """Tests that the outside temps are the same as the outside temperature entity."""
+        temps = kernel.outside_temperatures(min_temp=50, max_temp=90)
+        self.assertEqual(24 * 60, len(temps))
+
+        ot = etw(OutsideTemperature(min_temp=50, max_temp=90))
+        for minute in [1, 17, 719, 720, 721, 1000, 1439]:
+            ot.send_new_time(new_time=minute)
+            self.assertEqual(ot.current_temp, temps[minute])
+
+    def test_time_update(self):
+        """Tests the first steps by hand."""
+        # the outside temp goes up 40/720 each minute from 50.  The hive only sees it after it changes.
+        results = kernel.run(buzz_temps=[65], fan_temps=[70], max_steps=3, start_temp=60,
+                             buzzing_impact=.5, fanning_impact=.5, min_outside_temp=50, max_outside_temp=90)
+        increment = 40 / 720
+
+        self.assertEqual([0, 1, 2, 3], list(results["time"]))
+        self.assertAlmostEqual(50 + increment, results["outside_temp"][1])
+
+        # no change at first since the hive sees its own temp, then it warms by 20% of the difference.
+        self.assertEqual(60, results["hive_temp"][1])
+        self.assertAlmostEqual(60 + .2 * (60 - 50 - increment), results["hive_temp"][2])
+        self.assertEqual([0, 0, 1, 1], list(results["number_bees_buzzing"]))
+
+        # now the bee is buzzing.
+        temp = results["hive_temp"][2]
+        self.assertAlmostEqual(temp + .2 * (temp - 50 - 2 * increment) + .5, results["hive_temp"][3])
+        self.assertEqual([0, 0, 0, 0], list(results["number_bees_fanning"]))
+
+    def test_same_bees(self):
+        """Tests that the kernel matches the simulation when all bees are the same."""
+        for bee_model in ["population", "bees"]:
+            self.assertEqual(run_simulation(number_bees=20, bee_variance="same", bee_model=bee_model,
+                                            max_steps=300, seed=1),
+                             run_kernel(number_bees=20, bee_variance="same", max_steps=300, seed=1))
+
+    def test_vary_bees(self):
+        """Tests that the kernel matches the simulation when the bees vary."""
+        for seed in [1, 2, 3]:
+            for bee_model in ["population", "bees"]:
+                self.assertEqual(run_simulation(number_bees=50, bee_variance="vary", bee_model=bee_model,
+                                                max_steps=300, seed=seed),
+                                 run_kernel(number_bees=50, bee_variance="vary", max_steps=300, seed=seed))
+
+    def test_over_a_day(self):
+        """Tests that the kernel matches the simulation through the outside temp turning around."""
+        self.assertEqual(run_simulation(number_bees=100, bee_variance="vary", bee_model="population",
+                                        max_steps=1500, seed=4),
+                         run_kernel(number_bees=100, bee_variance="vary", max_steps=1500, seed=4))
+
+    def test_adaptive(self):
+        """Tests that jumping over the quiet stretches gives the same results as every step."""
+        rng = numpy.random.default_rng(5)
+        runs = [{"buzz_temps": rng.uniform(54, 66, 50), "fan_temps": rng.uniform(58.5, 71.5, 50),
+                 "min_outside_temp": 50, "max_outside_temp": 90},
+                {"buzz_temps": [60] * 20, "fan_temps": [65] * 20, "min_outside_temp": 50, "max_outside_temp": 90},
+                # idle bees and a slowly warming day, so the hive never catches the outside temp.
+                {"buzz_temps": rng.uniform(0, 30, 50), "fan_temps": rng.uniform(200, 300, 50), "start_temp": 40,
+                 "outside_temps": numpy.linspace(50, 150, 3001)}]
+
+        for parameters in runs:
+            every_step = kernel.run(max_steps=3000, **parameters)
+            adaptive = kernel.run(max_steps=3000, adaptive=True, **parameters)
+            self.assertTrue(numpy.allclose(every_step["hive_temp"], adaptive["hive_temp"], rtol=1e-12))
+            for name in ["time", "outside_temp", "number_bees_buzzing", "number_bees_fanning"]:
+                self.assertEqual(every_step[name].tolist(), adaptive[name].tolist())
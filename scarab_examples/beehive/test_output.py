@@ -0,0 +1,133 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the report writers.
+"""
+import io
+import json
+import types
+import unittest
+
+import numpy
+
+from scarab_examples.beehive.output import *
+
+
+def create_display_model(beehive=True):
+    """Creates an object with the same values as a display model."""
+    display_model = types.SimpleNamespace(previous_time=99, new_time=100, outside_temp=55.0,
+                                          min_outside_temp=50.0, max_outside_temp=55.0,
+                                          min_hive_temp=58.0, max_hive_temp=62.5, min_number_bees=10,
+                                          max_number_bees=10, min_number_bees_buzzing=0, max_number_bees_buzzing=4,
+                                          min_number_bees_fanning=0, max_number_bees_fanning=6, beehive=None)
+    if beehive:
+        display_model.beehive = types.SimpleNamespace(current_temp=61.25, number_bees=10, number_bees_buzzing=3,
+                                                      number_bees_fanning=1)
+    return display_model
+
+
+class TestReportWriters(unittest.TestCase):
+
+    def test_report(self):
+        """Tests creating a report from the display model."""
+        report = dict(zip(REPORT_FIELDS, create_report(create_display_model())))
+        self.assertEqual(100, report["time"])
+        self.assertEqual(61.25, report["hive_temp"])
+        self.assertEqual(3, report["number_bees_buzzing"])
+        self.assertEqual(6, report["max_number_bees_fanning"])
+
+        report = dict(zip(REPORT_FIELDS, create_report(create_display_model(beehive=False))))
+        self.assertIsNone(report["hive_temp"])
+        self.assertIsNone(report["number_bees"])
+
+    def test_abstract_writer(self):
+        """Tests that a writer has to encode the reports."""
+        self.assertRaises(TypeError, ReportWriter, output=io.StringIO())
+
+    def test_text(self):
+        """Tests the text output."""
+        output = io.StringIO()
+        writer = TextReportWriter(output=output, batch_size=1)
+        writer.write(create_report(create_display_model()))
+        self.assertIn("Update from time 99 to 100", output.getvalue())
+        self.assertIn("hive temp: 61.2 (min: 58.0 max: 62.5)", output.getvalue())
+        self.assertIn("bees buzzing: 3 (min: 0 max: 4)", output.getvalue())
+
+        writer.write(create_report(create_display_model(beehive=False)))
+        self.assertIn("unknown", output.getvalue())
+
+    def test_batches(self):
+        """Tests that nothing is written until a batch is full or the writer is closed."""
+        output = io.StringIO()
+        writer = JsonlReportWriter(output=output, batch_size=3)
+        writer.write(create_report(create_display_model()))
+        writer.write(create_report(create_display_model()))
+        self.assertEqual("", output.getvalue())
+        writer.write(create_report(create_display_model()))
+        self.assertEqual(3, len(output.getvalue().splitlines()))
+        writer.write(create_report(create_display_model(beehive=False)))
+        writer.close()
+
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(4, len(lines))
+        self.assertEqual(61.25, lines[0]["hive_temp"])
+        self.assertIsNone(lines[3]["hive_temp"])
+
+    def test_csv(self):
+        """Tests the CSV output has one header."""
+        output = io.StringIO()
+        writer = CsvReportWriter(output=output, batch_size=1)
+        writer.write(create_report(create_display_model()))
+        writer.write(create_report(create_display_model(beehive=False)))
+        writer.close()
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertEqual(",".join(REPORT_FIELDS), lines[0])
+        self.assertTrue(lines[1].startswith("99,100,55.0,"))
+
+    def test_binary(self):
+        """Tests the binary records can be read as a NumPy array."""
+        output = io.BytesIO()
+        writer = BinaryReportWriter(output=output, batch_size=2)
+        for _ in range(3):
+            writer.write(create_report(create_display_model()))
+        writer.write(create_report(create_display_model(beehive=False)))
+        writer.close()
+
+        records = numpy.frombuffer(output.getvalue(), dtype=BINARY_RECORD_DTYPE)
+        self.assertEqual(4, len(records))
+        self.assertEqual(61.25, records["hive_temp"][0])
+        self.assertTrue(numpy.isnan(records["hive_temp"][3]))
+        self.assertEqual(-1, records["number_bees"][3])
+        self.assertEqual(100, records["time"][3])
+
+    def test_kernel_reports(self):
+        """Tests the reports for a kernel run."""
+        results = {"time": numpy.arange(0, 5), "outside_temp": numpy.array([50.0, 51, 52, 53, 54]),
+                   "hive_temp": numpy.array([55.0, 59, 61, 58, 62]),
+                   "number_bees_buzzing": numpy.array([4, 2, 1, 3, 0]),
+                   "number_bees_fanning": numpy.array([0, 0, 1, 0, 2])}
+        reports = [dict(zip(REPORT_FIELDS, report)) for report in create_kernel_reports(results, 3, 2)]
+
+        self.assertEqual([2, 4], [report["time"] for report in reports])
+        # the starting values aren't in the stats, the same as the display model.
+        hive_temp_names = ["hive_temp", "min_hive_temp", "max_hive_temp"]
+        buzzing_names = ["number_bees_buzzing", "min_number_bees_buzzing", "max_number_bees_buzzing"]
+        self.assertEqual((61, 59, 61), tuple([reports[0][name] for name in hive_temp_names]))
+        self.assertEqual((0, 0, 3), tuple([reports[1][name] for name in buzzing_names]))
+        self.assertEqual(3, reports[1]["max_number_bees"])
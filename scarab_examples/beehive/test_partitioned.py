@@ -0,0 +1,88 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the bee population split across worker processes.
+"""
+import multiprocessing
+import random
+import unittest
+
+import numpy
+
+from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.partitioned import PartitionedBeePopulation
+from scarab_examples.beehive.cli_beehive import BeehiveApp
+from scarab.simulation import Simulation
+from scarab.testing import EntityTestWrapper as etw
+
+
+def run_simulation(bee_model, max_steps, seed) -> list:
+    """
+    Runs the simulation the same way as cli_beehive.
+    :return: List of (hive temp, number buzzing, number fanning) for each step.
+    """
+    random.seed(seed)
+    states = []
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        display_model = BeehiveApp.create_entities(simulation=simulation, number_bees=50, bee_model=bee_model,
+                                                   bee_workers=2)
+        for step in range(0, max_steps):
+            simulation.advance_and_wait(steps=1)
+            states.append((display_model.beehive.current_temp, display_model.beehive.number_bees_buzzing,
+                           display_model.beehive.number_bees_fanning))
+    return states
+
+
+class TestPartitionedBeePopulation(unittest.TestCase):
+
+    def test_matches_population(self):
+        """Tests that the partitions give the same bees and counts as a population in one process."""
+        rng = random.Random(11)
+        buzz_temps = [rng.uniform(54, 66) for _ in range(101)]
+        fan_temps = [rng.uniform(58.5, 71.5) for _ in range(101)]
+        population = etw(BeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps))
+        partitioned = PartitionedBeePopulation(buzz_temps=buzz_temps, fan_temps=fan_temps, workers=3)
+        try:
+            self.assertEqual(3, partitioned.number_workers)
+            partitioned = etw(partitioned)
+            for temp in [50, 58, 60.5, 63, 66, 75, 61]:
+                for entity in [population, partitioned]:
+                    entity.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": temp})
+                self.assertEqual(population.number_bees_buzzing, partitioned.number_bees_buzzing)
+                self.assertEqual(population.number_bees_fanning, partitioned.number_bees_fanning)
+                self.assertTrue(numpy.array_equal(population.is_buzzing, partitioned.is_buzzing))
+                self.assertTrue(numpy.array_equal(population.is_fanning, partitioned.is_fanning))
+        finally:
+            partitioned.close()
+
+    def test_worker_exited(self):
+        """Tests that a worker that exited is reported instead of waiting for it forever."""
+        partitioned = PartitionedBeePopulation(buzz_temps=[60, 62], fan_temps=[65, 66], workers=2, timeout=5.0)
+        try:
+            process = multiprocessing.active_children()[0]
+            process.terminate()
+            process.join()
+            partitioned = etw(partitioned)
+            with self.assertRaisesRegex(RuntimeError, "1 of 2 bee workers exited"):
+                partitioned.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 61})
+        finally:
+            partitioned.close()
+
+    def test_simulation(self):
+        """Tests that the hive runs the same with the partitioned bees."""
+        self.assertEqual(run_simulation(bee_model="population", max_steps=300, seed=2),
+                         run_simulation(bee_model="partitioned", max_steps=300, seed=2))
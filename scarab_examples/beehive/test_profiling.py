@@ -0,0 +1,93 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the handler profiling.
+"""
+import unittest
+
+from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.profiling import HandlerProfiler, HandlerStats, is_handler
+from scarab.testing import EntityTestWrapper as etw
+
+
+class TestHandlerProfiler(unittest.TestCase):
+
+    def test_profile_bee(self):
+        """Tests counting the calls to a bee handler."""
+        original = Bee.handle_temperature_change
+        profiler = HandlerProfiler()
+        profiler.install([Bee])
+        try:
+            bee = etw(Bee(buzz_temp=32, fan_temp=100))
+            bee.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 101})
+            bee.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME, properties={"current_temp": 15})
+            self.assertTrue(bee.is_buzzing)  # the handler still works.
+        finally:
+            profiler.uninstall()
+
+        self.assertIs(original, Bee.handle_temperature_change)
+        stats = profiler.stats[("Bee", "handle_temperature_change")]
+        self.assertEqual(2, stats.calls)
+        self.assertIn("handle_temperature_change", profiler.report())
+
+    def test_handlers(self):
+        """Tests that the handlers are found by their decorators instead of their names."""
+        class Clock(Entity):
+            @time_update_event_handler
+            def tick(self, previous_time, new_time):
+                self.time = new_time
+
+            def handle_reset(self):
+                self.time = 0
+
+        self.assertTrue(is_handler(Clock.tick))
+        self.assertFalse(is_handler(Clock.handle_reset))
+        self.assertTrue(is_handler(Beehive.handle_time_update))
+        self.assertFalse(is_handler(Beehive.get_number_bees_buzzing))
+
+        profiler = HandlerProfiler()
+        profiler.install([Clock])
+        try:
+            self.assertTrue(is_handler(Clock.tick))  # the wrapped handler is still found by the simulation.
+        finally:
+            profiler.uninstall()
+        self.assertEqual([("Clock", "tick")], list(profiler.stats))
+
+    def test_percentiles(self):
+        """Tests the percentiles from the latency buckets."""
+        stats = HandlerStats(entity_type="Bee", handler_name="handle_temperature_change")
+        for nanoseconds in range(1, 1001):
+            stats.record(nanoseconds)
+
+        self.assertEqual(1000, stats.calls)
+        self.assertEqual(1000, stats.max_ns)
+        self.assertEqual(1000, stats.percentile(100))
+        self.assertTrue(990 <= stats.percentile(99) <= 1000)
+        self.assertTrue(500 <= stats.percentile(50) <= 500 * 1.25)
+
+    def test_merge(self):
+        """Tests that merged stats have the same percentiles as stats of all the calls, as for an entity type."""
+        whole = HandlerStats(entity_type="Beehive", handler_name=None)
+        first = HandlerStats(entity_type="Beehive", handler_name="handle_time_update")
+        second = HandlerStats(entity_type="Beehive", handler_name="handle_bee_changed")
+        for nanoseconds in range(1, 1001):
+            whole.record(nanoseconds)
+            (first if nanoseconds % 3 else second).record(nanoseconds)
+        first.merge(second)
+
+        self.assertEqual((whole.calls, whole.total_ns, whole.max_ns), (first.calls, first.total_ns, first.max_ns))
+        self.assertEqual(whole.percentile(99), first.percentile(99))
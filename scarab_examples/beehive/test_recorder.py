@@ -0,0 +1,65 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the time series recorder.
+"""
+import tempfile
+import unittest
+
+import numpy
+
+from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.recorder import TimeSeriesRecorder, load_recording
+from scarab.testing import EntityTestWrapper as etw
+
+
+class TestTimeSeriesRecorder(unittest.TestCase):
+
+    def test_record(self):
+        """Tests recording steps across several chunks and reading them back."""
+        with tempfile.TemporaryDirectory() as path:
+            recorder = TimeSeriesRecorder(path=path, chunk_size=4)
+            wrapper = etw(recorder)
+            wrapper.send_entity_created_event(entity_name=BEEHIVE_ENTITY_NAME,
+                                              properties={"current_temp": 60.0, "number_bees": 10,
+                                                          "number_bees_buzzing": 0, "number_bees_fanning": 0})
+            wrapper.send_entity_created_event(entity_name=OUTSIDE_TEMPERATURE_NAME, properties={"current_temp": 50.0})
+
+            for new_time in range(1, 11):
+                wrapper.send_new_time(new_time=new_time)
+                wrapper.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME,
+                                                  properties={"current_temp": 60.0 + new_time, "number_bees": 10,
+                                                              "number_bees_buzzing": new_time,
+                                                              "number_bees_fanning": 0})
+                wrapper.send_entity_changed_event(entity_name=OUTSIDE_TEMPERATURE_NAME,
+                                                  properties={"current_temp": 50.0 + new_time})
+            recorder.close()
+
+            recording = load_recording(path)
+            self.assertEqual(list(range(0, 11)), list(recording["time"]))
+            self.assertEqual([60.0 + t for t in range(0, 11)], list(recording["hive_temp"]))
+            self.assertEqual([50.0 + t for t in range(0, 11)], list(recording["outside_temp"]))
+            self.assertEqual(list(range(0, 11)), list(recording["number_bees_buzzing"]))
+            self.assertTrue((recording["number_bees"] == 10).all())
+            self.assertIsInstance(recording["hive_temp"], numpy.memmap)
+
+    def test_empty(self):
+        """Tests reading a recording with no steps."""
+        with tempfile.TemporaryDirectory() as path:
+            TimeSeriesRecorder(path=path).close()
+            recording = load_recording(path)
+            self.assertEqual(0, len(recording["time"]))
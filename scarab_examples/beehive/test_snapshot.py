@@ -0,0 +1,133 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the beehive snapshots.
+"""
+import random
+import unittest
+
+from scarab.simulation import Simulation
+
+from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.cli_beehive import BeehiveApp
+from scarab_examples.beehive.snapshot import *
+
+
+def run_hive(steps, seed, bee_model) -> float:
+    """Runs a hive the same way as warm_up without a snapshot and returns the hive temp."""
+    random.seed(seed)
+    with Simulation(name="beehive", time_stepped=True, minimum_step_time=0) as simulation:
+        display_model = BeehiveApp.create_entities(simulation=simulation, number_bees=20, bee_model=bee_model)
+        simulation.advance_and_wait(steps=steps)
+        return display_model.beehive.current_temp
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Tests that the restored entities have the same state."""
+        beehive = Beehive(start_temp=61.5, buzzing_impact=.5, fanning_impact=.25)
+        outside_temperature = OutsideTemperature(min_temp=50, max_temp=90, start_time=30)
+        display_model = BeehiveDisplayModel()
+        for time, hive_temp in enumerate([58.5, 63.25, 60]):
+            display_model.stats["hive_temp"].update(hive_temp, time)
+        population = BeePopulation(buzz_temps=[60, 61, 62], fan_temps=[65, 64, 63])
+        bees = [Bee(buzz_temp=59, fan_temp=66), Bee(buzz_temp=62, fan_temp=63)]
+        bees[0].is_buzzing = True
+
+        snapshot = take_snapshot(100, HiveEntities(beehive=beehive, outside_temperature=outside_temperature,
+                                                   display_model=display_model, populations=[population], bees=bees))
+        time, entities = restore_snapshot(snapshot)
+
+        self.assertEqual(100, time)
+        self.assertEqual(beehive.get_state(), entities.beehive.get_state())
+        for series, stats in display_model.stats.items():
+            restored = entities.display_model.stats[series]
+            self.assertEqual(stats.running.get_state(), restored.running.get_state())
+            self.assertEqual(stats.sketch.get_state(), restored.sketch.get_state())
+            self.assertEqual((stats.window_min, stats.window_max), (restored.window_min, restored.window_max))
+        self.assertEqual([bee.get_state() for bee in bees], [bee.get_state() for bee in entities.bees])
+        self.assertEqual(population.buzz_temp.tolist(), entities.populations[0].buzz_temp.tolist())
+        self.assertEqual(population.fan_temp.tolist(), entities.populations[0].fan_temp.tolist())
+
+        # the outside temp carries on from the time of day of the snapshot.
+        self.assertEqual(130, entities.outside_temperature.start_time)
+        self.assertEqual(outside_temperature.current_temp, entities.outside_temperature.current_temp)
+
+    def test_window_after_restore(self):
+        """Tests that the values from before the snapshot leave the window as the new simulation carries on."""
+        display_model = BeehiveDisplayModel(window=10)
+        for time in range(91, 101):
+            display_model.stats["hive_temp"].update(50.0, time)
+
+        snapshot = take_snapshot(100, HiveEntities(beehive=Beehive(start_temp=60, buzzing_impact=.5, fanning_impact=.5),
+                                                   outside_temperature=OutsideTemperature(),
+                                                   display_model=display_model, populations=[], bees=[]))
+        time, entities = restore_snapshot(snapshot)
+        hive_temp = entities.display_model.stats["hive_temp"]
+        self.assertEqual(0, entities.display_model.new_time)
+        self.assertEqual((50.0, 50.0), (hive_temp.window_min, hive_temp.window_max))
+
+        for step_time in range(1, 60):
+            hive_temp.update(60.0, step_time)
+        self.assertEqual((60.0, 60.0), (hive_temp.window_min, hive_temp.window_max))
+        self.assertEqual((50.0, 60.0), (hive_temp.min, hive_temp.max))
+
+    def test_overrides(self):
+        """Tests the what-if changes."""
+        snapshot = take_snapshot(0, HiveEntities(beehive=Beehive(start_temp=60, buzzing_impact=.5, fanning_impact=.5),
+                                                 outside_temperature=OutsideTemperature(),
+                                                 display_model=BeehiveDisplayModel(), populations=[], bees=[]))
+        time, entities = restore_snapshot(snapshot, buzzing_impact=2, max_outside_temp=100)
+        self.assertEqual(2, entities.beehive.buzzing_impact)
+        self.assertEqual(100, entities.outside_temperature.max_temp)
+
+        with self.assertRaises(ValueError):
+            restore_snapshot(snapshot, number_bees=5)
+        with self.assertRaises(ValueError):
+            restore_snapshot(b"not a snapshot")
+
+    def test_outside_temp_overrides(self):
+        """Tests that a branch with a different outside range starts at the temp for that range."""
+        outside_temperature = OutsideTemperature(min_temp=50, max_temp=90, start_time=600)
+        snapshot = take_snapshot(100, HiveEntities(beehive=Beehive(start_temp=60, buzzing_impact=.5, fanning_impact=.5),
+                                                   outside_temperature=outside_temperature,
+                                                   display_model=BeehiveDisplayModel(), populations=[], bees=[]))
+
+        time, entities = restore_snapshot(snapshot, min_outside_temp=40, max_outside_temp=100)
+        expected = OutsideTemperature(min_temp=40, max_temp=100, start_time=700).current_temp
+        self.assertEqual(expected, entities.outside_temperature.current_temp)
+        self.assertNotEqual(outside_temperature.current_temp, entities.outside_temperature.current_temp)
+
+        # the same range keeps the temp of the snapshot.
+        time, entities = restore_snapshot(snapshot, max_outside_temp=90)
+        self.assertEqual(outside_temperature.current_temp, entities.outside_temperature.current_temp)
+
+    def test_continue(self):
+        """Tests that a restored hive carries on the same as a hive that wasn't stopped."""
+        for bee_model in ["population", "bees"]:
+            snapshot = warm_up(number_bees=20, steps=150, seed=3, bee_model=bee_model)
+            summary = run_branch((snapshot, 150, {}))
+            self.assertEqual(300, summary["time"])
+            self.assertEqual(run_hive(steps=300, seed=3, bee_model=bee_model), summary["final_hive_temp"])
+
+    def test_branch_overrides(self):
+        """Tests that each branch reports the what-if values it was run with, apart from the observed temps."""
+        snapshot = warm_up(number_bees=5, steps=10, seed=3)
+        summary = run_branch((snapshot, 20, {"max_outside_temp": 120.0}))
+        self.assertEqual(120.0, summary["max_outside_temp"])
+        self.assertNotEqual(120.0, summary["observed_max_outside_temp"])
@@ -0,0 +1,119 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Tests for the streaming statistics.
+"""
+import json
+import unittest
+
+import numpy
+
+from scarab_examples.beehive.stats import *
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_update(self):
+        """Tests the stats against NumPy for the same values."""
+        values = numpy.random.default_rng(1).normal(60, 5, size=1000)
+        stats = RunningStats()
+        self.assertIsNone(stats.mean)
+        self.assertIsNone(stats.min)
+        for value in values:
+            stats.update(value)
+
+        self.assertEqual(1000, stats.count)
+        self.assertAlmostEqual(values.mean(), stats.mean)
+        self.assertAlmostEqual(values.var(ddof=1), stats.variance)
+        self.assertEqual(values.min(), stats.min)
+        self.assertEqual(values.max(), stats.max)
+
+    def test_merge(self):
+        """Tests that merged stats are the same as the stats of all the values."""
+        values = numpy.random.default_rng(2).uniform(50, 90, size=500)
+        merged, parts = RunningStats(), [RunningStats(), RunningStats(), RunningStats()]
+        for part, chunk in zip(parts, numpy.array_split(values, [100, 100])):  # the second part is empty.
+            for value in chunk:
+                part.update(value)
+        for part in parts:
+            merged.merge(part)
+
+        self.assertEqual(500, merged.count)
+        self.assertAlmostEqual(values.mean(), merged.mean)
+        self.assertAlmostEqual(values.var(ddof=1), merged.variance)
+        self.assertEqual((values.min(), values.max()), (merged.min, merged.max))
+
+
+class TestSlidingWindowMinMax(unittest.TestCase):
+
+    def test_window(self):
+        """Tests the min and max against the values in the window."""
+        values = numpy.random.default_rng(3).integers(0, 20, size=200)
+        window = SlidingWindowMinMax(window=10)
+        self.assertIsNone(window.min)
+        for time, value in enumerate(values):
+            window.update(time, value)
+            recent = values[max(0, time - 9):time + 1]
+            self.assertEqual((recent.min(), recent.max()), (window.min, window.max))
+
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def test_quantile(self):
+        """Tests that the quantiles are within the relative accuracy, including for zero and negative values."""
+        values = numpy.concatenate([numpy.random.default_rng(4).uniform(-20, 100, size=2000), numpy.zeros(100)])
+        sketch = QuantileSketch(relative_accuracy=.01)
+        self.assertIsNone(sketch.quantile(.5))
+        for value in values:
+            sketch.update(value)
+
+        for quantile in [0, .01, .25, .5, .9, .99, 1]:
+            expected = numpy.sort(values)[int(quantile * (len(values) - 1))]
+            self.assertLessEqual(abs(sketch.quantile(quantile) - expected), .01 * abs(expected) + 1e-9, quantile)
+
+    def test_merge(self):
+        """Tests that merged sketches have the same buckets as a sketch of all the values."""
+        values = numpy.random.default_rng(5).normal(60, 5, size=1000)
+        whole, first, second = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for number, value in enumerate(values):
+            whole.update(value)
+            (first if number % 2 else second).update(value)
+        first.merge(second)
+
+        self.assertEqual(whole.get_state(), first.get_state())
+        self.assertEqual(whole.quantile(.5), first.quantile(.5))
+        self.assertRaises(ValueError, first.merge, QuantileSketch(relative_accuracy=.05))
+
+
+class TestStreamingStats(unittest.TestCase):
+
+    def test_state(self):
+        """Tests that the stats are the same after a snapshot is written as JSON and read back."""
+        stats = StreamingStats(window=5)
+        for time, value in enumerate([61.5, 59, 60, 0, 62.25, 58]):
+            stats.update(value, time)
+        restored = StreamingStats.from_state(json.loads(json.dumps(stats.get_state())))
+
+        self.assertEqual(stats.get_state(), restored.get_state())
+        self.assertEqual(stats.quantile(.5), restored.quantile(.5))
+        self.assertEqual((0, 62.25), (restored.window_min, restored.window_max))
+        self.assertEqual((0, 62.25), (restored.min, restored.max))
+        restored.update(63, 8)  # the values from before time 4 are out of the window.
+        self.assertEqual((58, 63), (restored.window_min, restored.window_max))
+
+
+if __name__ == '__main__':
+    unittest.main()
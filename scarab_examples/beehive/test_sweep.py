@@ -0,0 +1,59 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Tests for the parameter sweep runner.
+"""
+import unittest
+
+from scarab_examples.beehive import sweep
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_grid(self):
+        """Tests that a grid has every combination of values."""
+        runs = sweep.create_runs({"number_bees": [10, 20], "bee_variance": ["vary", "same"], "max_steps": [5]})
+        self.assertEqual(4, len(runs))
+        self.assertIn({"number_bees": 20, "bee_variance": "same", "max_steps": 5}, runs)
+
+    def test_list(self):
+        """Tests that a list takes the values in order and repeats single values."""
+        runs = sweep.create_runs({"number_bees": [10, 20, 30], "buzzing_impact": [.5]}, combine="list")
+        self.assertEqual([{"number_bees": 10, "buzzing_impact": .5}, {"number_bees": 20, "buzzing_impact": .5},
+                          {"number_bees": 30, "buzzing_impact": .5}], runs)
+        self.assertRaises(ValueError, sweep.create_runs, {"number_bees": [10, 20, 30], "buzzing_impact": [.5, .2]},
+                          "list")
+
+    def test_sweep(self):
+        """Tests running a small sweep in worker processes."""
+        runs = sweep.create_runs({"number_bees": [5, 10], "bee_model": ["population", "bees"], "max_steps": [20]})
+        summaries = sweep.sweep(runs, workers=2, seed=3)
+
+        self.assertEqual(4, len(summaries))
+        for run_number, summary in enumerate(summaries):
+            self.assertEqual(3 + run_number, summary["seed"])
+            self.assertEqual(summary["number_bees"], summary["observed_max_number_bees"])
+            self.assertLessEqual(summary["observed_min_hive_temp"], summary["observed_max_hive_temp"])
+
+        # the same seed gives the same results when a run is repeated on its own.
+        self.assertEqual(summaries[0]["final_hive_temp"], sweep.run_beehive(dict(runs[0], seed=3))["final_hive_temp"])
+
+    def test_swept_outside_temps(self):
+        """Tests that the swept outside temps are reported as they were given, apart from the observed temps."""
+        summary = sweep.run_beehive({"number_bees": 5, "min_outside_temp": 40.0, "max_outside_temp": 95.0,
+                                     "max_steps": 30, "seed": 1})
+        self.assertEqual((40.0, 95.0), (summary["min_outside_temp"], summary["max_outside_temp"]))
+        self.assertNotEqual(40.0, summary["observed_min_outside_temp"])
@@ -0,0 +1,139 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the live telemetry server.
+"""
+import base64
+import json
+import os
+import socket
+import time
+import unittest
+import urllib.request
+
+from scarab_examples.beehive.beehive import *
+from scarab_examples.beehive.telemetry import ClientStream, TelemetryPublisher, TelemetryServer
+from scarab.testing import EntityTestWrapper as etw
+
+
+def read_frame(stream) -> tuple:
+    """Returns the opcode and payload of the next unmasked frame from the server."""
+    first, second = stream.read(2)
+    length = second & 0x7f
+    if length == 126:
+        length = int.from_bytes(stream.read(2), "big")
+    elif length == 127:
+        length = int.from_bytes(stream.read(8), "big")
+    return first & 0x0f, stream.read(length)
+
+
+class TestClientStream(unittest.TestCase):
+
+    def test_slow_client(self):
+        """Tests that a client that doesn't keep up is sent fewer samples, then more once it has caught up."""
+        stream = ClientStream(max_backlog=8)
+        for step_time in range(0, 8):
+            stream.offer([step_time])
+        self.assertEqual(1, stream.stride)
+
+        # the backlog is full, so the client gets every other sample over the whole time.
+        for step_time in range(8, 16):
+            stream.offer([step_time])
+        self.assertEqual(2, stream.stride)
+        samples = stream.take()
+        self.assertEqual([1, 3, 5, 7, 9, 11, 13, 15], [sample[0] for sample in samples])
+
+        # caught up, so back to every sample.
+        stream.offer([16])
+        stream.offer([17])
+        self.assertEqual([[17]], stream.take())
+        self.assertEqual(1, stream.stride)
+
+
+class TestTelemetryServer(unittest.TestCase):
+
+    def setUp(self):
+        """Starts a server with a small history."""
+        self.server = TelemetryServer(history_size=3)
+        self.server.start()
+
+    def tearDown(self):
+        """Stops the server."""
+        self.server.stop()
+
+    def test_history(self):
+        """Tests fetching the latest samples in one request."""
+        for step_time in range(0, 5):
+            self.server.publish([step_time, 50.0 + step_time, 60.0, step_time, None])
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.server.port}/history") as response:
+            history = json.load(response)
+        self.assertEqual(["time", "outside_temp", "hive_temp", "number_bees_buzzing", "number_bees_fanning"],
+                         history["fields"])
+        self.assertEqual([[2, 52.0, 60.0, 2, None], [3, 53.0, 60.0, 3, None], [4, 54.0, 60.0, 4, None]],
+                         history["samples"])
+
+    def test_stream(self):
+        """Tests that new samples are streamed over a WebSocket."""
+        key = base64.b64encode(os.urandom(16)).decode()
+        with socket.create_connection(("127.0.0.1", self.server.port), timeout=5) as connection:
+            connection.sendall(f"GET /stream HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n"
+                               f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                               f"Sec-WebSocket-Version: 13\r\n\r\n".encode())
+            stream = connection.makefile("rb")
+            self.assertIn(b"101", stream.readline())
+            while stream.readline() != b"\r\n":
+                pass
+
+            # wait for the server to have the client before publishing.
+            while not self.server.number_clients:
+                time.sleep(0.01)
+            self.server.publish([1, 50.0, 60.0, 2, 0])
+            opcode, payload = read_frame(stream)
+            self.assertEqual(1, opcode)
+            self.assertEqual([[1, 50.0, 60.0, 2, 0]], json.loads(payload))
+
+    def test_loopback_only(self):
+        """Tests that the server won't listen on other interfaces."""
+        self.assertRaises(ValueError, TelemetryServer, host="0.0.0.0")
+        self.assertEqual("localhost", TelemetryServer(host="localhost").host)
+
+    def test_port_in_use(self):
+        """Tests that start raises the error when the server can't listen, rather than waiting for it forever."""
+        with socket.socket() as listener:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen()
+            server = TelemetryServer(port=listener.getsockname()[1])
+            self.assertRaises(OSError, server.start)
+            server.stop()
+
+
+class TestTelemetryPublisher(unittest.TestCase):
+
+    def test_publish(self):
+        """Tests that the values at the end of each step are published."""
+        server = TelemetryServer()
+        publisher = etw(TelemetryPublisher(server=server))
+        publisher.send_entity_changed_event(entity_name=OUTSIDE_TEMPERATURE_NAME, properties={"current_temp": 50})
+        publisher.send_entity_changed_event(entity_name=BEEHIVE_ENTITY_NAME,
+                                            properties={"current_temp": 60, "number_bees_buzzing": 3,
+                                                        "number_bees_fanning": 1})
+        publisher.send_new_time(new_time=1)
+
+        history = server.history.snapshot()
+        self.assertEqual([0], history["time"].tolist())
+        self.assertEqual([60], history["hive_temp"].tolist())
+        self.assertEqual([3], history["number_bees_buzzing"].tolist())
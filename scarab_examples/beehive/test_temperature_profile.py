@@ -0,0 +1,68 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the outside temperature profiles.
+"""
+import unittest
+
+import numpy
+
+from scarab_examples.beehive.temperature_profile import *
+
+
+class TestTemperatureProfile(unittest.TestCase):
+
+    def test_profile(self):
+        """Tests the profile is the same as the entity always calculated."""
+        increment = 40 / 720
+        expected = [50.0 + increment * minute for minute in range(720)] + \
+                   [90.0 - increment * minute for minute in range(720)]
+        self.assertEqual(expected, outside_temperature_profile(min_temp=50, max_temp=90).tolist())
+
+    def test_shared(self):
+        """Tests profiles are shared and can't be changed."""
+        profile = outside_temperature_profile(min_temp=50, max_temp=90)
+        self.assertIs(profile, outside_temperature_profile(min_temp=50.0, max_temp=90.0, resolution=1))
+        self.assertIsNot(profile, outside_temperature_profile(min_temp=50, max_temp=90, resolution=0.5))
+        with self.assertRaises(ValueError):
+            profile[0] = 0
+
+    def test_resolution(self):
+        """Tests profiles at other resolutions."""
+        profile = outside_temperature_profile(min_temp=0, max_temp=720, resolution=0.5)
+        self.assertEqual(2880, len(profile))
+        self.assertEqual(0.5, profile[1])
+        self.assertEqual(720, profile[1440])
+
+        profile = outside_temperature_profile(min_temp=0, max_temp=720, resolution=60)
+        self.assertEqual([0, 60, 120], profile[:3].tolist())
+
+        with self.assertRaises(AssertionError):
+            outside_temperature_profile(min_temp=0, max_temp=720, resolution=7)
+
+    def test_temperatures_at(self):
+        """Tests looking up and calculating the temps for many times."""
+        times = numpy.arange(0, 3 * 1440, 7)
+        profile = outside_temperature_profile(min_temp=50, max_temp=90)
+        self.assertEqual(profile[times % 1440].tolist(),
+                         outside_temperatures_at(times, min_temp=50, max_temp=90).tolist())
+        self.assertEqual(profile[times % 1440].tolist(),
+                         outside_temperatures_at(times, min_temp=50, max_temp=90, resolution=1).tolist())
+
+        self.assertEqual([7.5, 0.0, 720.0],
+                         outside_temperatures_at([7.5, 1440, 2160], min_temp=0, max_temp=720).tolist())
+        self.assertEqual([0, 15], outside_temperatures_at([14.9, 15], min_temp=0, max_temp=720, resolution=15).tolist())
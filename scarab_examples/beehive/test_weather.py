@@ -0,0 +1,102 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Tests for the weather files.
+"""
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from scarab_examples.beehive.weather import *
+from scarab.testing import EntityTestWrapper as etw
+
+
+class TestWeather(unittest.TestCase):
+
+    def setUp(self):
+        """Creates a directory for the files."""
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Removes the files."""
+        self.directory.cleanup()
+
+    def create_weather_file(self, temps) -> str:
+        """Writes the temps as a raw weather file."""
+        file_name = os.path.join(self.directory.name, "weather.bin")
+        numpy.array(temps, dtype=WEATHER_DTYPE).tofile(file_name)
+        return file_name
+
+    def test_convert_csv(self):
+        """Tests converting a CSV file, filling missing temps."""
+        csv_file_name = os.path.join(self.directory.name, "weather.csv")
+        with open(csv_file_name, "w") as csv_file:
+            csv_file.write("time,temp\n0,\n1,\n2,\n3,50.5\n4,\n5,54\n")
+
+        # the rows before the first temp get the first temp, so each sample stays at the time of its row.
+        weather_file_name = os.path.join(self.directory.name, "weather.bin")
+        self.assertEqual(6, convert_csv(csv_file_name, weather_file_name, chunk_size=2))
+        self.assertEqual([50.5, 50.5, 50.5, 50.5, 50.5, 54],
+                         numpy.fromfile(weather_file_name, dtype=WEATHER_DTYPE).tolist())
+
+    def test_interpolation(self):
+        """Tests the temps between samples and outside the file."""
+        source = WeatherSource(path=self.create_weather_file([50, 60, 40]), sample_minutes=10, start_time=100)
+        self.assertEqual(50, source.temperature_at(0))
+        self.assertEqual(50, source.temperature_at(100))
+        self.assertEqual(55, source.temperature_at(105))
+        self.assertEqual(50, source.temperature_at(115))
+        self.assertEqual(40, source.temperature_at(1000))
+        self.assertEqual([50, 55, 60, 50, 40], source.temperatures_at([100, 105, 110, 115, 120]).tolist())
+
+    def test_read_ahead(self):
+        """Tests stepping across the read ahead window in both directions."""
+        temps = numpy.arange(0, 1000, dtype=numpy.float64) % 17
+        source = WeatherSource(path=self.create_weather_file(temps), read_ahead=8)
+        times = numpy.arange(0, 999, 0.5)
+        expected = numpy.interp(times, numpy.arange(0, 1000), temps).tolist()
+        self.assertEqual(expected, [source.temperature_at(time) for time in times])
+        self.assertEqual(expected[::-1], [source.temperature_at(time) for time in times[::-1]])
+
+    def test_read_behind(self):
+        """Tests that stepping back in time reads a window before the time, the same as stepping forward."""
+        windows = []
+
+        class CountingSource(WeatherSource):
+            @property
+            def samples(self):
+                samples = super().samples
+                return type("Samples", (), {"__len__": lambda _: len(samples),
+                                            "__getitem__": lambda _, key: windows.append(key) or samples[key]})()
+
+        source = CountingSource(path=self.create_weather_file(numpy.arange(0, 100, dtype=numpy.float64)),
+                                read_ahead=10)
+        self.assertEqual(list(range(98, 80, -1)), [source.temperature_at(time) for time in range(98, 80, -1)])
+        self.assertEqual([slice(98, 108), slice(89, 99), slice(80, 90)], windows)
+
+    def test_outside_temp(self):
+        """Tests the entity reads the temp for each time."""
+        ot = etw(WeatherOutsideTemperature(path=self.create_weather_file([50, 60, 40]), sample_minutes=2))
+        self.assertEqual(50, ot.current_temp)
+
+        ot.send_new_time(new_time=1)
+        self.assertEqual(55, ot.current_temp)
+
+        ot.send_new_time(new_time=4)
+        self.assertEqual(40, ot.current_temp)
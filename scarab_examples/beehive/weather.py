@@ -0,0 +1,217 @@
+"""
+Copyright (C) 2019 William D. Back
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+Outside temperature from recorded weather data instead of the synthetic day.  The temperatures are kept in a file with
+one sample at a fixed interval, either a .npy file or a raw array of little endian floats.  The file is memory mapped
+and only the samples near the current time are read, so years of minute samples can be used without loading them.
+
+Use convert_csv (or run this module) to create the file from a CSV export of a weather station.
+"""
+
+import argparse
+import csv
+
+import numpy
+
+from scarab.entities import *
+
+from scarab_examples.beehive.beehive import OUTSIDE_TEMPERATURE_NAME
+
+WEATHER_DTYPE = "<f8"  # the type of the samples in raw files.
+
+
+class WeatherSource:
+    """Reads the temperature at any time from a weather file, interpolating between the samples."""
+
+    def __init__(self, path, sample_minutes=1.0, start_time=0, dtype=WEATHER_DTYPE, read_ahead=4096):
+        """
+        Creates a source for the file.  The file isn't opened until the first temperature is read.
+        :param str path: The weather file.  Files ending in .npy are read as NumPy files, others as raw samples.
+        :param float sample_minutes: The minutes between the samples.
+        :param int start_time: The simulation time of the first sample.
+        :param str dtype: The type of the samples in a raw file.
+        :param int read_ahead: The number of samples read from the file at a time.
+        """
+        assert sample_minutes > 0
+        assert read_ahead >= 2
+
+        self.path = path
+        self.sample_minutes = float(sample_minutes)
+        self.start_time = start_time
+        self.dtype = dtype
+        self.read_ahead = read_ahead
+
+        self.__samples = None  # the memory mapped file.
+        self.__window_start = 0  # the first sample in the window.
+        self.__window = numpy.zeros(0)  # samples read ahead from the file.
+
+    def __getstate__(self) -> dict:
+        """Copies and pickles leave the file behind, and open it again when they are used."""
+        state = self.__dict__.copy()
+        state["_WeatherSource__samples"] = None
+        state["_WeatherSource__window_start"] = 0
+        state["_WeatherSource__window"] = numpy.zeros(0)
+        return state
+
+    @property
+    def samples(self) -> numpy.ndarray:
+        """Returns all of the samples, memory mapped from the file."""
+        if self.__samples is None:
+            if self.path.endswith(".npy"):
+                self.__samples = numpy.load(self.path, mmap_mode="r")
+            else:
+                self.__samples = numpy.memmap(self.path, dtype=self.dtype, mode="r")
+            assert self.__samples.ndim == 1 and len(self.__samples) > 0
+        return self.__samples
+
+    def temperature_at(self, time) -> float:
+        """
+        Returns the temperature at the time.  Times before the first sample or after the last use that sample.
+        :param float time: The simulation time.
+        :return: The temperature interpolated between the samples either side of the time.
+        """
+        position = min(max((time - self.start_time) / self.sample_minutes, 0.0), len(self.samples) - 1.0)
+        index = int(position)
+        if index + 1 >= len(self.samples):
+            index -= 1 if index > 0 else 0
+
+        # the samples either side have to be in the window.  Stepping forward reads the samples after the time, and
+        # stepping back the samples before it, so either way the file is only read every read_ahead samples.
+        offset = index - self.__window_start
+        if offset < 0 or offset + 1 >= len(self.__window):
+            self.__window_start = max(index + 2 - self.read_ahead, 0) if offset < 0 else index
+            self.__window = numpy.array(self.samples[self.__window_start:self.__window_start + self.read_ahead],
+                                        dtype=numpy.float64)
+            offset = index - self.__window_start
+
+        before = self.__window[offset]
+        if offset + 1 >= len(self.__window):  # a file with one sample.
+            return float(before)
+        return float(before + (self.__window[offset + 1] - before) * (position - index))
+
+    def temperatures_at(self, times) -> numpy.ndarray:
+        """
+        Returns the temperatures at many times.  Only the samples between the first and last time are read.
+        :param numpy.ndarray times: The simulation times.
+        :return: Array of the temperatures at the times.
+        """
+        positions = numpy.clip((numpy.asarray(times, dtype=numpy.float64) - self.start_time) / self.sample_minutes,
+                               0.0, len(self.samples) - 1.0)
+        if positions.size == 0:
+            return positions
+
+        first, last = int(positions.min()), int(numpy.ceil(positions.max()))
+        window = numpy.array(self.samples[first:last + 1], dtype=numpy.float64)
+        return numpy.interp(positions, numpy.arange(first, first + len(window)), window)
+
+
+class WeatherOutsideTemperature(Entity):
+    """Outside temperature from a weather file.  Used in place of OutsideTemperature."""
+
+    def __init__(self, path, sample_minutes=1.0, start_time=0, dtype=WEATHER_DTYPE, read_ahead=4096):
+        """
+        Creates a new outside temperature from the weather file.
+        :param str path: The weather file.  Files ending in .npy are read as NumPy files, others as raw samples.
+        :param float sample_minutes: The minutes between the samples.
+        :param int start_time: The simulation time of the first sample.
+        :param str dtype: The type of the samples in a raw file.
+        :param int read_ahead: The number of samples read from the file at a time.
+        """
+        self.__source = WeatherSource(path=path, sample_minutes=sample_minutes, start_time=start_time, dtype=dtype,
+                                      read_ahead=read_ahead)
+        self.current_temp = self.__source.temperature_at(0)
+
+        super().__init__(name=OUTSIDE_TEMPERATURE_NAME)
+
+    @time_update_event_handler
+    def handle_time_update(self, previous_time, new_time) -> None:
+        """Handles the time changing to read the temp for the new time.
+        :param int previous_time: The previous simulation time.
+        :param int new_time: The new simulation time.
+        """
+        assert previous_time is not None
+        self.current_temp = self.__source.temperature_at(new_time)
+
+
+def convert_csv(csv_file_name, weather_file_name, column="temp", chunk_size=65536) -> int:
+    """
+    Converts a column of temperatures in a CSV file with a header to a raw weather file.  The CSV is read a chunk at a
+    time, so it can be larger than memory.  Missing values are filled with the last temperature before them, and
+    missing values at the start with the first temperature, so every row is a sample at its time.
+    :param str csv_file_name: The CSV file to read.
+    :param str weather_file_name: The weather file to write.
+    :param str column: The name of the column with the temperatures.
+    :param int chunk_size: The number of samples written at a time.
+    :return: The number of samples written.
+    """
+    number_samples = 0
+    last_temp = None
+    leading_rows = 0  # rows before the first temperature.
+    chunk = numpy.zeros(chunk_size, dtype=WEATHER_DTYPE)
+    chunk_rows = 0
+
+    with open(csv_file_name, newline="") as csv_file, open(weather_file_name, "wb") as weather_file:
+        for row in csv.DictReader(csv_file):
+            value = row[column].strip()
+            if value:
+                if last_temp is None:  # the rows before the first temperature get it, a chunk at a time.
+                    for start in range(0, leading_rows, chunk_size):
+                        weather_file.write(numpy.full(min(chunk_size, leading_rows - start), float(value),
+                                                      dtype=WEATHER_DTYPE).tobytes())
+                    number_samples += leading_rows
+                last_temp = float(value)
+            if last_temp is None:
+                leading_rows += 1
+                continue
+
+            chunk[chunk_rows] = last_temp
+            chunk_rows += 1
+            if chunk_rows == chunk_size:
+                weather_file.write(chunk.tobytes())
+                number_samples += chunk_rows
+                chunk_rows = 0
+
+        weather_file.write(chunk[:chunk_rows].tobytes())
+        number_samples += chunk_rows
+
+    return number_samples
+
+
+def get_args() -> argparse.Namespace:
+    """
+    Returns command line arguments.
+    :return: The command line arguments for converting a CSV file.
+    """
+    parser = argparse.ArgumentParser(description="Converts a column of temperatures in a CSV file to a weather file.")
+
+    parser.add_argument("csv_file", help="CSV file with a header row")
+    parser.add_argument("weather_file", help="weather file to write")
+    parser.add_argument("--column", default="temp", help="name of the column with the temperatures")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Converts the CSV file."""
+    args = get_args()
+    number_samples = convert_csv(csv_file_name=args.csv_file, weather_file_name=args.weather_file,
+                                 column=args.column)
+    print(f"Wrote {number_samples} samples to {args.weather_file}")
+
+
+if __name__ == "__main__":
+    main()
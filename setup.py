@@ -27,8 +27,13 @@ setup(name='scarab_examples',
       packages=find_packages(),
       zip_safe=False,
       install_requires=[
-            'scarab'
+            'scarab',
+            'numpy',
+            'pyyaml'
       ],
+      package_data={
+            'scarab_examples.beehive': ['*.yaml']
+      },
       dependency_links=[
             'http://github.com/billdback/scarab/tarball/master#egg=package-1.0'
       ]